@@ -3,6 +3,10 @@ ASGI config for academia_dev project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Para as views assíncronas de /api/async/ (core/views_async.py):
+
+    uvicorn academia_dev.asgi:application --workers 2
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -27,6 +27,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     
     # Third party apps
     'rest_framework',
@@ -36,6 +37,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # primeiro da lista para medir a requisição inteira (ver core/metricas.py)
+    'core.metricas.MetricasMiddleware',
+    # leituras em réplicas, fixadas no primário depois de escritas
+    'core.roteamento.FixacaoPrimarioMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -45,6 +50,9 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Consultas por requisição, Server-Timing e /api/_metrics
+METRICAS_ATIVAS = os.environ.get('METRICAS_ATIVAS', '1') == '1'
+
 ROOT_URLCONF = 'academia_dev.urls'
 
 TEMPLATES = [
@@ -69,6 +77,35 @@ WSGI_APPLICATION = 'academia_dev.wsgi.application'
 # Database
 # SQLite para desenvolvimento local
 # PostgreSQL para produção (Docker)
+#
+# Conexões: com DB_POOL=1 o Django usa o pool do psycopg 3 (precisa de
+# psycopg[pool]); as conexões são abertas uma vez por processo e
+# reaproveitadas, verificadas na retirada (check_connection). Cada worker
+# tem o seu pool, então workers x DB_POOL_MAX_SIZE deve caber no
+# max_connections do PostgreSQL. Sem pool, DB_CONN_MAX_AGE (padrão 0)
+# mantém a conexão aberta entre requisições da mesma thread (com health
+# check); só use sob WSGI. Sob ASGI as views assíncronas rodam o ORM em
+# threads do sync_to_async e as conexões persistentes se acumulam, uma
+# por thread, sem o fechamento no fim da requisição: use DB_POOL=1.
+# As estatísticas do pool (espera na retirada etc.) saem em /api/_metrics.
+DB_POOL = os.environ.get('DB_POOL', '0') == '1'
+
+DATABASE_OPTIONS = {}
+if DB_POOL:
+    from psycopg_pool import ConnectionPool
+
+    DATABASE_OPTIONS['pool'] = {
+        'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', '2')),
+        'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', '10')),
+        # segundos esperando uma conexão livre antes de erro
+        'timeout': float(os.environ.get('DB_POOL_TIMEOUT', '10')),
+        # fecha conexões ociosas acima do min_size
+        'max_idle': float(os.environ.get('DB_POOL_MAX_IDLE', '600')),
+        # recicla conexões antigas (ex.: depois de um failover)
+        'max_lifetime': float(os.environ.get('DB_POOL_MAX_LIFETIME', '3600')),
+        'check': ConnectionPool.check_connection,
+    }
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
@@ -77,9 +114,69 @@ DATABASES = {
         'PASSWORD': os.environ.get('POSTGRES_PASSWORD', 'postgres'),
         'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
         'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+        # o pool não funciona junto com conexões persistentes
+        'CONN_MAX_AGE': 0 if DB_POOL else int(os.environ.get('DB_CONN_MAX_AGE', '0')),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': DATABASE_OPTIONS,
     }
 }
 
+# Réplicas de leitura: POSTGRES_REPLICA_HOSTS=host1:5432,host2 cria os
+# aliases replica1, replica2... com as mesmas credenciais do primário.
+# Leituras vão para as réplicas e escritas para o default; depois de uma
+# escrita, as leituras da mesma sessão ficam no primário por
+# REPLICA_FIXACAO_SEGUNDOS (ver core/roteamento.py). Para testar
+# localmente, aponte para um segundo PostgreSQL (ou para o próprio
+# primário, o que exercita só o roteamento).
+REPLICAS = []
+for _numero, _endereco in enumerate(
+    filter(None, os.environ.get('POSTGRES_REPLICA_HOSTS', '').split(',')), start=1
+):
+    _host, _, _porta = _endereco.strip().partition(':')
+    _alias = f'replica{_numero}'
+    DATABASES[_alias] = {
+        **DATABASES['default'],
+        'HOST': _host,
+        'PORT': _porta or DATABASES['default']['PORT'],
+        # nos testes a réplica é o próprio banco de teste do default
+        'TEST': {'MIRROR': 'default'},
+    }
+    REPLICAS.append(_alias)
+
+DATABASE_ROUTERS = ['core.roteamento.RoteadorReplicas']
+REPLICA_FIXACAO_SEGUNDOS = int(os.environ.get('REPLICA_FIXACAO_SEGUNDOS', '5'))
+
+# Cache
+# locmem atende um unico worker; com varios workers use um backend
+# compartilhado (file ou redis) para que todos vejam as mesmas geracoes
+CACHE_BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', 'academia-dev'),
+    'file': ('django.core.cache.backends.filebased.FileBasedCache', str(BASE_DIR / 'cache')),
+    'redis': ('django.core.cache.backends.redis.RedisCache', 'redis://localhost:6379/1'),
+}
+_cache_backend, _cache_location = CACHE_BACKENDS[os.environ.get('CACHE_BACKEND', 'locmem')]
+
+CACHES = {
+    'default': {
+        'BACKEND': _cache_backend,
+        'LOCATION': os.environ.get('CACHE_LOCATION', _cache_location),
+        'TIMEOUT': int(os.environ.get('CACHE_TIMEOUT', '300')),
+    }
+}
+
+# Outbox (core/outbox.py): o processar_outbox atualiza as views
+# materializadas depois de drenar a fila, no máximo uma vez a cada N segundos
+OUTBOX_INTERVALO_RELATORIOS_S = int(os.environ.get('OUTBOX_INTERVALO_RELATORIOS_S', '60'))
+
+# Jobs de relatório (core/jobs.py): arquivos .gz gerados pelo comando
+# processar_jobs_relatorio, apagados depois de RETENCAO_HORAS ou quando o
+# total passa de MAX_MB (os mais antigos primeiro)
+RELATORIOS_JOBS_DIR = Path(os.environ.get('RELATORIOS_JOBS_DIR', BASE_DIR / 'relatorios_jobs'))
+RELATORIOS_JOBS_RETENCAO_HORAS = int(os.environ.get('RELATORIOS_JOBS_RETENCAO_HORAS', '24'))
+RELATORIOS_JOBS_MAX_MB = int(os.environ.get('RELATORIOS_JOBS_MAX_MB', '1024'))
+# job em PROCESSANDO há mais tempo que isso volta para a fila (worker caiu)
+RELATORIOS_JOBS_TEMPO_MAXIMO_MIN = int(os.environ.get('RELATORIOS_JOBS_TEMPO_MAXIMO_MIN', '30'))
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -115,12 +212,18 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
+# listas da API pela leitura rápida dos serializers (values_list); opt-in
+# com LEITURA_RAPIDA=1 no ambiente
+LEITURA_RAPIDA = os.environ.get('LEITURA_RAPIDA', '0') == '1'
+
 # Django Rest Framework Configuration
 REST_FRAMEWORK = {
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    # ?page=N por padrão; ?paginacao=keyset ativa a paginação por chave
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.PaginacaoPadrao',
     'PAGE_SIZE': 10,
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        # JSONRenderer com orjson (core/renderers.py)
+        'core.renderers.JSONRapidoRenderer',
         'rest_framework.renderers.BrowsableAPIRenderer',
     ],
 }
\ No newline at end of file
@@ -1,12 +1,42 @@
 from django.contrib import admin
+from django.db.models import Q
+from .busca import filtro_contem, filtro_por_nome
 from .models import Aluno, Curso, Matricula
 
 
+class BuscaTrigramMixin:
+    """
+    Troca a busca padrão do admin (icontains em cada campo, que faz
+    varredura sequencial) pela busca de core/busca.py: nomes pelo índice
+    trigram sem acento, e-mails por substring (trigram) e documentos por
+    prefixo.
+    campos_nome: campos buscados por substring sem acento.
+    campos_contem: campos buscados por substring, sem distinguir maiúsculas.
+    campos_prefixo: campos buscados por prefixo (usam o índice _like).
+    """
+    campos_nome = ()
+    campos_contem = ()
+    campos_prefixo = ()
+
+    def get_search_results(self, request, queryset, search_term):
+        termo = search_term.strip()
+        if not termo:
+            return queryset, False
+        filtro = filtro_por_nome(queryset, self.campos_nome, termo)
+        filtro |= filtro_contem(queryset, self.campos_contem, termo)
+        for campo in self.campos_prefixo:
+            filtro |= Q(**{f'{campo}__startswith': termo})
+        return queryset.filter(filtro), False
+
+
 @admin.register(Aluno)
-class AlunoAdmin(admin.ModelAdmin):
+class AlunoAdmin(BuscaTrigramMixin, admin.ModelAdmin):
     list_display = ['nome', 'email', 'cpf', 'data_ingresso', 'total_devido', 'total_pago']
     list_filter = ['data_ingresso']
     search_fields = ['nome', 'email', 'cpf']
+    campos_nome = ['nome']
+    campos_contem = ['email']
+    campos_prefixo = ['cpf']
     date_hierarchy = 'data_ingresso'
     ordering = ['-data_ingresso']
     
@@ -21,22 +51,29 @@ class AlunoAdmin(admin.ModelAdmin):
 
     readonly_fields = []
 
+    def get_queryset(self, request):
+        # totais calculados em uma unica consulta agrupada
+        return super().get_queryset(request).com_totais()
+
     def total_devido(self, obj):
-        valor = obj.total_devido()
+        valor = obj.valor_devido
         return f"R$ {valor:.2f}"
     total_devido.short_description = "Total Devido"
+    total_devido.admin_order_field = 'valor_devido'
 
     def total_pago(self, obj):
-        valor = obj.total_pago()
+        valor = obj.valor_pago
         return f"R$ {valor:.2f}"
     total_pago.short_description = "Total Pago"
+    total_pago.admin_order_field = 'valor_pago'
 
 
 @admin.register(Curso)
-class CursoAdmin(admin.ModelAdmin):
+class CursoAdmin(BuscaTrigramMixin, admin.ModelAdmin):
     list_display = ['nome', 'carga_horaria', 'valor_inscricao', 'status', 'total_matriculas']
     list_filter = ['status']
     search_fields = ['nome']
+    campos_nome = ['nome']
     ordering = ['nome']
     
     fieldsets = (
@@ -54,10 +91,12 @@ class CursoAdmin(admin.ModelAdmin):
 
 
 @admin.register(Matricula)
-class MatriculaAdmin(admin.ModelAdmin):
+class MatriculaAdmin(BuscaTrigramMixin, admin.ModelAdmin):
     list_display = ['aluno', 'curso', 'data_matricula', 'status', 'valor_curso']
     list_filter = ['status', 'data_matricula', 'curso']
     search_fields = ['aluno__nome', 'aluno__cpf', 'curso__nome']
+    campos_nome = ['aluno__nome', 'curso__nome']
+    campos_prefixo = ['aluno__cpf']
     date_hierarchy = 'data_matricula'
     ordering = ['-data_matricula']
     
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        # registra os receivers do livro de saldos, dos rollups de receita,
+        # da outbox e da invalidacao do cache e os lookups de busca
+        # (sem_acento, ilike)
+        from . import busca, cache, outbox, receita, saldos  # noqa: F401
@@ -0,0 +1,199 @@
+"""
+Auditoria dos planos de execução (comando auditar_consultas).
+
+Cada rota do benchmark (core/benchmark.py) é chamada uma vez com o cache
+desligado, para que as consultas de verdade cheguem ao banco, e cada
+SELECT capturado passa por EXPLAIN no mesmo banco em que rodou. Também
+entram as consultas dos métodos de model usados pelos serializers
+(CONSULTAS_AVULSAS), que não têm rota própria.
+
+No PostgreSQL o plano vem de EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) e
+são apontados:
+- seq_scan: Seq Scan que leu pelo menos `min_linhas` linhas (tabelas
+  pequenas, como core_curso, são lidas inteiras de propósito);
+- estimativa: nó em que linhas estimadas e reais diferem por um fator
+  de `fator_estimativa` ou mais (estatísticas velhas ou correlação que o
+  planejador não enxerga; rode ANALYZE antes de concluir).
+
+No SQLite só há EXPLAIN QUERY PLAN, sem execução nem estimativas: são
+apontados os SCAN sem índice em tabelas com `min_linhas` ou mais.
+
+O EXPLAIN ANALYZE executa a consulta; tudo roda em uma transação
+desfeita no final, inclusive as rotas de escrita.
+"""
+import json
+import re
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+
+from django.db import connections, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from .benchmark import ROTAS, _preencher
+from .models import Aluno, Curso
+
+CACHE_DESLIGADO = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+# métodos de model chamados pelos serializers (fora das listas rápidas)
+CONSULTAS_AVULSAS = [
+    ('aluno.total_devido', lambda ids: Aluno(pk=ids['aluno']).total_devido()),
+    ('aluno.total_pago', lambda ids: Aluno(pk=ids['aluno']).total_pago()),
+    ('curso.total_matriculas', lambda ids: Curso(pk=ids['curso']).total_matriculas()),
+    ('curso.total_arrecadado', lambda ids: Curso(pk=ids['curso'], valor_inscricao=0).total_arrecadado()),
+]
+
+_LEITURA = re.compile(r'^\s*(SELECT|WITH)\b', re.IGNORECASE)
+
+
+@dataclass
+class Alerta:
+    tipo: str
+    tabela: str
+    detalhe: str
+
+
+@dataclass
+class Consulta:
+    alias: str
+    sql: str
+    alertas: list = field(default_factory=list)
+    tempo_ms: float | None = None
+    buffers: int | None = None
+
+
+def capturar(executar):
+    """SELECTs distintos executados por `executar()`, em todos os bancos"""
+    with override_settings(CACHES=CACHE_DESLIGADO), ExitStack() as pilha:
+        capturas = {
+            alias: pilha.enter_context(CaptureQueriesContext(connections[alias]))
+            for alias in connections
+        }
+        with transaction.atomic():
+            executar()
+            transaction.set_rollback(True)
+
+    consultas = []
+    vistas = set()
+    for alias, captura in capturas.items():
+        for item in captura.captured_queries:
+            sql = item['sql']
+            if _LEITURA.match(sql) and (alias, sql) not in vistas:
+                vistas.add((alias, sql))
+                consultas.append(Consulta(alias, sql))
+    return consultas
+
+
+def consultas_da_rota(rota, ids, client=None):
+    client = client or Client()
+    url = _preencher(rota.url, ids)
+    dados = _preencher(rota.dados, ids)
+
+    def executar():
+        if rota.metodo == 'get':
+            resposta = client.get(url)
+        else:
+            resposta = getattr(client, rota.metodo)(url, dados, content_type='application/json')
+        if resposta.streaming:
+            b''.join(resposta.streaming_content)
+
+    return capturar(executar)
+
+
+def auditar(consulta, min_linhas=1000, fator_estimativa=10):
+    """roda o EXPLAIN da consulta e preenche alertas, tempo e buffers"""
+    conexao = connections[consulta.alias]
+    if conexao.vendor == 'postgresql':
+        _auditar_postgres(conexao, consulta, min_linhas, fator_estimativa)
+    else:
+        _auditar_sqlite(conexao, consulta, min_linhas)
+    return consulta
+
+
+def _auditar_postgres(conexao, consulta, min_linhas, fator_estimativa):
+    with transaction.atomic(using=conexao.alias):
+        with conexao.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {consulta.sql}')
+            resultado = cursor.fetchone()[0]
+        transaction.set_rollback(True, using=conexao.alias)
+    if isinstance(resultado, str):
+        resultado = json.loads(resultado)
+    plano = resultado[0]
+    consulta.tempo_ms = plano.get('Execution Time')
+    raiz = plano['Plan']
+    consulta.buffers = raiz.get('Shared Hit Blocks', 0) + raiz.get('Shared Read Blocks', 0)
+
+    for no in _nos(raiz):
+        tabela = no.get('Relation Name', '')
+        loops = no.get('Actual Loops', 1) or 1
+        reais = no.get('Actual Rows', 0)
+        if no['Node Type'] in ('Seq Scan', 'Parallel Seq Scan'):
+            lidas = (reais + no.get('Rows Removed by Filter', 0)) * loops
+            if lidas >= min_linhas:
+                filtro = no.get('Filter')
+                consulta.alertas.append(Alerta(
+                    'seq_scan', tabela,
+                    f'{lidas} linhas lidas' + (f', filtro {filtro}' if filtro else ''),
+                ))
+        estimadas = no.get('Plan Rows', 0)
+        maior, menor = max(estimadas, reais), max(min(estimadas, reais), 1)
+        if 'Actual Rows' in no and maior >= 100 and maior / menor >= fator_estimativa:
+            consulta.alertas.append(Alerta(
+                'estimativa', tabela or no['Node Type'],
+                f"{no['Node Type']}: {estimadas} estimadas x {reais} reais por loop",
+            ))
+
+
+def _nos(no):
+    yield no
+    for filho in no.get('Plans', []):
+        yield from _nos(filho)
+
+
+def _auditar_sqlite(conexao, consulta, min_linhas):
+    with conexao.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {consulta.sql}')
+        linhas = cursor.fetchall()
+    for linha in linhas:
+        detalhe = linha[-1]
+        partes = detalhe.split()
+        if partes[:1] != ['SCAN'] or 'INDEX' in detalhe or len(partes) < 2:
+            continue
+        tabela = _tabela_do_apelido(conexao, consulta.sql, partes[1])
+        # sem tabela: varredura de subconsulta ou CTE já materializada
+        if tabela and _total_linhas(conexao, tabela) >= min_linhas:
+            consulta.alertas.append(Alerta('seq_scan', tabela, detalhe))
+
+
+def _tabela_do_apelido(conexao, sql, nome):
+    """o SQLite mostra o apelido da tabela no plano (FROM core_curso c)"""
+    if nome in conexao.introspection.table_names():
+        return nome
+    encontrado = re.search(
+        rf'(?:FROM|JOIN)\s+"?(\w+)"?\s+(?:AS\s+)?"?{re.escape(nome)}"?(?!\w)',
+        sql, re.IGNORECASE,
+    )
+    if encontrado and encontrado.group(1) in conexao.introspection.table_names():
+        return encontrado.group(1)
+    return None
+
+
+_totais_sqlite = {}
+
+
+def _total_linhas(conexao, tabela):
+    if (conexao.alias, tabela) not in _totais_sqlite:
+        with conexao.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM {conexao.ops.quote_name(tabela)}')
+            _totais_sqlite[conexao.alias, tabela] = cursor.fetchone()[0]
+    return _totais_sqlite[conexao.alias, tabela]
+
+
+def alvos(nomes=None):
+    """(nome, função que devolve as consultas) das rotas e consultas avulsas"""
+    for rota in ROTAS:
+        if not nomes or rota.nome in nomes:
+            yield rota.nome, lambda ids, rota=rota: consultas_da_rota(rota, ids)
+    for nome, chamar in CONSULTAS_AVULSAS:
+        if not nomes or nome in nomes:
+            yield nome, lambda ids, chamar=chamar: capturar(lambda: chamar(ids))
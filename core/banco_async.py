@@ -0,0 +1,116 @@
+"""
+Consultas SQL assíncronas para as views de core/views_async.py.
+
+No PostgreSQL, com o psycopg 3 instalado, a consulta roda numa
+AsyncConnection: enquanto o banco trabalha a corrotina fica suspensa e o
+event loop atende outras requisições, sem ocupar uma thread por relatório
+lento. Sem o psycopg 3 (ou fora do PostgreSQL) cai para a conexão
+síncrona do Django via sync_to_async.
+
+Com DB_POOL=1 (ver settings.py) as conexões assíncronas também vêm de um
+pool (AsyncConnectionPool, um por event loop) com os mesmos limites do
+pool síncrono; sem ele, cada consulta abre a sua conexão.
+
+Essas consultas não passam pelos execute_wrappers do Django, então não
+aparecem na contagem do MetricasMiddleware.
+"""
+import asyncio
+import weakref
+
+from asgiref.sync import sync_to_async
+from django.db import connections
+
+from .roteamento import alias_leitura
+
+try:
+    import psycopg
+except ImportError:  # psycopg2 apenas: sem driver assíncrono
+    psycopg = None
+
+try:
+    from psycopg_pool import AsyncConnectionPool
+except ImportError:
+    AsyncConnectionPool = None
+
+# event loop -> {alias: AsyncConnectionPool}; o pool só vale no loop em
+# que foi aberto
+_pools = weakref.WeakKeyDictionary()
+
+
+def usa_driver_async(alias='default'):
+    return psycopg is not None and connections[alias].vendor == 'postgresql'
+
+
+def _parametros_conexao(alias):
+    # os mesmos parâmetros que o backend do Django usa, menos as fábricas
+    # de cursor e o contexto de adaptação da conexão síncrona
+    parametros = connections[alias].get_connection_params()
+    parametros.pop('cursor_factory', None)
+    parametros.pop('context', None)
+    return parametros
+
+
+def _opcoes_pool(alias):
+    opcoes = connections[alias].settings_dict['OPTIONS'].get('pool')
+    if not opcoes or AsyncConnectionPool is None:
+        return None
+    opcoes = {} if opcoes is True else dict(opcoes)
+    # a checagem síncrona do settings vira a assíncrona
+    opcoes.pop('check', None)
+    return opcoes
+
+
+async def _pool(alias):
+    opcoes = _opcoes_pool(alias)
+    if opcoes is None:
+        return None
+    pools = _pools.setdefault(asyncio.get_running_loop(), {})
+    if alias not in pools:
+        pool = AsyncConnectionPool(
+            kwargs={**_parametros_conexao(alias), 'autocommit': True},
+            open=False,
+            check=AsyncConnectionPool.check_connection,
+            **opcoes,
+        )
+        pools[alias] = pool
+        await pool.open()
+    return pools[alias]
+
+
+def pools_abertos():
+    """(alias, pool) dos pools assíncronos de todos os event loops"""
+    return [
+        (alias, pool)
+        for pools in list(_pools.values())
+        for alias, pool in pools.items()
+    ]
+
+
+async def executar(sql, params=None, alias=None):
+    """executa `sql` e retorna (colunas, linhas); por padrão numa réplica"""
+    alias = alias or alias_leitura()
+    if not usa_driver_async(alias):
+        return await sync_to_async(_executar_sync)(sql, params, alias)
+
+    pool = await _pool(alias)
+    if pool is not None:
+        async with pool.connection() as conexao:
+            return await _executar(conexao, sql, params)
+
+    parametros = _parametros_conexao(alias)
+    async with await psycopg.AsyncConnection.connect(**parametros, autocommit=True) as conexao:
+        return await _executar(conexao, sql, params)
+
+
+async def _executar(conexao, sql, params):
+    async with conexao.cursor() as cursor:
+        await cursor.execute(sql, params)
+        colunas = [coluna.name for coluna in cursor.description]
+        return colunas, await cursor.fetchall()
+
+
+def _executar_sync(sql, params, alias):
+    with connections[alias].cursor() as cursor:
+        cursor.execute(sql, params)
+        colunas = [coluna[0] for coluna in cursor.description]
+        return colunas, cursor.fetchall()
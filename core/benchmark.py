@@ -0,0 +1,338 @@
+"""
+Benchmark das rotas de core/urls.py (comando benchmark).
+
+Cada rota é chamada N vezes pelo django.test.Client, no mesmo processo,
+contra o banco configurado (popule antes com gerar_dados). Para cada uma
+são medidos p50/p95/p99 da latência e o número de consultas SQL, que é
+comparado com o orçamento da rota: o número de consultas não deve
+crescer com o volume de dados nem com o tamanho da página, então
+qualquer aumento indica um N+1 novo. Os limites de latência valem para o
+volume padrão do gerar_dados; em outras escalas ou máquinas use
+--fator-latencia. As rotas de escrita rodam dentro de
+uma transação desfeita no final.
+"""
+import statistics
+import time
+from contextlib import ExitStack
+from dataclasses import dataclass
+from string import Formatter
+
+from django.db import connections, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from .dados import cpf_sequencial
+from .models import Curso, JobRelatorio, Matricula
+
+
+@dataclass(frozen=True)
+class Rota:
+    nome: str
+    url: str
+    # consultas SQL por requisição; None = ainda sem orçamento (N+1 conhecido)
+    orcamento_consultas: int | None
+    # limite do p95 em milissegundos
+    limite_p95_ms: float = 500
+    metodo: str = 'get'
+    dados: dict = None
+
+
+# corpo dos POST/PUT de aluno e curso; o CPF fica fora da faixa do gerar_dados
+ALUNO_BENCHMARK = {
+    'nome': 'Aluno Benchmark',
+    'email': 'benchmark@exemplo.com.br',
+    'cpf': cpf_sequencial(987_654_321),
+    'data_ingresso': '2024-01-15',
+}
+CURSO_BENCHMARK = {
+    'nome': 'Curso Benchmark',
+    'carga_horaria': 40,
+    'valor_inscricao': '250.00',
+    'status': 'ATIVO',
+}
+
+ROTAS = [
+    Rota('api_raiz', '/api/', 0),
+    Rota('alunos_lista', '/api/alunos/', 2),
+    Rota('alunos_keyset', '/api/alunos/?paginacao=keyset', 1),
+    Rota('alunos_busca_nome', '/api/alunos/?nome=silva', 2),
+    Rota('alunos_busca_relevancia', '/api/alunos/?q=maria', 2),
+    Rota('aluno_detalhe', '/api/alunos/{aluno}/', 1),
+    Rota('aluno_matriculas', '/api/alunos/{aluno}/matriculas/', 3),
+    Rota('aluno_financeiro', '/api/alunos/{aluno}/financeiro/', 1),
+    Rota('cursos_lista', '/api/cursos/', 2),
+    Rota('curso_detalhe', '/api/cursos/{curso}/', 3),
+    Rota('curso_matriculas', '/api/cursos/{curso}/matriculas/', 3),
+    Rota('curso_matriculas_filtro', '/api/cursos/{curso}/matriculas/?status=PAGO&data_inicio=2022-01-01', 3),
+    Rota('curso_estatisticas', '/api/cursos/{curso}/estatisticas/', 1),
+    Rota('matriculas_lista', '/api/matriculas/', 2),
+    Rota('matriculas_keyset', '/api/matriculas/?paginacao=keyset', 1),
+    Rota('matricula_detalhe', '/api/matriculas/{matricula}/', 1),
+    Rota('matriculas_resumo_financeiro', '/api/matriculas/resumo_financeiro/', 2),
+    # inclui a atualização do livro de saldos, dos rollups de receita e o
+    # INSERT dos eventos da outbox
+    Rota(
+        'matriculas_transicao_status', '/api/matriculas/transicao-status/', 9,
+        metodo='post', dados={'status': 'PAGO', 'aluno': '{aluno}'},
+    ),
+    Rota(
+        'matricula_marcar_pago', '/api/matriculas/{matricula}/marcar_pago/', 6,
+        metodo='post', dados={},
+    ),
+    Rota(
+        'matricula_marcar_pendente', '/api/matriculas/{matricula}/marcar_pendente/', 12,
+        metodo='post', dados={},
+    ),
+    Rota(
+        'matriculas_bulk', '/api/matriculas/bulk/', 14, metodo='post',
+        dados={'modo': 'parcial', 'itens': [{'aluno': '{aluno}', 'curso': '{curso_livre}'}]},
+    ),
+    # escritas do CRUD (com saldos, rollups, outbox e cache). As do curso
+    # ficam sem orçamento: o PUT recalcula os saldos dos alunos do curso em
+    # lotes e o DELETE apaga as matrículas de 100 em 100 (Collector do
+    # Django), então as consultas crescem com o curso
+    Rota('aluno_criar', '/api/alunos/', 7, metodo='post', dados=ALUNO_BENCHMARK),
+    Rota('aluno_atualizar', '/api/alunos/{aluno}/', 4, metodo='put', dados=ALUNO_BENCHMARK),
+    Rota('aluno_excluir', '/api/alunos/{aluno}/', 10, metodo='delete'),
+    Rota('curso_criar', '/api/cursos/', 5, metodo='post', dados=CURSO_BENCHMARK),
+    Rota('curso_atualizar', '/api/cursos/{curso}/', None, metodo='put', dados=CURSO_BENCHMARK),
+    Rota('curso_excluir', '/api/cursos/{curso}/', None, metodo='delete'),
+    Rota(
+        'matricula_criar', '/api/matriculas/', 11, metodo='post',
+        # sem data_matricula o default (timezone.now) devolve um datetime que
+        # o DateField do serializer recusa
+        dados={'aluno': '{aluno}', 'curso': '{curso_livre}', 'status': 'PENDENTE', 'data_matricula': '2024-01-15'},
+    ),
+    Rota(
+        'matricula_atualizar', '/api/matriculas/{matricula}/', 16, metodo='put',
+        dados={'aluno': '{aluno}', 'curso': '{curso}', 'status': 'PAGO', 'data_matricula': '2024-01-15'},
+    ),
+    Rota('matricula_excluir', '/api/matriculas/{matricula}/', 8, metodo='delete'),
+    Rota('relatorio_sql', '/api/relatorio-sql/?format=json', 2, limite_p95_ms=5000),
+    Rota('relatorio_sql_csv', '/api/relatorio-sql/?format=csv', 2, limite_p95_ms=5000),
+    Rota('cursos_populares_sql', '/api/cursos-populares-sql/?format=json', 2, limite_p95_ms=2000),
+    Rota('relatorio_receita_mes', '/api/relatorios/receita/?granularidade=mes', 1, limite_p95_ms=200),
+    Rota(
+        'relatorio_receita_dia_curso',
+        '/api/relatorios/receita/?granularidade=dia&curso={curso}&inicio=2023-01-01', 1,
+        limite_p95_ms=200,
+    ),
+    Rota('relatorio_pendencias', '/api/relatorios/pendencias/', 1),
+    Rota('matriculas_pendentes', '/api/matriculas/pendentes/?faixa=90%2B', 2),
+    Rota('matriculas_pendentes_keyset', '/api/matriculas/pendentes/?faixa=90%2B&paginacao=keyset', 1),
+    Rota('relatorio_jobs_lista', '/api/relatorios/jobs/', 2),
+    Rota(
+        'relatorio_job_criar', '/api/relatorios/jobs/', 4,
+        metodo='post', dados={'tipo': 'cursos_populares', 'formato': 'csv'},
+    ),
+    Rota('relatorio_job_detalhe', '/api/relatorios/jobs/{job}/', 1),
+    Rota('relatorio_job_download', '/api/relatorios/jobs/{job}/download/', 1),
+    Rota('cache_estatisticas', '/api/cache/estatisticas/', 0),
+    Rota('metricas', '/api/_metrics', 0),
+    Rota('dashboard', '/', 2),
+    Rota('aluno_lista_html', '/alunos/', 1, limite_p95_ms=5000),
+    Rota('aluno_historico_html', '/alunos/{aluno}/', 1),
+]
+
+
+def ids_de_exemplo():
+    """
+    aluno, curso e matrícula reais para preencher as URLs, um curso ativo
+    em que o aluno não está matriculado e o último job concluído (None se
+    não houver)
+    """
+    matricula = Matricula.objects.order_by('pk').values('pk', 'aluno_id', 'curso_id').first()
+    if matricula is None:
+        raise ValueError('Não há matrículas; rode gerar_dados antes do benchmark.')
+    curso_livre = (
+        Curso.objects.filter(status='ATIVO')
+        .exclude(matriculas__aluno_id=matricula['aluno_id'])
+        .order_by('pk').values_list('pk', flat=True).first()
+    )
+    job = (
+        JobRelatorio.objects.filter(status='CONCLUIDO')
+        .order_by('-pk').values_list('pk', flat=True).first()
+    )
+    return {
+        'aluno': matricula['aluno_id'],
+        'curso': matricula['curso_id'],
+        'matricula': matricula['pk'],
+        'curso_livre': curso_livre,
+        'job': job,
+    }
+
+
+def _campos(valor):
+    if isinstance(valor, str):
+        return {campo for _, campo, _, _ in Formatter().parse(valor) if campo}
+    if isinstance(valor, dict):
+        return set().union(*map(_campos, valor.values()))
+    if isinstance(valor, list):
+        return set().union(*map(_campos, valor))
+    return set()
+
+
+def aplicavel(rota, ids):
+    """False se a rota usa um id que não existe no banco (ex.: sem job concluído)"""
+    return all(ids.get(campo) is not None for campo in _campos(rota.url) | _campos(rota.dados))
+
+
+def _preencher(valor, ids):
+    if isinstance(valor, str):
+        return valor.format(**ids)
+    if isinstance(valor, dict):
+        return {chave: _preencher(item, ids) for chave, item in valor.items()}
+    if isinstance(valor, list):
+        return [_preencher(item, ids) for item in valor]
+    return valor
+
+
+def percentil(amostras, p):
+    if len(amostras) == 1:
+        return amostras[0]
+    return statistics.quantiles(amostras, n=100, method='inclusive')[p - 1]
+
+
+def medir(rota, ids, repeticoes=20, aquecimento=2, client=None):
+    """
+    Executa a rota e retorna um dict com status, latências (ms) e o
+    máximo de consultas observado.
+    """
+    client = client or Client()
+    url = _preencher(rota.url, ids)
+    dados = _preencher(rota.dados, ids)
+    chamar = getattr(client, rota.metodo)
+
+    def requisitar():
+        # conta as consultas do primário e das réplicas
+        with ExitStack() as pilha:
+            capturas = [
+                pilha.enter_context(CaptureQueriesContext(connections[alias]))
+                for alias in connections
+            ]
+            inicio = time.perf_counter()
+            if rota.metodo == 'get':
+                resposta = chamar(url)
+            else:
+                resposta = chamar(url, dados, content_type='application/json')
+            if resposta.streaming:
+                b''.join(resposta.streaming_content)
+            duracao = (time.perf_counter() - inicio) * 1000
+        return resposta.status_code, duracao, sum(len(captura) for captura in capturas)
+
+    latencias = []
+    max_consultas = 0
+    status = None
+    for i in range(aquecimento + repeticoes):
+        if rota.metodo == 'get':
+            status, duracao, quantidade = requisitar()
+        else:
+            with transaction.atomic():
+                status, duracao, quantidade = requisitar()
+                transaction.set_rollback(True)
+        if i >= aquecimento:
+            latencias.append(duracao)
+            max_consultas = max(max_consultas, quantidade)
+
+    return {
+        'rota': rota.nome,
+        'url': url,
+        'status': status,
+        'p50_ms': round(percentil(latencias, 50), 2),
+        'p95_ms': round(percentil(latencias, 95), 2),
+        'p99_ms': round(percentil(latencias, 99), 2),
+        'consultas': max_consultas,
+        'orcamento_consultas': rota.orcamento_consultas,
+        'limite_p95_ms': rota.limite_p95_ms,
+    }
+
+
+def violacoes(resultado, fator_latencia=1.0):
+    """motivos pelos quais o resultado de uma rota reprova"""
+    motivos = []
+    if resultado['status'] >= 400:
+        motivos.append(f"status {resultado['status']}")
+    orcamento = resultado['orcamento_consultas']
+    if orcamento is not None and resultado['consultas'] > orcamento:
+        motivos.append(
+            f"{resultado['consultas']} consultas (orçamento {orcamento})"
+        )
+    limite = resultado['limite_p95_ms'] * fator_latencia
+    if resultado['p95_ms'] > limite:
+        motivos.append(f"p95 {resultado['p95_ms']} ms (limite {limite:g} ms)")
+    return motivos
+
+
+# ============================================
+# SINCRONO x ASSINCRONO (comando benchmark_async)
+# ============================================
+
+# (nome, rota síncrona, rota assíncrona equivalente)
+PARES_ASYNC = [
+    ('alunos_lista', '/api/alunos/', '/api/async/alunos/'),
+    ('aluno_detalhe', '/api/alunos/{aluno}/', '/api/async/alunos/{aluno}/'),
+    ('aluno_financeiro', '/api/alunos/{aluno}/financeiro/', '/api/async/alunos/{aluno}/financeiro/'),
+    ('matriculas_lista', '/api/matriculas/', '/api/async/matriculas/'),
+    ('cursos_lista', '/api/cursos/', '/api/async/cursos/'),
+    ('curso_detalhe', '/api/cursos/{curso}/', '/api/async/cursos/{curso}/'),
+    ('curso_estatisticas', '/api/cursos/{curso}/estatisticas/', '/api/async/cursos/{curso}/estatisticas/'),
+    ('relatorio_sql', '/api/relatorio-sql/?format=json', '/api/async/relatorio-sql/'),
+    ('cursos_populares_sql', '/api/cursos-populares-sql/?format=json', '/api/async/cursos-populares-sql/'),
+    ('dashboard', '/', '/async/'),
+]
+
+
+def _resumo(latencias, duracao_total, status):
+    return {
+        'requisicoes': len(latencias),
+        'por_segundo': round(len(latencias) / duracao_total, 1),
+        'p50_ms': round(percentil(latencias, 50), 2),
+        'p95_ms': round(percentil(latencias, 95), 2),
+        'p99_ms': round(percentil(latencias, 99), 2),
+        'erros': sum(1 for codigo in status if codigo >= 400),
+    }
+
+
+def medir_concorrente_sync(url, requisicoes, concorrencia):
+    """
+    Simula um servidor WSGI com `concorrencia` threads (django.test.Client
+    em um ThreadPoolExecutor).
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    def requisitar(_):
+        inicio = time.perf_counter()
+        codigo = Client().get(url).status_code
+        latencia = (time.perf_counter() - inicio) * 1000
+        connections.close_all()
+        return latencia, codigo
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concorrencia) as executor:
+        resultados = list(executor.map(requisitar, range(requisicoes)))
+    duracao = time.perf_counter() - inicio
+    return _resumo([r[0] for r in resultados], duracao, [r[1] for r in resultados])
+
+
+async def medir_concorrente_async(url, requisicoes, concorrencia):
+    """
+    Requisições pelo handler ASGI (AsyncClient) num único event loop, no
+    máximo `concorrencia` ao mesmo tempo.
+    """
+    import asyncio
+
+    from django.test import AsyncClient
+
+    limite = asyncio.Semaphore(concorrencia)
+    client = AsyncClient()
+
+    async def requisitar():
+        async with limite:
+            inicio = time.perf_counter()
+            resposta = await client.get(url)
+            return (time.perf_counter() - inicio) * 1000, resposta.status_code
+
+    inicio = time.perf_counter()
+    resultados = await asyncio.gather(*(requisitar() for _ in range(requisicoes)))
+    duracao = time.perf_counter() - inicio
+    return _resumo([r[0] for r in resultados], duracao, [r[1] for r in resultados])
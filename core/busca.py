@@ -0,0 +1,109 @@
+"""
+Busca por nome (alunos, cursos e admin).
+
+No PostgreSQL a busca usa índices GIN com pg_trgm sobre core_unaccent(nome)
+(migration 0004), então `ILIKE '%termo%'` e a similaridade por trigramas
+não fazem varredura sequencial e ignoram acentos ("joao" encontra "João").
+Em outros bancos (ex.: SQLite no desenvolvimento local) cai para icontains.
+
+- filtrar_por_nome: substring sem acento (?nome=);
+- filtro_contem: substring sem distinguir maiúsculas, com acento (e-mail,
+  índice idx_aluno_email_trgm da migration 0012);
+- buscar_por_relevancia: similaridade de palavras ranqueada (?q=).
+"""
+import unicodedata
+
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db import connections
+from django.db.models import CharField, FloatField, Lookup, Q, Transform, Value
+
+
+def remover_acentos(texto):
+    """mesma normalização do unaccent do Postgres para o português"""
+    decomposto = unicodedata.normalize('NFKD', texto)
+    return ''.join(c for c in decomposto if not unicodedata.combining(c))
+
+
+def escapar_like(texto):
+    return texto.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+@CharField.register_lookup
+class SemAcento(Transform):
+    """core_unaccent(campo): wrapper IMMUTABLE do unaccent, indexável"""
+    lookup_name = 'sem_acento'
+    function = 'core_unaccent'
+    output_field = CharField()
+
+
+@CharField.register_lookup
+class ILike(Lookup):
+    """campo ILIKE padrao, sem o UPPER() do icontains (que impede o índice)"""
+    lookup_name = 'ilike'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} ILIKE {rhs}', lhs_params + rhs_params
+
+
+def usa_trigram(queryset):
+    return connections[queryset.db].vendor == 'postgresql'
+
+
+def _q_contem(campo, termo):
+    padrao = f'%{escapar_like(remover_acentos(termo))}%'
+    return Q(**{f'{campo}__sem_acento__ilike': padrao})
+
+
+def filtro_por_nome(queryset, campos, termo):
+    """
+    Q de substring sem acento em qualquer um dos `campos`.
+    """
+    if isinstance(campos, str):
+        campos = [campos]
+    filtro = Q()
+    for campo in campos:
+        if usa_trigram(queryset):
+            filtro |= _q_contem(campo, termo)
+        else:
+            filtro |= Q(**{f'{campo}__icontains': termo})
+    return filtro
+
+
+def filtro_contem(queryset, campos, termo):
+    """
+    Q de substring sem distinguir maiúsculas em qualquer um dos `campos`.
+    No PostgreSQL usa ILIKE direto no campo, coberto por um índice
+    trigram (o icontains aplica UPPER() e não usa o índice).
+    """
+    filtro = Q()
+    for campo in campos:
+        if usa_trigram(queryset):
+            filtro |= Q(**{f'{campo}__ilike': f'%{escapar_like(termo)}%'})
+        else:
+            filtro |= Q(**{f'{campo}__icontains': termo})
+    return filtro
+
+
+def filtrar_por_nome(queryset, campos, termo):
+    return queryset.filter(filtro_por_nome(queryset, campos, termo))
+
+
+def buscar_por_relevancia(queryset, campo, termo):
+    """
+    Busca ranqueada: anota `similaridade` (0 a 1) e ordena pela mais alta.
+    Encontra nomes com erros de digitação ("joao silvs") e substrings.
+    """
+    if not usa_trigram(queryset):
+        return filtrar_por_nome(queryset, campo, termo).annotate(
+            similaridade=Value(1.0, output_field=FloatField())
+        )
+
+    termo_normalizado = remover_acentos(termo)
+    return queryset.filter(
+        Q(**{f'{campo}__sem_acento__trigram_word_similar': termo_normalizado})
+        | _q_contem(campo, termo)
+    ).annotate(
+        similaridade=TrigramWordSimilarity(termo_normalizado, SemAcento(campo))
+    ).order_by('-similaridade', 'pk')
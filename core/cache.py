@@ -0,0 +1,267 @@
+"""
+Cache versionado dos resumos (dashboard, resumo financeiro).
+
+Cada model (Aluno, Curso, Matricula) tem uma geracao guardada no proprio
+cache. As chaves dos resumos incluem as geracoes dos models de que
+dependem, entao qualquer escrita (save, delete, QuerySet.update ou
+bulk_create) troca a geracao e torna as entradas antigas inalcancaveis,
+sem precisar apagar chave por chave.
+
+Geracoes e versoes sao valores aleatorios, nao contadores: se a chave for
+despejada (ou o cache reiniciar), a nova nunca repete uma anterior e nao
+reaproveita resumos gravados com ela. Os resumos expiram com o TIMEOUT de
+CACHES (CACHE_TIMEOUT).
+
+Junto com a geracao fica guardada a hora da ultima escrita em cada model,
+usada como Last-Modified pelo GET condicional (core/condicional.py).
+
+Os fragmentos por aluno (historico em aluno_historico_view) usam uma
+versao propria de cada aluno, trocada quando as matriculas ou os dados
+dele mudam, mais a geracao de Curso (nome, carga e valor aparecem no
+historico). Assim uma matricula nova invalida so o historico do aluno.
+
+Funciona com locmem (um worker) ou com um backend compartilhado (file,
+redis) quando ha varios workers; ver CACHES em settings.py. Com locmem
+cada processo tem as proprias geracoes, entao o que precisa delas fora do
+processo que escreveu (GET condicional, aquecimento pela outbox) confere
+cache_compartilhado() antes.
+"""
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .models import Aluno, Curso, Matricula
+from .signals import lote_criado, queryset_atualizado
+
+PREFIXO = 'core'
+MODELS_VERSIONADOS = (Aluno, Curso, Matricula)
+
+CHAVE_ACERTOS = f'{PREFIXO}:stats:acertos'
+CHAVE_FALHAS = f'{PREFIXO}:stats:falhas'
+
+# backends por processo: cada worker ve so as proprias escritas
+BACKENDS_LOCAIS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def cache_compartilhado():
+    """True se todos os workers enxergam as mesmas geracoes"""
+    return settings.CACHES['default']['BACKEND'] not in BACKENDS_LOCAIS
+
+
+def _chave_geracao(model):
+    return f'{PREFIXO}:geracao:{model._meta.model_name}'
+
+
+def _chave_alteracao(model):
+    return f'{PREFIXO}:alterado:{model._meta.model_name}'
+
+
+def _nova_versao():
+    return uuid.uuid4().hex[:12]
+
+
+def _obter_ou_criar_versao(chave):
+    # add nao sobrescreve se outro worker criou a chave antes
+    nova = _nova_versao()
+    cache.add(chave, nova, timeout=None)
+    return cache.get(chave, nova)
+
+
+def _geracoes(chaves, valores):
+    resultado = []
+    for chave in chaves:
+        if chave not in valores:
+            valores[chave] = _obter_ou_criar_versao(chave)
+        resultado.append(valores[chave])
+    return resultado
+
+
+def geracoes(*models):
+    """retorna as geracoes atuais dos models em uma unica ida ao cache"""
+    chaves = [_chave_geracao(model) for model in models]
+    return _geracoes(chaves, cache.get_many(chaves))
+
+
+def versao(*models):
+    """
+    (geracoes, alterado_em) dos models em uma unica ida ao cache.
+    alterado_em e o timestamp da escrita mais recente entre eles, ou None
+    se nenhuma foi registrada desde que o cache comecou.
+    """
+    chaves = [_chave_geracao(model) for model in models]
+    chaves_alteracao = [_chave_alteracao(model) for model in models]
+    valores = cache.get_many(chaves + chaves_alteracao)
+    alteracoes = [valores[chave] for chave in chaves_alteracao if chave in valores]
+    return _geracoes(chaves, valores), max(alteracoes, default=None)
+
+
+def incrementar_geracao(model):
+    cache.set(_chave_geracao(model), _nova_versao(), timeout=None)
+    cache.set(_chave_alteracao(model), time.time(), timeout=None)
+
+
+def obter_ou_calcular(nome, calcular, depende_de=MODELS_VERSIONADOS, timeout=DEFAULT_TIMEOUT):
+    """
+    Retorna o resumo `nome` do cache ou o calcula com `calcular()`.
+    A chave inclui as geracoes de `depende_de`; sem `timeout` vale o
+    TIMEOUT de CACHES.
+    """
+    versao = '.'.join(str(g) for g in geracoes(*depende_de))
+    chave = f'{PREFIXO}:{nome}:g{versao}'
+
+    valor = cache.get(chave)
+    if valor is not None:
+        _contar(CHAVE_ACERTOS)
+        return valor
+
+    _contar(CHAVE_FALHAS)
+    valor = calcular()
+    cache.set(chave, valor, timeout=timeout)
+    return valor
+
+
+def _chave_versao_aluno(aluno_id):
+    return f'{PREFIXO}:versao:aluno:{aluno_id}'
+
+
+def obter_ou_calcular_aluno(nome, aluno_id, calcular, timeout=DEFAULT_TIMEOUT):
+    """
+    Como obter_ou_calcular, para dados de um aluno: a chave inclui a
+    versao do aluno e a geracao de Curso. None (aluno inexistente) nao
+    vai para o cache.
+    """
+    chave_versao = _chave_versao_aluno(aluno_id)
+    chave_curso = _chave_geracao(Curso)
+    valores = cache.get_many([chave_versao, chave_curso])
+    versao_aluno = valores.get(chave_versao) or _obter_ou_criar_versao(chave_versao)
+    geracao_curso = valores.get(chave_curso) or geracoes(Curso)[0]
+    chave = f'{PREFIXO}:{nome}:{aluno_id}:v{versao_aluno}.g{geracao_curso}'
+
+    valor = cache.get(chave)
+    if valor is not None:
+        _contar(CHAVE_ACERTOS)
+        return valor
+
+    _contar(CHAVE_FALHAS)
+    valor = calcular()
+    if valor is not None:
+        cache.set(chave, valor, timeout=timeout)
+    return valor
+
+
+def trocar_versao_alunos(aluno_ids):
+    """
+    Nova versao para cada aluno em uma unica ida ao cache (set_many, em
+    vez de um incr por aluno nas escritas em massa).
+    """
+    versao = _nova_versao()
+    cache.set_many(
+        {_chave_versao_aluno(aluno_id): versao for aluno_id in aluno_ids},
+        timeout=None,
+    )
+
+
+def _contar(chave):
+    try:
+        cache.incr(chave)
+    except ValueError:
+        if not cache.add(chave, 1, timeout=None):
+            cache.incr(chave)
+
+
+def estatisticas():
+    """contadores de acertos e falhas do cache de resumos"""
+    valores = cache.get_many([CHAVE_ACERTOS, CHAVE_FALHAS])
+    acertos = valores.get(CHAVE_ACERTOS, 0)
+    falhas = valores.get(CHAVE_FALHAS, 0)
+    total = acertos + falhas
+    return {
+        'acertos': acertos,
+        'falhas': falhas,
+        'taxa_acerto': round(acertos / total * 100, 2) if total > 0 else 0,
+        'geracoes': dict(zip(
+            [model._meta.model_name for model in MODELS_VERSIONADOS],
+            geracoes(*MODELS_VERSIONADOS),
+        )),
+    }
+
+
+# ============================================
+# INVALIDACAO (sinais)
+# ============================================
+
+def _invalidar(model, using=None):
+    # so depois do commit: antes disso outro worker ainda poderia
+    # recalcular com os dados antigos e gravar na geracao nova
+    transaction.on_commit(lambda: incrementar_geracao(model), using=using)
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidar_por_escrita(sender, using=None, **kwargs):
+    if sender in MODELS_VERSIONADOS:
+        _invalidar(sender, using)
+
+
+@receiver(queryset_atualizado)
+@receiver(lote_criado)
+def invalidar_em_massa(sender, using=None, **kwargs):
+    if sender in MODELS_VERSIONADOS:
+        _invalidar(sender, using)
+
+
+# fragmentos por aluno
+
+def _invalidar_alunos(aluno_ids, using=None):
+    aluno_ids = set(aluno_ids) - {None}
+    if aluno_ids:
+        transaction.on_commit(lambda: trocar_versao_alunos(aluno_ids), using=using)
+
+
+@receiver(post_init, sender=Matricula)
+def guardar_aluno_matricula(sender, instance, **kwargs):
+    # aluno antes do save: trocar o aluno muda o historico dos dois
+    instance._cache_aluno_id = instance.__dict__.get('aluno_id')
+
+
+@receiver(post_save, sender=Matricula)
+@receiver(post_delete, sender=Matricula)
+def invalidar_aluno_por_matricula(sender, instance, using=None, **kwargs):
+    _invalidar_alunos({instance.aluno_id, instance._cache_aluno_id}, using)
+    instance._cache_aluno_id = instance.aluno_id
+
+
+@receiver(post_save, sender=Aluno)
+@receiver(post_delete, sender=Aluno)
+def invalidar_aluno(sender, instance, using=None, **kwargs):
+    _invalidar_alunos({instance.pk}, using)
+
+
+@receiver(queryset_atualizado, sender=Matricula)
+def invalidar_alunos_matriculas_em_massa(sender, anteriores, campos, using=None, **kwargs):
+    aluno_ids = {item['aluno_id'] for item in anteriores}
+    if campos & {'aluno', 'aluno_id'}:
+        # o novo aluno so e conhecido depois do update
+        aluno_ids |= set(Matricula.objects.using(using).filter(
+            pk__in=[item['pk'] for item in anteriores]
+        ).values_list('aluno_id', flat=True))
+    _invalidar_alunos(aluno_ids, using)
+
+
+@receiver(queryset_atualizado, sender=Aluno)
+def invalidar_alunos_em_massa(sender, anteriores, using=None, **kwargs):
+    _invalidar_alunos({item['pk'] for item in anteriores}, using)
+
+
+@receiver(lote_criado, sender=Matricula)
+def invalidar_alunos_lote(sender, objs, using=None, **kwargs):
+    _invalidar_alunos({obj.aluno_id for obj in objs}, using)
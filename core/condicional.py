@@ -0,0 +1,134 @@
+"""
+GET condicional (ETag / Last-Modified) para a API.
+
+Os validadores saem do cache versionado (core/cache.py), sem consultar o
+banco: o ETag é um hash da URL completa, do Accept e das gerações dos
+models de que a resposta depende, e o Last-Modified é a hora da última
+escrita registrada nesses models. Se o cliente manda If-None-Match ou
+If-Modified-Since ainda válidos, a resposta é um 304 antes de qualquer
+consulta ou serialização.
+
+As gerações são globais por model: qualquer escrita em Matricula invalida
+os ETags de todas as respostas que dependem dela. É grosseiro, e só vale
+com um cache compartilhado entre os workers (file ou redis, ver CACHES em
+settings.py): com locmem cada processo tem as próprias gerações e um
+worker que não viu a escrita devolveria 304 para um dado que mudou, então
+as respostas vão sem validadores (cache_compartilhado() em core/cache.py).
+Mesmo com o cache compartilhado, escritas que não passam pelo ORM (SQL
+direto) não trocam a geração, e a troca acontece logo depois do commit:
+nesse intervalo curto ainda pode sair um 304 para um dado que acabou
+de mudar.
+
+Os relatórios servidos da view materializada usam a hora do último
+REFRESH (AtualizacaoRelatorio) e ETag fraco, já que o corpo traz a
+defasagem, que muda a cada segundo.
+
+Com réplicas (core/roteamento.py), uma leitura da réplica logo depois de
+uma escrita pode ainda não enxergá-la; nesse intervalo
+(REPLICA_FIXACAO_SEGUNDOS) a resposta vai sem validadores para o cliente
+não guardar o dado antigo sob o ETag novo.
+"""
+import hashlib
+import time
+from datetime import datetime
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from .cache import MODELS_VERSIONADOS, cache_compartilhado, versao
+from .roteamento import alias_leitura
+
+METODOS_CONDICIONAIS = {'GET', 'HEAD'}
+
+
+def etag_para(request, *partes, fraco=False):
+    """ETag da URL completa + Accept + partes (gerações, datas...)"""
+    texto = '|'.join([
+        request.get_full_path(),
+        request.META.get('HTTP_ACCEPT', ''),
+        *(str(parte) for parte in partes),
+    ])
+    etag = quote_etag(hashlib.md5(texto.encode(), usedforsecurity=False).hexdigest())
+    return f'W/{etag}' if fraco else etag
+
+
+def _replica_defasada(alterado_em):
+    if alterado_em is None or alias_leitura() == DEFAULT_DB_ALIAS:
+        return False
+    return time.time() - alterado_em < settings.REPLICA_FIXACAO_SEGUNDOS
+
+
+def validadores(request, depende_de=MODELS_VERSIONADOS):
+    """(etag, alterado_em) da resposta, ou (None, None) sem validadores"""
+    if not cache_compartilhado():
+        return None, None
+    gens, alterado_em = versao(*depende_de)
+    if _replica_defasada(alterado_em):
+        return None, None
+    return etag_para(request, *gens), alterado_em
+
+
+def validadores_relatorio(request, metadados, depende_de=MODELS_VERSIONADOS):
+    """validadores de um relatório SQL a partir dos metadados de consulta_relatorio"""
+    if metadados['fonte'] != 'materializada':
+        etag, alterado_em = validadores(request, depende_de)
+        return etag and f'W/{etag}', alterado_em
+    gerado_em = metadados['gerado_em']
+    alterado_em = datetime.fromisoformat(gerado_em).timestamp() if gerado_em else None
+    return etag_para(request, gerado_em, fraco=True), alterado_em
+
+
+def nao_modificado(request, etag, alterado_em):
+    """HttpResponseNotModified se o cliente já tem a versão atual, senão None"""
+    if etag is None or request.method not in METODOS_CONDICIONAIS:
+        return None
+    return get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(alterado_em) if alterado_em is not None else None,
+    )
+
+
+def aplicar_validadores(response, etag, alterado_em):
+    if etag is None or response.status_code != 200:
+        return response
+    if not response.has_header('ETag'):
+        response.headers['ETag'] = etag
+    if alterado_em is not None and not response.has_header('Last-Modified'):
+        response.headers['Last-Modified'] = http_date(alterado_em)
+    return response
+
+
+def get_condicional(depende_de=MODELS_VERSIONADOS):
+    """
+    Decorator de views (síncronas ou assíncronas) cujo conteúdo depende só
+    da URL e dos models em `depende_de`. Nos ViewSets, use com
+    method_decorator.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def envoltorio(request, *args, **kwargs):
+                if request.method not in METODOS_CONDICIONAIS:
+                    return await view(request, *args, **kwargs)
+                etag, alterado_em = validadores(request, depende_de)
+                resposta = nao_modificado(request, etag, alterado_em)
+                if resposta is not None:
+                    return resposta
+                return aplicar_validadores(await view(request, *args, **kwargs), etag, alterado_em)
+        else:
+            @wraps(view)
+            def envoltorio(request, *args, **kwargs):
+                if request.method not in METODOS_CONDICIONAIS:
+                    return view(request, *args, **kwargs)
+                etag, alterado_em = validadores(request, depende_de)
+                resposta = nao_modificado(request, etag, alterado_em)
+                if resposta is not None:
+                    return resposta
+                return aplicar_validadores(view(request, *args, **kwargs), etag, alterado_em)
+        return envoltorio
+    return decorator
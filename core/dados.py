@@ -0,0 +1,171 @@
+"""
+Geração determinística de dados em volume (comando gerar_dados).
+
+Com a mesma semente e os mesmos volumes o resultado é sempre o mesmo:
+nomes, e-mails, CPFs (com dígitos verificadores válidos), datas, valores
+e status. A inserção é feita com bulk_create em lotes; as matrículas são
+geradas aluno a aluno, então cada lote recalcula no livro de saldos só
+os alunos que acabou de inserir.
+
+limpar() esvazia as tabelas sem passar pelos sinais (TRUNCATE no
+PostgreSQL) e deixa os dados derivados coerentes com o banco vazio.
+"""
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import connection, transaction
+
+from .models import (
+    Aluno, Curso, EventoOutbox, Matricula, ReceitaDiaria, ReceitaMensal, SaldoAluno,
+)
+from .validadores import digitos_verificadores_cpf
+
+TAMANHO_LOTE = 5000
+
+DATA_INICIAL = date(2020, 1, 1)
+DIAS_PERIODO = 6 * 365
+
+PRIMEIROS_NOMES = [
+    'Ana', 'João', 'Maria', 'José', 'Francisco', 'Antônia', 'Carlos', 'Paulo',
+    'Pedro', 'Lucas', 'Luiz', 'Marcos', 'Gabriel', 'Rafael', 'Juliana', 'Fernanda',
+    'Patrícia', 'Aline', 'Camila', 'Bruna', 'Letícia', 'Débora', 'Raimundo', 'Sebastião',
+]
+SOBRENOMES = [
+    'Silva', 'Santos', 'Oliveira', 'Souza', 'Lima', 'Pereira', 'Ferreira', 'Costa',
+    'Rodrigues', 'Almeida', 'Nascimento', 'Araújo', 'Carvalho', 'Gomes', 'Ribeiro',
+    'Martins', 'Rocha', 'Barbosa', 'Cavalcante', 'Magalhães',
+]
+TEMAS_CURSO = [
+    'Python', 'Django', 'SQL', 'PostgreSQL', 'JavaScript', 'React', 'Docker',
+    'Git', 'Linux', 'Algoritmos', 'Estruturas de Dados', 'APIs REST', 'Testes',
+    'Segurança', 'Cloud', 'Machine Learning', 'Estatística', 'Redes',
+]
+NIVEIS_CURSO = ['Básico', 'Intermediário', 'Avançado', 'na Prática']
+
+
+def cpf_sequencial(numero):
+    """CPF válido e único para cada número de 1 a 999.999.999"""
+    base = f'{numero:09d}'
+    return base + digitos_verificadores_cpf(base)
+
+
+def _data(rng):
+    return DATA_INICIAL + timedelta(days=rng.randrange(DIAS_PERIODO))
+
+
+def gerar_cursos(rng, quantidade):
+    for n in range(1, quantidade + 1):
+        tema = TEMAS_CURSO[(n - 1) % len(TEMAS_CURSO)]
+        nivel = NIVEIS_CURSO[(n - 1) // len(TEMAS_CURSO) % len(NIVEIS_CURSO)]
+        yield Curso(
+            nome=f'{tema} {nivel} {n}',
+            carga_horaria=rng.choice([20, 40, 60, 80, 120]),
+            valor_inscricao=Decimal(rng.randrange(9900, 149900, 100)) / 100,
+            status='ATIVO' if rng.random() < 0.9 else 'INATIVO',
+        )
+
+
+def gerar_alunos(rng, quantidade):
+    for n in range(1, quantidade + 1):
+        nome = f'{rng.choice(PRIMEIROS_NOMES)} {rng.choice(SOBRENOMES)} {rng.choice(SOBRENOMES)}'
+        yield Aluno(
+            nome=nome,
+            email=f'aluno{n}@exemplo.com.br',
+            cpf=cpf_sequencial(n),
+            data_ingresso=_data(rng),
+        )
+
+
+def gerar_matriculas(rng, aluno_ids, curso_ids, quantidade, proporcao_pagas=0.6):
+    """
+    Distribui `quantidade` matrículas entre os alunos (no máximo uma por
+    aluno e curso), em ordem de aluno.
+    """
+    por_aluno, sobra = divmod(quantidade, len(aluno_ids))
+    for i, aluno_id in enumerate(aluno_ids):
+        cursos = rng.sample(curso_ids, por_aluno + (1 if i < sobra else 0))
+        for curso_id in cursos:
+            yield Matricula(
+                aluno_id=aluno_id,
+                curso_id=curso_id,
+                data_matricula=_data(rng),
+                status='PAGO' if rng.random() < proporcao_pagas else 'PENDENTE',
+            )
+
+
+def inserir_em_lotes(model, objetos, tamanho_lote=TAMANHO_LOTE, progresso=None):
+    """bulk_create em lotes de um gerador; retorna quantos foram inseridos"""
+    total = 0
+    lote = []
+    for obj in objetos:
+        lote.append(obj)
+        if len(lote) >= tamanho_lote:
+            total += len(model.objects.bulk_create(lote))
+            lote = []
+            if progresso:
+                progresso(model, total)
+    if lote:
+        total += len(model.objects.bulk_create(lote))
+        if progresso:
+            progresso(model, total)
+    return total
+
+
+def _ids(model):
+    return list(model.objects.order_by('pk').values_list('pk', flat=True))
+
+
+# dependentes primeiro: fora do PostgreSQL a ordem evita violar as FKs
+TABELAS_LIMPAR = (
+    Matricula, SaldoAluno, ReceitaDiaria, ReceitaMensal, EventoOutbox, Aluno, Curso,
+)
+
+
+def limpar():
+    """
+    Apaga alunos, cursos, matrículas e o que deriva deles (livro de saldos,
+    rollups de receita, eventos da outbox) sem carregar nem sinalizar linha
+    por linha, invalida o cache e atualiza os relatórios materializados.
+    """
+    from .cache import MODELS_VERSIONADOS, incrementar_geracao
+    from .relatorios import atualizar_relatorios
+
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            tabelas = ', '.join(model._meta.db_table for model in TABELAS_LIMPAR)
+            with connection.cursor() as cursor:
+                cursor.execute(f'TRUNCATE {tabelas} RESTART IDENTITY CASCADE')
+        else:
+            for model in TABELAS_LIMPAR:
+                model.objects.all()._raw_delete(connection.alias)
+
+    # os ids recomeçam: gerações novas tornam inalcançáveis os resumos e
+    # fragmentos por aluno gravados com os dados antigos
+    for model in MODELS_VERSIONADOS:
+        incrementar_geracao(model)
+    atualizar_relatorios()
+
+
+def popular(alunos, cursos, matriculas, semente=42, tamanho_lote=TAMANHO_LOTE, progresso=None):
+    """
+    Insere os volumes pedidos e retorna {'alunos': n, 'cursos': n, 'matriculas': n}.
+    Espera as tabelas vazias (ver gerar_dados --limpar).
+    """
+    if matriculas > alunos * cursos:
+        raise ValueError('Há mais matrículas do que pares aluno/curso possíveis.')
+
+    rng = random.Random(semente)
+    resultado = {
+        'cursos': inserir_em_lotes(Curso, gerar_cursos(rng, cursos), tamanho_lote, progresso),
+        'alunos': inserir_em_lotes(Aluno, gerar_alunos(rng, alunos), tamanho_lote, progresso),
+        'matriculas': 0,
+    }
+    if matriculas:
+        resultado['matriculas'] = inserir_em_lotes(
+            Matricula,
+            gerar_matriculas(rng, _ids(Aluno), _ids(Curso), matriculas),
+            tamanho_lote,
+            progresso,
+        )
+    return resultado
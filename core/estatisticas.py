@@ -0,0 +1,228 @@
+"""
+Motor de estatisticas compartilhado.
+
+Todas as metricas de dashboard, resumo_financeiro, financeiro e
+estatisticas saem daqui, com uma passada de agregacao condicional por
+escopo:
+- por curso: uma consulta agrupada sobre curso + matriculas;
+- geral: soma das linhas por curso (poucas linhas) + contagem de alunos;
+- por aluno: leitura pela chave primaria no livro de saldos (SaldoAluno);
+- historico do aluno: linhas das matriculas com os totais calculados no
+  proprio banco (funcoes de janela), em uma consulta.
+
+As funcoes com prefixo `a` (como no ORM: afirst, acount) sao as versoes
+assincronas usadas pelas views de core/views_async.py.
+"""
+from decimal import Decimal
+
+from django.db.models import Case, Count, F, Q, Sum, Value, When, Window
+
+from .models import Aluno, Curso
+
+ZERO = Decimal('0')
+
+
+def _percentual(parte, total):
+    return (parte / total * 100) if total > 0 else 0
+
+
+def _consulta_por_curso(curso_ids=None):
+    cursos = Curso.objects.all()
+    if curso_ids is not None:
+        cursos = cursos.filter(pk__in=curso_ids)
+
+    return cursos.annotate(
+        total_matriculas=Count('matriculas'),
+        matriculas_pagas=Count('matriculas', filter=Q(matriculas__status='PAGO')),
+        matriculas_pendentes=Count('matriculas', filter=Q(matriculas__status='PENDENTE')),
+    ).order_by('nome', 'pk').values(
+        'id', 'nome', 'carga_horaria', 'valor_inscricao', 'status',
+        'total_matriculas', 'matriculas_pagas', 'matriculas_pendentes',
+    )
+
+
+def _linha_curso(linha):
+    valor = linha['valor_inscricao']
+    return {
+        'curso_id': linha['id'],
+        'curso_nome': linha['nome'],
+        'carga_horaria': linha['carga_horaria'],
+        'valor_inscricao': valor,
+        'status': linha['status'],
+        'total_matriculas': linha['total_matriculas'],
+        'matriculas_pagas': linha['matriculas_pagas'],
+        'matriculas_pendentes': linha['matriculas_pendentes'],
+        # o valor e o mesmo para todas as matriculas do curso
+        'total_arrecadado': valor * linha['matriculas_pagas'],
+        'potencial_arrecadacao': valor * linha['matriculas_pendentes'],
+    }
+
+
+def estatisticas_por_curso(curso_ids=None):
+    """
+    Retorna uma lista de dicts (um por curso) calculada em uma unica
+    consulta com contagens condicionais.
+    """
+    return [_linha_curso(linha) for linha in _consulta_por_curso(curso_ids)]
+
+
+async def aestatisticas_por_curso(curso_ids=None):
+    """versao assincrona de estatisticas_por_curso"""
+    return [_linha_curso(linha) async for linha in _consulta_por_curso(curso_ids)]
+
+
+def estatisticas_curso(curso_id):
+    """estatisticas de um curso, ou None se ele nao existir"""
+    linhas = estatisticas_por_curso(curso_ids=[curso_id])
+    return linhas[0] if linhas else None
+
+
+async def aestatisticas_curso(curso_id):
+    linhas = await aestatisticas_por_curso(curso_ids=[curso_id])
+    return linhas[0] if linhas else None
+
+
+def estatisticas_gerais(limite_populares=5):
+    """
+    Totais gerais derivados da passada por curso, mais a contagem de alunos.
+    Custa duas consultas no total.
+    """
+    cursos = estatisticas_por_curso()
+
+    total_matriculas = sum(c['total_matriculas'] for c in cursos)
+    matriculas_pagas = sum(c['matriculas_pagas'] for c in cursos)
+    matriculas_pendentes = sum(c['matriculas_pendentes'] for c in cursos)
+    total_pago = sum((c['total_arrecadado'] for c in cursos), ZERO)
+    total_pendente = sum((c['potencial_arrecadacao'] for c in cursos), ZERO)
+
+    populares = sorted(cursos, key=lambda c: c['total_matriculas'], reverse=True)
+
+    return {
+        'total_alunos': Aluno.objects.count(),
+        'total_cursos': len(cursos),
+        'cursos_ativos': sum(1 for c in cursos if c['status'] == 'ATIVO'),
+        'total_matriculas': total_matriculas,
+        'matriculas_pagas': matriculas_pagas,
+        'matriculas_pendentes': matriculas_pendentes,
+        'total_pago': total_pago,
+        'total_pendente': total_pendente,
+        'total_geral': total_pago + total_pendente,
+        'percentual_pagas': _percentual(matriculas_pagas, total_matriculas),
+        'percentual_pendentes': _percentual(matriculas_pendentes, total_matriculas),
+        'cursos_populares': populares[:limite_populares],
+    }
+
+
+def _consulta_aluno(aluno_id):
+    return Aluno.objects.filter(pk=aluno_id).values(
+        'id',
+        'nome',
+        'saldo__total_devido',
+        'saldo__total_pago',
+        'saldo__total_matriculas',
+        'saldo__matriculas_pagas',
+        'saldo__matriculas_pendentes',
+    )
+
+
+def _linha_aluno(linha):
+    if linha is None:
+        return None
+
+    total_devido = linha['saldo__total_devido'] or ZERO
+    total_pago = linha['saldo__total_pago'] or ZERO
+    return {
+        'aluno_id': linha['id'],
+        'aluno_nome': linha['nome'],
+        'total_devido': total_devido,
+        'total_pago': total_pago,
+        'total_geral': total_devido + total_pago,
+        'total_matriculas': linha['saldo__total_matriculas'] or 0,
+        'matriculas_pagas': linha['saldo__matriculas_pagas'] or 0,
+        'matriculas_pendentes': linha['saldo__matriculas_pendentes'] or 0,
+    }
+
+
+def estatisticas_aluno(aluno_id):
+    """
+    Resumo financeiro de um aluno lido do livro de saldos, em uma unica
+    consulta (LEFT JOIN aluno -> saldo). Retorna None se o aluno nao existir.
+    """
+    return _linha_aluno(_consulta_aluno(aluno_id).first())
+
+
+async def aestatisticas_aluno(aluno_id):
+    """versao assincrona de estatisticas_aluno"""
+    return _linha_aluno(await _consulta_aluno(aluno_id).afirst())
+
+
+# ============================================
+# HISTORICO DO ALUNO (aluno_historico_view)
+# ============================================
+
+def _soma_por_status(status):
+    return Window(Sum(Case(
+        When(matriculas__status=status, then=F('matriculas__curso__valor_inscricao')),
+        default=Value(ZERO),
+    )))
+
+
+def _consulta_historico(aluno_id):
+    # aluno LEFT JOIN matriculas JOIN curso; as somas OVER () repetem os
+    # totais do aluno em cada linha
+    return Aluno.objects.filter(pk=aluno_id).values(
+        'id',
+        'nome',
+        'email',
+        'cpf',
+        'data_ingresso',
+        matricula_id=F('matriculas__id'),
+        data_matricula=F('matriculas__data_matricula'),
+        status=F('matriculas__status'),
+        curso_nome=F('matriculas__curso__nome'),
+        carga_horaria=F('matriculas__curso__carga_horaria'),
+        valor_inscricao=F('matriculas__curso__valor_inscricao'),
+    ).annotate(
+        total_horas=Window(Sum('matriculas__curso__carga_horaria')),
+        soma_paga=_soma_por_status('PAGO'),
+        soma_pendente=_soma_por_status('PENDENTE'),
+    ).order_by('-matriculas__data_matricula', 'matriculas__id')
+
+
+def historico_aluno(aluno_id):
+    """
+    Dados do historico (ficha) do aluno em uma unica consulta: as
+    matriculas com nome, carga horaria e valor do curso, mais total pago,
+    pendente e carga horaria total. Retorna None se o aluno nao existir.
+    """
+    linhas = list(_consulta_historico(aluno_id))
+    if not linhas:
+        return None
+
+    primeira = linhas[0]
+    matriculas = [
+        {
+            'id': linha['matricula_id'],
+            'curso_nome': linha['curso_nome'],
+            'data_matricula': linha['data_matricula'],
+            'carga_horaria': linha['carga_horaria'],
+            'valor_inscricao': linha['valor_inscricao'],
+            'status': linha['status'],
+        }
+        for linha in linhas
+        if linha['matricula_id'] is not None
+    ]
+    total_pago = primeira['soma_paga'] or ZERO
+    total_devido = primeira['soma_pendente'] or ZERO
+    return {
+        'aluno': {
+            campo: primeira[campo]
+            for campo in ('id', 'nome', 'email', 'cpf', 'data_ingresso')
+        },
+        'matriculas': matriculas,
+        'total_matriculas': len(matriculas),
+        'total_horas': primeira['total_horas'] or 0,
+        'total_pago': total_pago,
+        'total_devido': total_devido,
+        'total_geral': total_pago + total_devido,
+    }
@@ -0,0 +1,111 @@
+"""
+Exportacao em streaming dos relatorios SQL (NDJSON e CSV).
+
+As linhas sao lidas com um cursor no servidor (connection.chunked_cursor,
+que no PostgreSQL e um cursor nomeado, dentro de uma transacao) em lotes
+de fetchmany, e enviadas por um StreamingHttpResponse conforme sao lidas.
+A memoria fica constante e o primeiro byte sai assim que o banco devolve
+o primeiro lote.
+"""
+import csv
+import datetime
+import json
+from contextlib import nullcontext
+from decimal import Decimal
+
+from django.db import connections, transaction
+from django.http import StreamingHttpResponse
+
+from .roteamento import alias_leitura
+
+TAMANHO_LOTE = 2000
+
+FORMATOS_STREAMING = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+def converter_valor(valor):
+    """Decimal -> float e datas -> ISO, como nos endpoints JSON"""
+    if isinstance(valor, Decimal):
+        return float(valor)
+    if isinstance(valor, (datetime.date, datetime.datetime)):
+        return valor.isoformat()
+    raise TypeError(f'Tipo nao serializavel: {type(valor).__name__}')
+
+
+class EncoderJSON(json.JSONEncoder):
+    """json.dumps com as mesmas conversoes de converter_valor"""
+
+    def default(self, valor):
+        return converter_valor(valor)
+
+
+def linhas_sql(sql, params=None, tamanho_lote=TAMANHO_LOTE):
+    """
+    Gera (colunas, lote) a partir de um cursor no servidor.
+    O primeiro item gerado e a lista de colunas.
+    """
+    conexao = connections[alias_leitura()]
+    # em autocommit o Django cria o cursor nomeado WITH HOLD, que o
+    # PostgreSQL materializa inteiro antes do primeiro fetch. A transacao
+    # termina quando o gerador termina ou e fechado (cliente desconectou).
+    if conexao.get_autocommit():
+        transacao = transaction.atomic(using=conexao.alias)
+    else:
+        transacao = nullcontext()
+    with transacao, conexao.chunked_cursor() as cursor:
+        cursor.execute(sql, params)
+        yield [coluna[0] for coluna in cursor.description]
+        while True:
+            lote = cursor.fetchmany(tamanho_lote)
+            if not lote:
+                break
+            yield lote
+
+
+def _gerar_ndjson(lotes):
+    colunas = next(lotes)
+    for lote in lotes:
+        yield ''.join(
+            json.dumps(dict(zip(colunas, linha)), default=converter_valor, ensure_ascii=False) + '\n'
+            for linha in lote
+        )
+
+
+class _Eco:
+    """pseudo-arquivo: csv.writer devolve a linha em vez de guarda-la"""
+    def write(self, valor):
+        return valor
+
+
+def _gerar_csv(lotes):
+    escritor = csv.writer(_Eco())
+    colunas = next(lotes)
+    yield escritor.writerow(colunas)
+    for lote in lotes:
+        yield ''.join(
+            escritor.writerow([
+                converter_valor(valor) if isinstance(valor, (Decimal, datetime.date)) else valor
+                for valor in linha
+            ])
+            for linha in lote
+        )
+
+
+GERADORES = {
+    'ndjson': _gerar_ndjson,
+    'csv': _gerar_csv,
+}
+
+
+def resposta_streaming(sql, formato, nome_arquivo, params=None):
+    """StreamingHttpResponse com o resultado de `sql` em `formato`"""
+    lotes = linhas_sql(sql, params)
+    resposta = StreamingHttpResponse(
+        GERADORES[formato](lotes),
+        content_type=f'{FORMATOS_STREAMING[formato]}; charset=utf-8',
+    )
+    resposta['Content-Disposition'] = f'attachment; filename="{nome_arquivo}.{formato}"'
+    return resposta
@@ -0,0 +1,408 @@
+"""
+Importação em massa de alunos e matrículas a partir de CSV (comando
+importar_csv).
+
+O arquivo é lido em streaming e processado em lotes:
+1. cada linha é normalizada e validada em memória (CPF com dígitos
+   verificadores, e-mail, datas, status);
+2. as regras que dependem do banco (CPF/e-mail já cadastrados, aluno e
+   curso existentes, matrícula repetida) são verificadas para o lote
+   inteiro com poucas consultas por conjunto;
+3. no PostgreSQL as linhas válidas vão por COPY FROM STDIN para uma
+   tabela temporária e dali para a tabela final com
+   INSERT ... SELECT ... ON CONFLICT DO NOTHING RETURNING, que devolve os
+   ids gerados e descarta o que outra transação inseriu no meio tempo.
+   Em outros bancos cai para bulk_create.
+
+Como COPY não dispara sinais, cada lote envia lote_criado com as linhas
+inseridas, mantendo livro de saldos e cache em dia. As linhas rejeitadas
+vão para um CSV de erros com o número da linha e os motivos.
+"""
+import csv
+import io
+from datetime import date
+from functools import lru_cache
+
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .lotes import (
+    MOTIVO_ALUNO_INEXISTENTE,
+    MOTIVO_CURSO_INATIVO,
+    MOTIVO_CURSO_INEXISTENTE,
+    MOTIVO_JA_MATRICULADO,
+    MOTIVO_REPETIDO,
+    _pares_existentes,
+)
+from .models import Aluno, Curso, Matricula
+from .roteamento import ler_do_primario
+from .signals import lote_criado
+from .validadores import cpf_valido, normalizar_cpf
+
+TAMANHO_LOTE = 10000
+
+COLUNAS_ALUNO = ['nome', 'email', 'cpf', 'data_ingresso']
+COLUNAS_MATRICULA = ['aluno_cpf', 'curso_id', 'status', 'data_matricula']
+OBRIGATORIAS = {
+    'alunos': {'nome', 'email', 'cpf'},
+    'matriculas': {'aluno_cpf', 'curso_id'},
+}
+
+MOTIVO_CPF_INVALIDO = "CPF invalido."
+MOTIVO_CPF_CADASTRADO = "CPF ja cadastrado."
+MOTIVO_EMAIL_INVALIDO = "E-mail invalido."
+MOTIVO_EMAIL_CADASTRADO = "E-mail ja cadastrado."
+MOTIVO_CONFLITO = "CPF ou e-mail cadastrado durante a importacao."
+MOTIVO_NOME_INVALIDO = "Nome vazio ou com mais de 200 caracteres."
+MOTIVO_DATA_INVALIDA = "Data invalida (use AAAA-MM-DD ou DD/MM/AAAA)."
+MOTIVO_STATUS_INVALIDO = "Status deve ser PAGO ou PENDENTE."
+MOTIVO_CURSO_ID_INVALIDO = "curso_id deve ser um numero."
+
+STATUS_VALIDOS = {status for status, _ in Matricula.STATUS_CHOICES}
+
+
+def usa_copy():
+    return connection.vendor == 'postgresql'
+
+
+@lru_cache(maxsize=4096)
+def _converter_data(valor):
+    # as datas se repetem muito entre linhas; strptime é lento
+    try:
+        if '/' in valor:
+            dia, mes, ano = valor.split('/')
+            return date(int(ano), int(mes), int(dia))
+        return date.fromisoformat(valor)
+    except ValueError:
+        return None
+
+
+def _data(valor, padrao):
+    """(data, erro): aceita AAAA-MM-DD e DD/MM/AAAA; vazio usa o padrão"""
+    valor = (valor or '').strip()
+    if not valor:
+        return padrao, None
+    convertida = _converter_data(valor)
+    if convertida is None:
+        return None, MOTIVO_DATA_INVALIDA
+    return convertida, None
+
+
+class RelatorioImportacao:
+    """contadores e gravação das linhas rejeitadas"""
+
+    def __init__(self, arquivo_erros, colunas):
+        self.inseridos = 0
+        self.rejeitados = 0
+        self._arquivo_erros = arquivo_erros
+        self._escritor = None
+        self._colunas = colunas
+
+    def rejeitar(self, numero_linha, linha, motivos):
+        self.rejeitados += 1
+        if self._arquivo_erros is None:
+            return
+        if self._escritor is None:
+            self._escritor = csv.DictWriter(
+                self._arquivo_erros,
+                fieldnames=['linha', *self._colunas, 'motivos'],
+                extrasaction='ignore',
+            )
+            self._escritor.writeheader()
+        self._escritor.writerow({**linha, 'linha': numero_linha, 'motivos': '; '.join(motivos)})
+
+
+# ============================================
+# COPY
+# ============================================
+
+def _copiar(cursor, tabela, colunas, linhas):
+    """COPY tabela (colunas) FROM STDIN no formato CSV"""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(linhas)
+    sql = f"COPY {tabela} ({', '.join(colunas)}) FROM STDIN WITH (FORMAT csv)"
+    if hasattr(cursor, 'copy_expert'):
+        # psycopg2
+        buffer.seek(0)
+        cursor.copy_expert(sql, buffer)
+    else:
+        # psycopg 3
+        with cursor.copy(sql) as copia:
+            copia.write(buffer.getvalue())
+
+
+def _inserir_via_copy(model, colunas_tipos, linhas, conflito, retorno):
+    """
+    COPY para uma tabela temporária e INSERT ... SELECT na tabela do model.
+    Retorna as linhas de `retorno` realmente inseridas.
+    """
+    tabela = model._meta.db_table
+    temporaria = f'tmp_importacao_{model._meta.model_name}'
+    colunas = [coluna for coluna, _ in colunas_tipos]
+    definicao = ', '.join(f'{coluna} {tipo}' for coluna, tipo in colunas_tipos)
+    with connection.cursor() as cursor:
+        cursor.execute(f'CREATE TEMP TABLE {temporaria} ({definicao}) ON COMMIT DROP')
+        _copiar(cursor, temporaria, colunas, linhas)
+        cursor.execute(
+            f"INSERT INTO {tabela} ({', '.join(colunas)}, created_at, updated_at) "
+            f"SELECT {', '.join(colunas)}, %s, %s FROM {temporaria} "
+            f"ON CONFLICT {conflito} DO NOTHING "
+            f"RETURNING {', '.join(retorno)}",
+            [timezone.now(), timezone.now()],
+        )
+        inseridos = cursor.fetchall()
+        # ON COMMIT DROP não basta: dentro de uma transação externa (ou de um
+        # TestCase) o próximo lote criaria a mesma tabela de novo
+        cursor.execute(f'DROP TABLE {temporaria}')
+        return inseridos
+
+
+# ============================================
+# ALUNOS
+# ============================================
+
+def _validar_aluno(linha, hoje):
+    """normaliza a linha; retorna (dados, motivos)"""
+    motivos = []
+    nome = (linha.get('nome') or '').strip()
+    if not nome or len(nome) > 200:
+        motivos.append(MOTIVO_NOME_INVALIDO)
+
+    email = (linha.get('email') or '').strip()
+    try:
+        validate_email(email)
+    except ValidationError:
+        motivos.append(MOTIVO_EMAIL_INVALIDO)
+
+    cpf = normalizar_cpf(linha.get('cpf'))
+    if not cpf_valido(cpf):
+        motivos.append(MOTIVO_CPF_INVALIDO)
+
+    data_ingresso, erro = _data(linha.get('data_ingresso'), hoje)
+    if erro:
+        motivos.append(erro)
+
+    return (nome, email, cpf, data_ingresso), motivos
+
+
+def _cadastrados(lote):
+    """(cpfs, emails) do lote que já existem em core_aluno"""
+    cpfs = {dados[2] for _, _, dados in lote}
+    emails = {dados[1] for _, _, dados in lote}
+    return (
+        set(Aluno.objects.filter(cpf__in=cpfs).values_list('cpf', flat=True)),
+        set(Aluno.objects.filter(email__in=emails).values_list('email', flat=True)),
+    )
+
+
+def _importar_lote_alunos(lote, vistos, relatorio):
+    """lote: lista de (numero_linha, linha, dados)"""
+    cpfs_cadastrados, emails_cadastrados = _cadastrados(lote)
+
+    validos = []
+    for numero_linha, linha, dados in lote:
+        _, email, cpf, _ = dados
+        motivos = []
+        if cpf in cpfs_cadastrados:
+            motivos.append(MOTIVO_CPF_CADASTRADO)
+        elif cpf in vistos['cpf']:
+            motivos.append(MOTIVO_REPETIDO)
+        if email in emails_cadastrados:
+            motivos.append(MOTIVO_EMAIL_CADASTRADO)
+        elif email in vistos['email']:
+            motivos.append(MOTIVO_REPETIDO)
+        vistos['cpf'].add(cpf)
+        vistos['email'].add(email)
+        if motivos:
+            relatorio.rejeitar(numero_linha, linha, motivos)
+        else:
+            validos.append((numero_linha, linha, dados))
+
+    if not validos:
+        return
+
+    with transaction.atomic():
+        if usa_copy():
+            inseridos = _inserir_via_copy(
+                Aluno,
+                [('nome', 'varchar(200)'), ('email', 'varchar(254)'),
+                 ('cpf', 'varchar(11)'), ('data_ingresso', 'date')],
+                [dados for _, _, dados in validos],
+                conflito='',
+                retorno=['id', 'cpf'],
+            )
+            objs = [Aluno(pk=pk, cpf=cpf) for pk, cpf in inseridos]
+            lote_criado.send(sender=Aluno, objs=objs, using=connection.alias)
+        else:
+            objs = Aluno.objects.bulk_create([
+                Aluno(nome=nome, email=email, cpf=cpf, data_ingresso=data_ingresso)
+                for nome, email, cpf, data_ingresso in (dados for _, _, dados in validos)
+            ])
+
+    # o que não voltou do INSERT (ON CONFLICT sem alvo: CPF ou e-mail)
+    # foi cadastrado por outra transação; consulta qual dos dois
+    inseridos = {obj.cpf for obj in objs}
+    recusados = [item for item in validos if item[2][2] not in inseridos]
+    if recusados:
+        cpfs_cadastrados, emails_cadastrados = _cadastrados(recusados)
+        for numero_linha, linha, (_, email, cpf, _) in recusados:
+            motivos = []
+            if cpf in cpfs_cadastrados:
+                motivos.append(MOTIVO_CPF_CADASTRADO)
+            if email in emails_cadastrados:
+                motivos.append(MOTIVO_EMAIL_CADASTRADO)
+            relatorio.rejeitar(numero_linha, linha, motivos or [MOTIVO_CONFLITO])
+    relatorio.inseridos += len(objs)
+
+
+def importar_alunos(linhas, relatorio, tamanho_lote=TAMANHO_LOTE):
+    hoje = timezone.localdate()
+    vistos = {'cpf': set(), 'email': set()}
+    lote = []
+    for numero_linha, linha in linhas:
+        dados, motivos = _validar_aluno(linha, hoje)
+        if motivos:
+            relatorio.rejeitar(numero_linha, linha, motivos)
+            continue
+        lote.append((numero_linha, linha, dados))
+        if len(lote) >= tamanho_lote:
+            _importar_lote_alunos(lote, vistos, relatorio)
+            lote = []
+    if lote:
+        _importar_lote_alunos(lote, vistos, relatorio)
+
+
+# ============================================
+# MATRICULAS
+# ============================================
+
+def _validar_matricula(linha, hoje):
+    motivos = []
+    cpf = normalizar_cpf(linha.get('aluno_cpf'))
+    if not cpf_valido(cpf):
+        motivos.append(MOTIVO_CPF_INVALIDO)
+
+    curso_id = (linha.get('curso_id') or '').strip()
+    if not curso_id.isdigit():
+        motivos.append(MOTIVO_CURSO_ID_INVALIDO)
+
+    status = (linha.get('status') or '').strip().upper() or 'PENDENTE'
+    if status not in STATUS_VALIDOS:
+        motivos.append(MOTIVO_STATUS_INVALIDO)
+
+    data_matricula, erro = _data(linha.get('data_matricula'), hoje)
+    if erro:
+        motivos.append(erro)
+
+    return (cpf, int(curso_id) if curso_id.isdigit() else None, status, data_matricula), motivos
+
+
+def _importar_lote_matriculas(lote, cursos, vistos, relatorio):
+    alunos = dict(
+        Aluno.objects.filter(cpf__in={dados[0] for _, _, dados in lote}).values_list('cpf', 'pk')
+    )
+    pares = {
+        (alunos[cpf], curso_id)
+        for _, _, (cpf, curso_id, _, _) in lote
+        if cpf in alunos
+    }
+    existentes = _pares_existentes(pares)
+
+    validos = []
+    for numero_linha, linha, (cpf, curso_id, status, data_matricula) in lote:
+        motivos = []
+        aluno_id = alunos.get(cpf)
+        if aluno_id is None:
+            motivos.append(MOTIVO_ALUNO_INEXISTENTE)
+        if curso_id not in cursos:
+            motivos.append(MOTIVO_CURSO_INEXISTENTE)
+        elif cursos[curso_id] == 'INATIVO':
+            motivos.append(MOTIVO_CURSO_INATIVO)
+        par = (aluno_id, curso_id)
+        if par in existentes:
+            motivos.append(MOTIVO_JA_MATRICULADO)
+        elif aluno_id is not None and par in vistos:
+            motivos.append(MOTIVO_REPETIDO)
+        vistos.add(par)
+        if motivos:
+            relatorio.rejeitar(numero_linha, linha, motivos)
+        else:
+            validos.append((numero_linha, linha, (aluno_id, curso_id, status, data_matricula)))
+
+    if not validos:
+        return
+
+    with transaction.atomic():
+        if usa_copy():
+            inseridos = _inserir_via_copy(
+                Matricula,
+                [('aluno_id', 'bigint'), ('curso_id', 'bigint'),
+                 ('status', 'varchar(10)'), ('data_matricula', 'date')],
+                [dados for _, _, dados in validos],
+                conflito='(aluno_id, curso_id)',
+                retorno=['id', 'aluno_id', 'curso_id', 'status'],
+            )
+            objs = [
+                Matricula(pk=pk, aluno_id=aluno_id, curso_id=curso_id, status=status)
+                for pk, aluno_id, curso_id, status in inseridos
+            ]
+            lote_criado.send(sender=Matricula, objs=objs, using=connection.alias)
+        else:
+            objs = Matricula.objects.bulk_create([
+                Matricula(aluno_id=aluno_id, curso_id=curso_id, status=status, data_matricula=data)
+                for aluno_id, curso_id, status, data in (dados for _, _, dados in validos)
+            ])
+
+    inseridos = {(obj.aluno_id, obj.curso_id) for obj in objs}
+    for numero_linha, linha, dados in validos:
+        if dados[:2] not in inseridos:
+            relatorio.rejeitar(numero_linha, linha, [MOTIVO_JA_MATRICULADO])
+    relatorio.inseridos += len(objs)
+
+
+def importar_matriculas(linhas, relatorio, tamanho_lote=TAMANHO_LOTE):
+    hoje = timezone.localdate()
+    # poucos cursos: carregados uma vez
+    cursos = dict(Curso.objects.values_list('pk', 'status'))
+    vistos = set()
+    lote = []
+    for numero_linha, linha in linhas:
+        dados, motivos = _validar_matricula(linha, hoje)
+        if motivos:
+            relatorio.rejeitar(numero_linha, linha, motivos)
+            continue
+        lote.append((numero_linha, linha, dados))
+        if len(lote) >= tamanho_lote:
+            _importar_lote_matriculas(lote, cursos, vistos, relatorio)
+            lote = []
+    if lote:
+        _importar_lote_matriculas(lote, cursos, vistos, relatorio)
+
+
+IMPORTADORES = {
+    'alunos': (importar_alunos, COLUNAS_ALUNO),
+    'matriculas': (importar_matriculas, COLUNAS_MATRICULA),
+}
+
+
+def importar_csv(tipo, arquivo, arquivo_erros=None, tamanho_lote=TAMANHO_LOTE, delimitador=','):
+    """
+    Importa o CSV aberto em `arquivo` (com cabeçalho). Retorna o
+    RelatorioImportacao; as linhas rejeitadas vão para `arquivo_erros`.
+    """
+    importar, colunas = IMPORTADORES[tipo]
+    leitor = csv.DictReader(arquivo, delimiter=delimitador)
+    cabecalho = {coluna.strip() for coluna in leitor.fieldnames or []}
+    faltando = OBRIGATORIAS[tipo] - cabecalho
+    if faltando:
+        raise ValueError(f"Colunas obrigatórias ausentes: {', '.join(sorted(faltando))}")
+    leitor.fieldnames = [coluna.strip() for coluna in leitor.fieldnames]
+
+    relatorio = RelatorioImportacao(arquivo_erros, colunas)
+    # as checagens de duplicidade não podem ler de uma réplica atrasada;
+    # linha 1 é o cabeçalho
+    with ler_do_primario():
+        importar(enumerate(leitor, start=2), relatorio, tamanho_lote)
+    return relatorio
@@ -0,0 +1,301 @@
+"""
+Jobs de relatório (JobRelatorio).
+
+Relatórios grandes (financeiro de todos os alunos, cursos populares,
+pendências) não rodam na requisição: POST /api/relatorios/jobs/ enfileira
+um job, o cliente consulta GET /api/relatorios/jobs/{id}/ e, com o status
+CONCLUIDO, baixa o arquivo em /api/relatorios/jobs/{id}/download/.
+
+O comando `python manage.py processar_jobs_relatorio --workers N` mantém
+um pool de threads; cada uma reserva o próximo job pendente com
+SELECT ... FOR UPDATE SKIP LOCKED (vários processos podem rodar ao mesmo
+tempo sem pegar o mesmo job) e grava o resultado em streaming, com o
+mesmo gerador CSV/NDJSON das exportações (core/exportacao.py),
+compactado com gzip em RELATORIOS_JOBS_DIR.
+
+- Deduplicação: um job idêntico (mesmo tipo, formato e parâmetros)
+  pendente ou em andamento é devolvido em vez de criar outro; o índice
+  único parcial uniq_job_relatorio_em_andamento garante isso também com
+  requisições simultâneas.
+- Falhas: o job volta para a fila até MAX_TENTATIVAS, cada vez com uma
+  espera maior (disponivel_em) antes de ser reservado de novo; depois
+  fica ERRO.
+  Um job em PROCESSANDO há mais de RELATORIOS_JOBS_TEMPO_MAXIMO_MIN
+  (worker que caiu) volta para a fila. Se o worker original ainda estiver
+  rodando, cada tentativa grava no próprio arquivo e só registra o
+  resultado se o job continua na mesma tentativa; a que perdeu apaga o
+  que gerou.
+- Retenção: jobs terminados expiram depois de
+  RELATORIOS_JOBS_RETENCAO_HORAS, e os arquivos mais antigos são
+  apagados antes quando o total passa de RELATORIOS_JOBS_MAX_MB.
+"""
+import gzip
+import hashlib
+import json
+import os
+import traceback
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .exportacao import GERADORES, linhas_sql
+from .models import JobRelatorio
+from .pendencias import filtro_faixa, matriculas_pendentes
+from .relatorios import consulta_relatorio
+from .roteamento import ler_do_primario
+
+MAX_TENTATIVAS = 3
+# espera antes de repetir um job que falhou: 1min, 2min, 4min...
+ESPERA_BASE_S = 60
+
+
+# ============================================
+# CONSULTAS
+# ============================================
+
+def _sql_alunos(parametros):
+    sql, _ = consulta_relatorio('alunos', fresco=parametros.get('fresco', False))
+    return sql, None
+
+
+def _sql_cursos_populares(parametros):
+    sql, _ = consulta_relatorio('cursos_populares', fresco=parametros.get('fresco', False))
+    return sql, None
+
+
+def _sql_pendencias(parametros):
+    matriculas = matriculas_pendentes(parametros.get('curso'))
+    if parametros.get('faixa'):
+        matriculas = matriculas.filter(filtro_faixa(parametros['faixa']))
+    matriculas = matriculas.order_by('data_matricula', 'id').values(
+        'id', 'data_matricula', 'aluno_id', 'curso_id',
+        aluno_nome=F('aluno__nome'),
+        aluno_email=F('aluno__email'),
+        curso_nome=F('curso__nome'),
+        valor=F('curso__valor_inscricao'),
+    )
+    return matriculas.query.sql_with_params()
+
+
+# tipo: função(parametros) -> (sql, params)
+CONSULTAS = {
+    'alunos': _sql_alunos,
+    'cursos_populares': _sql_cursos_populares,
+    'pendencias': _sql_pendencias,
+}
+
+
+# ============================================
+# FILA
+# ============================================
+
+def chave_job(tipo, formato, parametros):
+    texto = json.dumps([tipo, formato, parametros], sort_keys=True)
+    return hashlib.sha256(texto.encode()).hexdigest()
+
+
+def em_andamento():
+    return JobRelatorio.objects.filter(status__in=JobRelatorio.EM_ANDAMENTO)
+
+
+def enfileirar(tipo, formato, parametros):
+    """
+    Retorna (job, criado). Se já existe um job idêntico pendente ou em
+    andamento, ele é devolvido com criado=False.
+    """
+    chave = chave_job(tipo, formato, parametros)
+    with ler_do_primario():
+        for _ in range(2):
+            existente = em_andamento().filter(chave=chave).first()
+            if existente is not None:
+                return existente, False
+            try:
+                with transaction.atomic():
+                    job = JobRelatorio.objects.create(
+                        tipo=tipo, formato=formato, parametros=parametros, chave=chave,
+                    )
+                return job, True
+            except IntegrityError:
+                # outra requisição criou o mesmo job entre a leitura e o INSERT
+                continue
+        return em_andamento().get(chave=chave), False
+
+
+def reservar():
+    """marca o próximo job pendente como PROCESSANDO e o retorna (ou None)"""
+    with ler_do_primario():
+        while True:
+            with transaction.atomic():
+                agora = timezone.now()
+                job = (
+                    JobRelatorio.objects.select_for_update(skip_locked=True)
+                    .filter(status='PENDENTE', disponivel_em__lte=agora)
+                    .order_by('criado_em', 'id')
+                    .first()
+                )
+                if job is None:
+                    return None
+                # o filtro por status cobre bancos sem FOR UPDATE (SQLite)
+                reservado = JobRelatorio.objects.filter(pk=job.pk, status='PENDENTE').update(
+                    status='PROCESSANDO', iniciado_em=agora, tentativas=F('tentativas') + 1,
+                )
+            if reservado:
+                job.status = 'PROCESSANDO'
+                job.iniciado_em = agora
+                job.tentativas += 1
+                return job
+
+
+def diretorio():
+    caminho = Path(settings.RELATORIOS_JOBS_DIR)
+    caminho.mkdir(parents=True, exist_ok=True)
+    return caminho
+
+
+def caminho_arquivo(job):
+    return Path(settings.RELATORIOS_JOBS_DIR) / job.arquivo
+
+
+def _contando(lotes, contador):
+    # repassa (colunas, lotes...) de linhas_sql somando as linhas
+    yield next(lotes)
+    for lote in lotes:
+        contador[0] += len(lote)
+        yield lote
+
+
+def _da_tentativa(job):
+    # o job ainda é desta tentativa (não foi devolvido à fila e reservado de novo)
+    return JobRelatorio.objects.filter(
+        pk=job.pk, status='PROCESSANDO', tentativas=job.tentativas,
+    )
+
+
+def executar(job):
+    """gera o arquivo do job reservado e registra o resultado"""
+    nome = f'{job.pk}-{job.tentativas}-{job.tipo}.{job.formato}.gz'
+    destino = diretorio() / nome
+    temporario = destino.with_name(nome + '.tmp')
+    contador = [0]
+    try:
+        sql, params = CONSULTAS[job.tipo](job.parametros)
+        lotes = _contando(linhas_sql(sql, params), contador)
+        with gzip.open(temporario, 'wt', encoding='utf-8', newline='') as arquivo:
+            for pedaco in GERADORES[job.formato](lotes):
+                arquivo.write(pedaco)
+        os.replace(temporario, destino)
+    except Exception:
+        temporario.unlink(missing_ok=True)
+        _registrar_falha(job, traceback.format_exc(limit=5))
+        return False
+
+    agora = timezone.now()
+    registrado = _da_tentativa(job).update(
+        status='CONCLUIDO',
+        concluido_em=agora,
+        expira_em=agora + timedelta(hours=settings.RELATORIOS_JOBS_RETENCAO_HORAS),
+        arquivo=nome,
+        linhas=contador[0],
+        tamanho_bytes=destino.stat().st_size,
+        erro='',
+    )
+    if not registrado:
+        destino.unlink(missing_ok=True)
+        return False
+    return True
+
+
+def espera_apos_falha(tentativas):
+    """backoff exponencial até a próxima tentativa de um job"""
+    return timedelta(seconds=ESPERA_BASE_S * 2 ** (tentativas - 1))
+
+
+def _registrar_falha(job, erro):
+    if job.tentativas < MAX_TENTATIVAS:
+        _da_tentativa(job).update(
+            status='PENDENTE',
+            disponivel_em=timezone.now() + espera_apos_falha(job.tentativas),
+            erro=erro,
+        )
+        return
+    agora = timezone.now()
+    _da_tentativa(job).update(
+        status='ERRO',
+        concluido_em=agora,
+        expira_em=agora + timedelta(hours=settings.RELATORIOS_JOBS_RETENCAO_HORAS),
+        erro=erro,
+    )
+
+
+def processar_fila(parar=None):
+    """
+    Executa jobs até a fila esvaziar (ou `parar`, um threading.Event, ser
+    acionado). Retorna (concluidos, falhas).
+    """
+    concluidos = falhas = 0
+    while parar is None or not parar.is_set():
+        job = reservar()
+        if job is None:
+            break
+        if executar(job):
+            concluidos += 1
+        else:
+            falhas += 1
+    return concluidos, falhas
+
+
+# ============================================
+# MANUTENCAO
+# ============================================
+
+def recuperar_abandonados():
+    """devolve à fila os jobs em PROCESSANDO há tempo demais"""
+    limite = timezone.now() - timedelta(minutes=settings.RELATORIOS_JOBS_TEMPO_MAXIMO_MIN)
+    abandonados = JobRelatorio.objects.filter(status='PROCESSANDO', iniciado_em__lt=limite)
+    agora = timezone.now()
+    esgotados = abandonados.filter(tentativas__gte=MAX_TENTATIVAS).update(
+        status='ERRO',
+        concluido_em=agora,
+        expira_em=agora + timedelta(hours=settings.RELATORIOS_JOBS_RETENCAO_HORAS),
+        erro='Tempo máximo de processamento excedido.',
+    )
+    return abandonados.update(status='PENDENTE') + esgotados
+
+
+def _apagar(jobs):
+    for job in jobs:
+        if job.arquivo:
+            caminho_arquivo(job).unlink(missing_ok=True)
+    JobRelatorio.objects.filter(pk__in=[job.pk for job in jobs]).delete()
+    return len(jobs)
+
+
+def limpar_expirados():
+    """
+    Apaga os jobs expirados e, se os arquivos passarem de
+    RELATORIOS_JOBS_MAX_MB, os concluídos mais antigos. Retorna o total
+    de jobs apagados.
+    """
+    expirados = list(
+        JobRelatorio.objects.filter(expira_em__lt=timezone.now()).only('pk', 'arquivo')
+    )
+    apagados = _apagar(expirados)
+
+    limite = settings.RELATORIOS_JOBS_MAX_MB * 1024 * 1024
+    total = 0
+    excedentes = []
+    concluidos = (
+        JobRelatorio.objects.filter(status='CONCLUIDO')
+        .order_by('-concluido_em', '-id')
+        .only('pk', 'arquivo', 'tamanho_bytes')
+    )
+    for indice, job in enumerate(concluidos.iterator()):
+        total += job.tamanho_bytes or 0
+        # o mais recente fica, mesmo sozinho acima do limite
+        if indice and total > limite:
+            excedentes.append(job)
+    return apagados + _apagar(excedentes)
@@ -0,0 +1,168 @@
+"""
+Operacoes em lote sobre matriculas.
+
+As validacoes que o MatriculaCreateSerializer faz item a item (duplicidade
+e curso inativo) sao feitas aqui para o lote inteiro, com poucas consultas
+baseadas em conjuntos, e a gravacao usa bulk_create.
+"""
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import Aluno, Curso, Matricula
+from .serializers import MatriculaLoteItemSerializer
+
+TAMANHO_LOTE = 1000
+
+MOTIVO_ALUNO_INEXISTENTE = "Aluno nao encontrado."
+MOTIVO_CURSO_INEXISTENTE = "Curso nao encontrado."
+MOTIVO_CURSO_INATIVO = "Nao eh possivel matricular em curso inativo."
+MOTIVO_JA_MATRICULADO = "Este aluno ja esta matriculado neste curso."
+MOTIVO_REPETIDO = "Item repetido no lote."
+
+
+def _em_partes(valores, tamanho=TAMANHO_LOTE):
+    valores = list(valores)
+    for inicio in range(0, len(valores), tamanho):
+        yield valores[inicio:inicio + tamanho]
+
+
+def _pares_existentes(pares):
+    """pares (aluno_id, curso_id) do lote que ja existem no banco"""
+    existentes = set()
+    # uma consulta por parte de alunos, filtrando pelos cursos do lote
+    cursos = list({curso_id for _, curso_id in pares})
+    alunos = {aluno_id for aluno_id, _ in pares}
+    for parte in _em_partes(alunos):
+        existentes.update(
+            Matricula.objects.filter(
+                aluno_id__in=parte, curso_id__in=cursos
+            ).values_list('aluno_id', 'curso_id')
+        )
+    return existentes & set(pares)
+
+
+def validar_lote(itens):
+    """
+    Valida os itens do lote.
+    Retorna (validos, rejeitados): validos e uma lista de (indice, dados)
+    e rejeitados uma lista de dicts com indice, item e motivos.
+    """
+    rejeitados = []
+    candidatos = []
+    # apenas estrutura/tipos, sem consultas ao banco
+    for indice, item in enumerate(itens):
+        estrutura = MatriculaLoteItemSerializer(data=item)
+        if estrutura.is_valid():
+            candidatos.append((indice, item, estrutura.validated_data))
+        else:
+            motivos = [
+                f'{campo}: {mensagem}'
+                for campo, mensagens in estrutura.errors.items()
+                for mensagem in mensagens
+            ]
+            rejeitados.append({'indice': indice, 'item': item, 'motivos': motivos})
+
+    dados_validos = [dados for _, _, dados in candidatos]
+    aluno_ids = {dados['aluno'] for dados in dados_validos}
+    curso_ids = {dados['curso'] for dados in dados_validos}
+
+    alunos = set()
+    for parte in _em_partes(aluno_ids):
+        alunos.update(Aluno.objects.filter(pk__in=parte).values_list('pk', flat=True))
+    cursos = dict(Curso.objects.filter(pk__in=curso_ids).values_list('pk', 'status'))
+    existentes = _pares_existentes({(d['aluno'], d['curso']) for d in dados_validos})
+
+    validos = []
+    vistos = set()
+    for indice, item, dados in candidatos:
+        par = (dados['aluno'], dados['curso'])
+        motivos = []
+        if dados['aluno'] not in alunos:
+            motivos.append(MOTIVO_ALUNO_INEXISTENTE)
+        if dados['curso'] not in cursos:
+            motivos.append(MOTIVO_CURSO_INEXISTENTE)
+        elif cursos[dados['curso']] == 'INATIVO':
+            motivos.append(MOTIVO_CURSO_INATIVO)
+        if par in existentes:
+            motivos.append(MOTIVO_JA_MATRICULADO)
+        elif par in vistos:
+            motivos.append(MOTIVO_REPETIDO)
+        vistos.add(par)
+
+        if motivos:
+            rejeitados.append({'indice': indice, 'item': item, 'motivos': motivos})
+        else:
+            validos.append((indice, dados))
+
+    rejeitados.sort(key=lambda rejeitado: rejeitado['indice'])
+    return validos, rejeitados
+
+
+def criar_matriculas_em_lote(itens, tudo_ou_nada=False):
+    """
+    Valida e grava um lote de matriculas.
+    Retorna dict com aceitos, rejeitados e se algo foi gravado.
+    """
+    hoje = timezone.localdate()
+
+    # uma matricula criada por outra requisicao entre a validacao e o
+    # INSERT viola a constraint unica. A revalidacao ja enxerga a matricula
+    # concorrente (confirmada) e rejeita o item certo; se o conflito se
+    # repetir, os itens sao gravados um a um para apontar os indices
+    for _ in range(2):
+        validos, rejeitados = validar_lote(itens)
+        if tudo_ou_nada and rejeitados:
+            return {'gravado': False, 'aceitos': [], 'rejeitados': rejeitados}
+        objs = _novas_matriculas(validos, hoje)
+        try:
+            with transaction.atomic():
+                Matricula.objects.bulk_create(objs, batch_size=TAMANHO_LOTE)
+        except IntegrityError:
+            continue
+        return _resultado(validos, objs, rejeitados)
+
+    gravados, conflitos = [], []
+    with transaction.atomic():
+        for (indice, dados), obj in zip(validos, _novas_matriculas(validos, hoje)):
+            try:
+                with transaction.atomic():
+                    Matricula.objects.bulk_create([obj])
+            except IntegrityError:
+                conflitos.append({'indice': indice, 'item': itens[indice], 'motivos': [MOTIVO_JA_MATRICULADO]})
+            else:
+                gravados.append(((indice, dados), obj))
+        if tudo_ou_nada and conflitos:
+            transaction.set_rollback(True)
+
+    rejeitados = sorted(rejeitados + conflitos, key=lambda rejeitado: rejeitado['indice'])
+    if tudo_ou_nada and conflitos:
+        return {'gravado': False, 'aceitos': [], 'rejeitados': rejeitados}
+    return _resultado(
+        [item for item, _ in gravados], [obj for _, obj in gravados], rejeitados,
+    )
+
+
+def _novas_matriculas(validos, hoje):
+    return [
+        Matricula(
+            aluno_id=dados['aluno'],
+            curso_id=dados['curso'],
+            status=dados['status'],
+            data_matricula=dados.get('data_matricula') or hoje,
+        )
+        for _, dados in validos
+    ]
+
+
+def _resultado(validos, objs, rejeitados):
+    aceitos = [
+        {
+            'indice': indice,
+            'id': obj.pk,
+            'aluno': obj.aluno_id,
+            'curso': obj.curso_id,
+            'status': obj.status,
+        }
+        for (indice, _), obj in zip(validos, objs)
+    ]
+    return {'gravado': bool(objs), 'aceitos': aceitos, 'rejeitados': rejeitados}
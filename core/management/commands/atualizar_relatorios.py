@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.relatorios import RELATORIOS, atualizar_relatorios, usa_view_materializada
+
+
+class Command(BaseCommand):
+    help = (
+        "Atualiza as views materializadas dos relatórios SQL "
+        "(REFRESH MATERIALIZED VIEW CONCURRENTLY). Rode pelo cron ou com "
+        "--intervalo como processo contínuo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--relatorio',
+            action='append',
+            choices=sorted(RELATORIOS),
+            help='Relatório a atualizar (pode repetir). Padrão: todos.',
+        )
+        parser.add_argument(
+            '--sem-concorrencia',
+            action='store_true',
+            help='REFRESH sem CONCURRENTLY (mais rápido, mas bloqueia leituras).',
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=int,
+            default=0,
+            help='Repete a cada N segundos em vez de rodar uma única vez.',
+        )
+
+    def handle(self, *args, **options):
+        if not usa_view_materializada():
+            raise CommandError('Views materializadas exigem PostgreSQL.')
+
+        while True:
+            duracoes = atualizar_relatorios(
+                nomes=options['relatorio'],
+                concorrente=not options['sem_concorrencia'],
+            )
+            for nome, duracao_ms in duracoes.items():
+                self.stdout.write(self.style.SUCCESS(f'{nome}: atualizado em {duracao_ms} ms'))
+
+            if options['intervalo'] <= 0:
+                break
+            time.sleep(options['intervalo'])
@@ -0,0 +1,79 @@
+import json
+from dataclasses import asdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.auditoria import CONSULTAS_AVULSAS, alvos, auditar
+from core.benchmark import ROTAS, ids_de_exemplo
+
+
+class Command(BaseCommand):
+    help = (
+        "Roda EXPLAIN (ANALYZE, BUFFERS) nas consultas de cada rota da API "
+        "e aponta varreduras sequenciais em tabelas grandes e estimativas "
+        "de linhas muito erradas (no SQLite, só EXPLAIN QUERY PLAN)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rota',
+            action='append',
+            choices=[rota.nome for rota in ROTAS] + [nome for nome, _ in CONSULTAS_AVULSAS],
+            help='Audita só esta rota ou consulta avulsa (pode repetir).',
+        )
+        parser.add_argument(
+            '--min-linhas',
+            type=int,
+            default=1000,
+            help='Só aponta Seq Scan que leu pelo menos estas linhas.',
+        )
+        parser.add_argument(
+            '--fator-estimativa',
+            type=float,
+            default=10,
+            help='Aponta nós com linhas estimadas/reais fora deste fator.',
+        )
+        parser.add_argument('--sql', action='store_true', help='Mostra o SQL das consultas apontadas.')
+        parser.add_argument(
+            '--estrito',
+            action='store_true',
+            help='Falha (código de saída 1) se houver algum alerta.',
+        )
+        parser.add_argument('--json', metavar='ARQUIVO', help='Grava os resultados em JSON.')
+
+    def handle(self, *args, **options):
+        try:
+            ids = ids_de_exemplo()
+        except ValueError as erro:
+            raise CommandError(str(erro))
+
+        resultados = []
+        total_alertas = 0
+        for nome, consultas_de in alvos(options['rota']):
+            consultas = [
+                auditar(consulta, options['min_linhas'], options['fator_estimativa'])
+                for consulta in consultas_de(ids)
+            ]
+            alertas = sum(len(consulta.alertas) for consulta in consultas)
+            total_alertas += alertas
+            resultados.append({'alvo': nome, 'consultas': [asdict(consulta) for consulta in consultas]})
+
+            resumo = f'{nome:<32}{len(consultas):>3} consulta(s)'
+            if not alertas:
+                self.stdout.write(f'{resumo}  ok')
+                continue
+            self.stdout.write(self.style.WARNING(f'{resumo}  {alertas} alerta(s)'))
+            for consulta in consultas:
+                for alerta in consulta.alertas:
+                    self.stdout.write(f'    [{alerta.tipo}] {alerta.tabela}: {alerta.detalhe}')
+                if consulta.alertas and options['sql']:
+                    self.stdout.write(f'    {consulta.sql}')
+
+        if options['json']:
+            with open(options['json'], 'w', encoding='utf-8') as arquivo:
+                json.dump(resultados, arquivo, indent=2, ensure_ascii=False)
+
+        if total_alertas and options['estrito']:
+            raise CommandError(f'{total_alertas} alerta(s) nos planos de execução.')
+        estilo = self.style.WARNING if total_alertas else self.style.SUCCESS
+        self.stdout.write(estilo(f'{len(resultados)} alvo(s) auditado(s), {total_alertas} alerta(s).'))
@@ -0,0 +1,76 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.benchmark import ROTAS, aplicavel, ids_de_exemplo, medir, violacoes
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede p50/p95/p99 e consultas SQL de cada rota da API e das páginas "
+        "HTML e falha se alguma passar do orçamento de consultas ou do "
+        "limite de latência."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticoes', type=int, default=20)
+        parser.add_argument('--aquecimento', type=int, default=2)
+        parser.add_argument(
+            '--rota',
+            action='append',
+            choices=[rota.nome for rota in ROTAS],
+            help='Mede só esta rota (pode repetir).',
+        )
+        parser.add_argument(
+            '--fator-latencia',
+            type=float,
+            default=1.0,
+            help='Multiplica os limites de p95 (ex.: 3 em máquinas lentas de CI).',
+        )
+        parser.add_argument(
+            '--sem-limite-latencia',
+            action='store_true',
+            help='Só reprova por orçamento de consultas ou erro.',
+        )
+        parser.add_argument('--json', metavar='ARQUIVO', help='Grava os resultados em JSON.')
+
+    def handle(self, *args, **options):
+        try:
+            ids = ids_de_exemplo()
+        except ValueError as erro:
+            raise CommandError(str(erro))
+
+        rotas = [rota for rota in ROTAS if not options['rota'] or rota.nome in options['rota']]
+        fator = float('inf') if options['sem_limite_latencia'] else options['fator_latencia']
+
+        self.stdout.write(
+            f"{'rota':<32}{'status':>7}{'p50':>10}{'p95':>10}{'p99':>10}{'consultas':>11}"
+        )
+        resultados = []
+        reprovadas = []
+        for rota in rotas:
+            if not aplicavel(rota, ids):
+                self.stdout.write(self.style.WARNING(f'{rota.nome:<32}sem dados no banco, ignorada'))
+                continue
+            resultado = medir(rota, ids, options['repeticoes'], options['aquecimento'])
+            resultado['violacoes'] = violacoes(resultado, fator)
+            resultados.append(resultado)
+
+            orcamento = '-' if rota.orcamento_consultas is None else rota.orcamento_consultas
+            linha = (
+                f"{rota.nome:<32}{resultado['status']:>7}"
+                f"{resultado['p50_ms']:>10.1f}{resultado['p95_ms']:>10.1f}{resultado['p99_ms']:>10.1f}"
+                f"{resultado['consultas']:>5}/{orcamento:<5}"
+            )
+            if resultado['violacoes']:
+                reprovadas.append(resultado)
+                linha = self.style.ERROR(f"{linha} {'; '.join(resultado['violacoes'])}")
+            self.stdout.write(linha)
+
+        if options['json']:
+            with open(options['json'], 'w', encoding='utf-8') as arquivo:
+                json.dump(resultados, arquivo, indent=2, ensure_ascii=False)
+
+        if reprovadas:
+            raise CommandError(f'{len(reprovadas)} rota(s) fora do orçamento.')
+        self.stdout.write(self.style.SUCCESS(f'{len(resultados)} rota(s) dentro do orçamento.'))
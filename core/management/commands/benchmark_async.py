@@ -0,0 +1,61 @@
+import asyncio
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.banco_async import usa_driver_async
+from core.benchmark import (
+    PARES_ASYNC,
+    _preencher,
+    ids_de_exemplo,
+    medir_concorrente_async,
+    medir_concorrente_sync,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara as rotas síncronas com as versões de /api/async/ sob "
+        "requisições concorrentes (vazão e p50/p95/p99)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requisicoes', type=int, default=200)
+        parser.add_argument('--concorrencia', type=int, default=20)
+        parser.add_argument(
+            '--rota',
+            action='append',
+            choices=[nome for nome, _, _ in PARES_ASYNC],
+            help='Mede só esta rota (pode repetir).',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            ids = ids_de_exemplo()
+        except ValueError as erro:
+            raise CommandError(str(erro))
+
+        requisicoes = options['requisicoes']
+        concorrencia = options['concorrencia']
+        if not usa_driver_async():
+            self.stdout.write(self.style.WARNING(
+                'Sem psycopg 3/PostgreSQL: os relatórios assíncronos caem para '
+                'sync_to_async e a comparação não reflete o driver assíncrono.'
+            ))
+
+        self.stdout.write(
+            f"{'rota':<24}{'modo':<8}{'req/s':>9}{'p50':>10}{'p95':>10}{'p99':>10}{'erros':>7}"
+        )
+        for nome, url_sync, url_async in PARES_ASYNC:
+            if options['rota'] and nome not in options['rota']:
+                continue
+            resultados = {
+                'sync': medir_concorrente_sync(_preencher(url_sync, ids), requisicoes, concorrencia),
+                'async': asyncio.run(
+                    medir_concorrente_async(_preencher(url_async, ids), requisicoes, concorrencia)
+                ),
+            }
+            for modo, r in resultados.items():
+                self.stdout.write(
+                    f"{nome:<24}{modo:<8}{r['por_segundo']:>9.1f}"
+                    f"{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}{r['erros']:>7}"
+                )
@@ -0,0 +1,60 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.dados import TAMANHO_LOTE, limpar, popular
+from core.models import Aluno, Curso
+from core.relatorios import atualizar_relatorios
+
+
+class Command(BaseCommand):
+    help = (
+        "Popula o banco com dados determinísticos em volume para benchmarks "
+        "(ex.: --alunos 1000000 --matriculas 5000000). A mesma --semente "
+        "gera sempre os mesmos dados."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--alunos', type=int, default=10000)
+        parser.add_argument('--cursos', type=int, default=200)
+        parser.add_argument('--matriculas', type=int, default=50000)
+        parser.add_argument('--semente', type=int, default=42)
+        parser.add_argument('--lote', type=int, default=TAMANHO_LOTE, help='Linhas por INSERT.')
+        parser.add_argument(
+            '--limpar',
+            action='store_true',
+            help='Apaga alunos, cursos, matrículas e dados derivados (TRUNCATE) antes de gerar.',
+        )
+
+    def handle(self, *args, **options):
+        if options['limpar']:
+            self.stdout.write('Apagando dados existentes...')
+            limpar()
+        elif Aluno.objects.exists() or Curso.objects.exists():
+            raise CommandError('O banco já tem dados; use --limpar para recomeçar do zero.')
+
+        inicio = time.monotonic()
+        try:
+            totais = popular(
+                alunos=options['alunos'],
+                cursos=options['cursos'],
+                matriculas=options['matriculas'],
+                semente=options['semente'],
+                tamanho_lote=options['lote'],
+                progresso=self.progresso,
+            )
+        except ValueError as erro:
+            raise CommandError(str(erro))
+        self.stdout.write('')
+
+        # os relatórios materializados passam a refletir os dados novos
+        atualizar_relatorios()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{totais['alunos']} alunos, {totais['cursos']} cursos e "
+            f"{totais['matriculas']} matrículas em {time.monotonic() - inicio:.1f}s."
+        ))
+
+    def progresso(self, model, total):
+        self.stdout.write(f'  {model._meta.verbose_name_plural}: {total}', ending='\r')
+        self.stdout.flush()
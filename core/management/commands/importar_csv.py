@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.importacao import IMPORTADORES, TAMANHO_LOTE, importar_csv, usa_copy
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa alunos ou matrículas de um CSV com cabeçalho, em lotes, via "
+        "COPY no PostgreSQL. Alunos: nome,email,cpf[,data_ingresso]. "
+        "Matrículas: aluno_cpf,curso_id[,status,data_matricula]. "
+        "Linhas rejeitadas vão para um CSV de erros com os motivos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('tipo', choices=sorted(IMPORTADORES))
+        parser.add_argument('arquivo')
+        parser.add_argument(
+            '--erros',
+            help='CSV das linhas rejeitadas (padrão: <arquivo>.erros.csv).',
+        )
+        parser.add_argument('--lote', type=int, default=TAMANHO_LOTE, help='Linhas por lote.')
+        parser.add_argument('--delimitador', default=',')
+        parser.add_argument('--encoding', default='utf-8-sig')
+
+    def handle(self, *args, **options):
+        caminho_erros = options['erros'] or f"{options['arquivo']}.erros.csv"
+        inicio = time.monotonic()
+        try:
+            with open(options['arquivo'], encoding=options['encoding'], newline='') as arquivo, \
+                    open(caminho_erros, 'w', encoding='utf-8', newline='') as arquivo_erros:
+                relatorio = importar_csv(
+                    options['tipo'],
+                    arquivo,
+                    arquivo_erros=arquivo_erros,
+                    tamanho_lote=options['lote'],
+                    delimitador=options['delimitador'],
+                )
+        except (OSError, ValueError) as erro:
+            raise CommandError(str(erro))
+        duracao = time.monotonic() - inicio
+
+        total = relatorio.inseridos + relatorio.rejeitados
+        metodo = 'COPY' if usa_copy() else 'bulk_create'
+        self.stdout.write(self.style.SUCCESS(
+            f'{relatorio.inseridos} {options["tipo"]} importados via {metodo} em '
+            f'{duracao:.1f}s ({total / duracao if duracao else 0:.0f} linhas/s).'
+        ))
+        if relatorio.rejeitados:
+            self.stdout.write(self.style.WARNING(
+                f'{relatorio.rejeitados} linha(s) rejeitada(s); ver {caminho_erros}.'
+            ))
@@ -0,0 +1,88 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+
+from core.jobs import limpar_expirados, processar_fila, recuperar_abandonados
+
+
+def _trabalhar(parar, intervalo):
+    # cada thread usa as próprias conexões; fechadas ao sair
+    concluidos = falhas = 0
+    try:
+        while not parar.is_set():
+            ok, com_falha = processar_fila(parar)
+            concluidos += ok
+            falhas += com_falha
+            if intervalo <= 0:
+                break
+            parar.wait(intervalo)
+    finally:
+        connections.close_all()
+    return concluidos, falhas
+
+
+class Command(BaseCommand):
+    help = (
+        "Processa os jobs de relatório (POST /api/relatorios/jobs/) com um "
+        "pool de threads. Vários processos podem rodar ao mesmo tempo: cada "
+        "job é reservado com FOR UPDATE SKIP LOCKED."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=2,
+            help='Threads processando jobs ao mesmo tempo. Padrão: 2.',
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=float,
+            default=0,
+            help='Espera N segundos com a fila vazia e repete, em vez de esvaziar a fila uma única vez.',
+        )
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        intervalo = options['intervalo']
+        if workers <= 0:
+            raise CommandError('--workers deve ser positivo.')
+        if workers > 1 and connection.vendor != 'postgresql':
+            # sem SKIP LOCKED, e o SQLite só aceita uma escrita por vez
+            self.stderr.write('Vários workers exigem PostgreSQL; usando 1.')
+            workers = 1
+
+        self._manutencao()
+        parar = threading.Event()
+        comeco = time.monotonic()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futuros = [executor.submit(_trabalhar, parar, intervalo) for _ in range(workers)]
+            try:
+                # com --intervalo as threads não terminam: a manutenção roda aqui
+                while intervalo > 0:
+                    time.sleep(intervalo)
+                    self._manutencao()
+                # sem --intervalo o Ctrl-C chega durante a espera pelas threads
+                resultados = [futuro.result() for futuro in futuros]
+            except KeyboardInterrupt:
+                self.stdout.write('Interrompido; aguardando os jobs em andamento...')
+                parar.set()
+                resultados = [futuro.result() for futuro in futuros]
+
+        concluidos = sum(ok for ok, _ in resultados)
+        falhas = sum(com_falha for _, com_falha in resultados)
+        duracao = time.monotonic() - comeco
+        self.stdout.write(self.style.SUCCESS(
+            f'{concluidos} job(s) concluído(s) e {falhas} falha(s) em {duracao:.1f} s.'
+        ))
+
+    def _manutencao(self):
+        recuperados = recuperar_abandonados()
+        if recuperados:
+            self.stdout.write(f'{recuperados} job(s) abandonado(s) devolvido(s) à fila.')
+        apagados = limpar_expirados()
+        if apagados:
+            self.stdout.write(f'{apagados} job(s) expirado(s) apagado(s).')
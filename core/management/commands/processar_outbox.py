@@ -0,0 +1,59 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.outbox import TAMANHO_LOTE, drenar, limpar_processados, pendentes
+
+
+class Command(BaseCommand):
+    help = (
+        "Entrega os eventos da outbox (matrículas e cursos alterados) aos "
+        "consumidores de core/outbox.py. Vários workers podem rodar ao "
+        "mesmo tempo: cada lote é travado com FOR UPDATE SKIP LOCKED."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote',
+            type=int,
+            default=TAMANHO_LOTE,
+            help=f'Eventos por transação. Padrão: {TAMANHO_LOTE}.',
+        )
+        parser.add_argument(
+            '--intervalo',
+            type=float,
+            default=0,
+            help='Espera N segundos com a fila vazia e repete, em vez de drenar uma única vez.',
+        )
+        parser.add_argument(
+            '--reter-dias',
+            type=int,
+            default=7,
+            help='Apaga eventos processados há mais de N dias (0 = não apaga). Padrão: 7.',
+        )
+
+    def handle(self, *args, **options):
+        if options['lote'] <= 0:
+            raise CommandError('--lote deve ser positivo.')
+
+        while True:
+            comeco = time.monotonic()
+            processados, falhas = drenar(options['lote'])
+            if processados or falhas:
+                duracao = time.monotonic() - comeco
+                self.stdout.write(self.style.SUCCESS(
+                    f'{processados} evento(s) processado(s) em {duracao:.1f} s.'
+                ))
+            if falhas:
+                self.stderr.write(
+                    f'{falhas} evento(s) com falha voltaram para a fila '
+                    f'({pendentes()} pendente(s)); veja EventoOutbox.erro.'
+                )
+            if options['reter_dias'] > 0:
+                apagados = limpar_processados(options['reter_dias'])
+                if apagados:
+                    self.stdout.write(f'{apagados} evento(s) antigo(s) apagado(s).')
+
+            if options['intervalo'] <= 0:
+                break
+            time.sleep(options['intervalo'])
@@ -0,0 +1,63 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+from django.utils.dateparse import parse_date
+
+from core.models import Matricula
+from core.receita import fim_do_mes, inicio_do_mes, recalcular_receita
+
+
+def _data(valor):
+    try:
+        data = parse_date(valor)
+    except ValueError:
+        data = None
+    if data is None:
+        raise CommandError(f'Data inválida: {valor!r}; use o formato AAAA-MM-DD.')
+    return data
+
+
+class Command(BaseCommand):
+    help = (
+        "Refaz os rollups de receita (ReceitaDiaria e ReceitaMensal) a "
+        "partir das matrículas, um mês por transação. Rode uma vez depois "
+        "de migrar para preencher o histórico."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--inicio', type=_data, help='Primeiro dia (AAAA-MM-DD). Padrão: a matrícula mais antiga.')
+        parser.add_argument('--fim', type=_data, help='Último dia (AAAA-MM-DD). Padrão: a matrícula mais recente.')
+        parser.add_argument(
+            '--curso',
+            type=int,
+            action='append',
+            help='Id do curso a recalcular (pode repetir). Padrão: todos.',
+        )
+
+    def handle(self, *args, **options):
+        limites = Matricula.objects.aggregate(menor=Min('data_matricula'), maior=Max('data_matricula'))
+        inicio = options['inicio'] or limites['menor']
+        fim = options['fim'] or limites['maior']
+        if inicio is None or fim is None:
+            self.stdout.write('Não há matrículas.')
+            return
+        if inicio > fim:
+            raise CommandError('--inicio deve ser anterior a --fim.')
+
+        comeco = time.monotonic()
+        mes = inicio_do_mes(inicio)
+        meses = 0
+        while mes <= fim:
+            recalcular_receita(inicio=mes, fim=mes, curso_ids=options['curso'])
+            meses += 1
+            if mes.month == 12:
+                self.stdout.write(f'{mes:%Y} recalculado')
+            mes = fim_do_mes(mes) + timedelta(days=1)
+
+        duracao = time.monotonic() - comeco
+        self.stdout.write(self.style.SUCCESS(
+            f'{meses} mes(es) recalculado(s) em {duracao:.1f} s.'
+        ))
+
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from core.saldos import verificar_saldos
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara o livro de saldos (SaldoAluno) com o recalculo completo "
+        "a partir das matriculas e, com --corrigir, repara as divergencias."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--corrigir',
+            action='store_true',
+            help='Recalcula os saldos dos alunos divergentes.',
+        )
+
+    def handle(self, *args, **options):
+        corrigir = options['corrigir']
+        divergentes = verificar_saldos(corrigir=corrigir)
+
+        if not divergentes:
+            self.stdout.write(self.style.SUCCESS('Livro de saldos consistente.'))
+            return
+
+        amostra = ', '.join(str(pk) for pk in divergentes[:20])
+        self.stdout.write(f'{len(divergentes)} aluno(s) divergente(s): {amostra}')
+        if corrigir:
+            self.stdout.write(self.style.SUCCESS('Saldos corrigidos.'))
+        else:
+            self.stdout.write(self.style.WARNING('Use --corrigir para reparar.'))
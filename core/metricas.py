@@ -0,0 +1,285 @@
+"""
+Instrumentação por requisição (consultas SQL e latência).
+
+O MetricasMiddleware envolve cada requisição com um execute_wrapper do
+Django e mede:
+- quantidade de consultas e tempo total no banco;
+- consultas duplicadas (mesma impressão digital, ex.: N+1 de um
+  SerializerMethodField);
+- tempo da view e tempo total.
+
+Os números saem no header Server-Timing (visível no DevTools do
+navegador) e são agregados por rota em /api/_metrics, no formato texto do
+Prometheus, com histogramas de latência e de consultas. O mesmo endpoint
+expõe as estatísticas dos pools de conexão (core_db_*, com DB_POOL=1),
+incluindo as esperas na retirada de conexão.
+
+Os agregados ficam na memória de cada processo: com vários workers o
+Prometheus deve raspar cada um (ou somar pelo label de instância). O custo
+por consulta é um perf_counter e um append; a impressão digital só é
+calculada no fim da requisição. METRICAS_ATIVAS = False em settings
+desliga tudo.
+"""
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+# limites dos histogramas (le=...)
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_CONSULTAS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+ROTA_NAO_ENCONTRADA = '<nao_encontrada>'
+
+_RE_LITERAIS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_RE_LISTAS = re.compile(r'(%s|\?)(\s*,\s*(%s|\?))+')
+
+
+def impressao_digital(sql):
+    """
+    SQL normalizado: literais viram ? e listas IN (%s, %s, ...) colapsam,
+    para que a mesma consulta com parâmetros diferentes conte como repetida.
+    """
+    sql = _RE_LITERAIS.sub('?', sql)
+    return _RE_LISTAS.sub(r'\1...', sql)
+
+
+class ColetorRequisicao:
+    """execute_wrapper que anota cada consulta da requisição"""
+
+    def __init__(self):
+        self.consultas = []
+        self.tempo_banco = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.tempo_banco += time.perf_counter() - inicio
+            self.consultas.append(sql)
+
+    def duplicadas(self):
+        """{impressao_digital: vezes} das consultas executadas mais de uma vez"""
+        contagem = Counter(impressao_digital(sql) for sql in self.consultas)
+        return {sql: vezes for sql, vezes in contagem.items() if vezes > 1}
+
+
+class Histograma:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.contagens = [0] * len(buckets)
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        self.soma += valor
+        self.total += 1
+        for i, limite in enumerate(self.buckets):
+            if valor <= limite:
+                self.contagens[i] += 1
+                break
+
+    def linhas(self, nome, labels):
+        acumulado = 0
+        for limite, quantidade in zip(self.buckets, self.contagens):
+            acumulado += quantidade
+            yield f'{nome}_bucket{{{labels},le="{limite}"}} {acumulado}'
+        yield f'{nome}_bucket{{{labels},le="+Inf"}} {self.total}'
+        yield f'{nome}_sum{{{labels}}} {self.soma:.6f}'
+        yield f'{nome}_count{{{labels}}} {self.total}'
+
+
+class RegistroMetricas:
+    """agregados por (rota, método) do processo atual"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.limpar()
+
+    def limpar(self):
+        with self._lock:
+            self.requisicoes = Counter()
+            self.duracao = defaultdict(lambda: Histograma(BUCKETS_SEGUNDOS))
+            self.tempo_banco = defaultdict(lambda: Histograma(BUCKETS_SEGUNDOS))
+            self.consultas = defaultdict(lambda: Histograma(BUCKETS_CONSULTAS))
+            self.duplicadas = Counter()
+
+    def registrar(self, rota, metodo, status, duracao, tempo_banco, consultas, duplicadas):
+        chave = (rota, metodo)
+        with self._lock:
+            self.requisicoes[(rota, metodo, str(status))] += 1
+            self.duracao[chave].observar(duracao)
+            self.tempo_banco[chave].observar(tempo_banco)
+            self.consultas[chave].observar(consultas)
+            self.duplicadas[chave] += duplicadas
+
+    def exportar(self):
+        """texto no formato de exposição do Prometheus (0.0.4)"""
+        with self._lock:
+            linhas = [
+                '# HELP core_http_requisicoes_total Requisições atendidas.',
+                '# TYPE core_http_requisicoes_total counter',
+            ]
+            for (rota, metodo, status), total in sorted(self.requisicoes.items()):
+                labels = _labels(rota=rota, metodo=metodo, status=status)
+                linhas.append(f'core_http_requisicoes_total{{{labels}}} {total}')
+
+            histogramas = (
+                ('core_http_duracao_segundos', 'Latência total da requisição.', self.duracao),
+                ('core_http_banco_segundos', 'Tempo no banco por requisição.', self.tempo_banco),
+                ('core_http_consultas', 'Consultas SQL por requisição.', self.consultas),
+            )
+            for nome, ajuda, por_rota in histogramas:
+                linhas.append(f'# HELP {nome} {ajuda}')
+                linhas.append(f'# TYPE {nome} histogram')
+                for (rota, metodo), histograma in sorted(por_rota.items()):
+                    linhas.extend(histograma.linhas(nome, _labels(rota=rota, metodo=metodo)))
+
+            linhas.append('# HELP core_http_consultas_duplicadas_total Consultas repetidas na mesma requisição.')
+            linhas.append('# TYPE core_http_consultas_duplicadas_total counter')
+            for (rota, metodo), total in sorted(self.duplicadas.items()):
+                labels = _labels(rota=rota, metodo=metodo)
+                linhas.append(f'core_http_consultas_duplicadas_total{{{labels}}} {total}')
+
+        linhas.extend(_linhas_pools())
+        return '\n'.join(linhas) + '\n'
+
+
+# estatísticas do psycopg_pool que sobem e descem; as demais são acumuladas
+MEDIDAS_POOL = {'pool_min', 'pool_max', 'pool_size', 'pool_available', 'requests_waiting'}
+
+
+def _linhas_pools():
+    """estatísticas dos pools de conexão (get_stats do psycopg_pool)"""
+    from .banco_async import pools_abertos
+
+    pools = [
+        (alias, 'sync', connections[alias].pool)
+        for alias in connections
+        if getattr(connections[alias], 'pool', None) is not None
+    ]
+    pools += [(alias, 'async', pool) for alias, pool in pools_abertos()]
+
+    series = defaultdict(list)
+    for alias, tipo, pool in pools:
+        for chave, valor in pool.get_stats().items():
+            series[chave].append((_labels(banco=alias, tipo=tipo), valor))
+
+    linhas = []
+    for chave, valores in sorted(series.items()):
+        nome = f'core_db_{chave}'
+        linhas.append(f'# TYPE {nome} {"gauge" if chave in MEDIDAS_POOL else "counter"}')
+        linhas.extend(f'{nome}{{{labels}}} {valor}' for labels, valor in valores)
+    return linhas
+
+
+def _labels(**valores):
+    def escapar(valor):
+        return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return ','.join(f'{chave}="{escapar(valor)}"' for chave, valor in valores.items())
+
+
+registro = RegistroMetricas()
+
+
+def _rota(request):
+    # o padrão da URL (api/alunos/<pk>/), não o caminho, para não
+    # criar uma série por id
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return ROTA_NAO_ENCONTRADA
+    return match.route or match.view_name or ROTA_NAO_ENCONTRADA
+
+
+def _ms(segundos):
+    return f'{segundos * 1000:.1f}'
+
+
+class MetricasMiddleware:
+    """
+    Mede consultas e latência de cada requisição, responde com
+    Server-Timing e alimenta o registro de /api/_metrics.
+    Funciona em WSGI e em ASGI (sem forçar as views assíncronas para
+    uma thread).
+    """
+    sync_capable = True
+    async_capable = True
+    caminho_metricas = '/api/_metrics'
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.ativo = getattr(settings, 'METRICAS_ATIVAS', True)
+        self.assincrono = iscoroutinefunction(get_response)
+        if self.assincrono:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.assincrono:
+            return self.__acall__(request)
+        if not self.ativo or request.path == self.caminho_metricas:
+            return self.get_response(request)
+
+        coletor = ColetorRequisicao()
+        request._metricas_inicio_view = None
+        inicio = time.perf_counter()
+        with self._instrumentar(coletor):
+            response = self.get_response(request)
+        return self._registrar(request, response, coletor, inicio)
+
+    async def __acall__(self, request):
+        if not self.ativo or request.path == self.caminho_metricas:
+            return await self.get_response(request)
+
+        coletor = ColetorRequisicao()
+        request._metricas_inicio_view = None
+        inicio = time.perf_counter()
+        # as conexões são por thread: o wrapper precisa ser instalado na
+        # thread em que o ORM assíncrono desta requisição executa
+        pilha = await sync_to_async(self._instrumentar)(coletor)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(pilha.close)()
+        return self._registrar(request, response, coletor, inicio)
+
+    def _instrumentar(self, coletor):
+        pilha = ExitStack()
+        for alias in connections:
+            pilha.enter_context(connections[alias].execute_wrapper(coletor))
+        return pilha
+
+    def _registrar(self, request, response, coletor, inicio):
+        duracao = time.perf_counter() - inicio
+        inicio_view = request._metricas_inicio_view
+        tempo_view = duracao - (inicio_view - inicio) if inicio_view else duracao
+        duplicadas = coletor.duplicadas()
+        repeticoes = sum(vezes - 1 for vezes in duplicadas.values())
+
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={_ms(coletor.tempo_banco)};desc="{len(coletor.consultas)} consultas"',
+            f'dup;desc="{repeticoes} repetidas"',
+            f'view;dur={_ms(tempo_view)}',
+            f'total;dur={_ms(duracao)}',
+        ])
+
+        registro.registrar(
+            rota=_rota(request),
+            metodo=request.method,
+            status=response.status_code,
+            duracao=duracao,
+            tempo_banco=coletor.tempo_banco,
+            consultas=len(coletor.consultas),
+            duplicadas=repeticoes,
+        )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # marca o início da view (depois dos demais middlewares)
+        if self.ativo:
+            request._metricas_inicio_view = time.perf_counter()
@@ -0,0 +1,64 @@
+# Generated by Django 5.1.3 on 2026-10-17 03:51
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def preencher_saldos(apps, schema_editor):
+    """preenche o livro de saldos a partir das matriculas existentes"""
+    Aluno = apps.get_model('core', 'Aluno')
+    SaldoAluno = apps.get_model('core', 'SaldoAluno')
+    db = schema_editor.connection.alias
+
+    linhas = Aluno.objects.using(db).order_by('pk').annotate(
+        devido=Sum('matriculas__curso__valor_inscricao', filter=Q(matriculas__status='PENDENTE'), default=Decimal('0')),
+        pago=Sum('matriculas__curso__valor_inscricao', filter=Q(matriculas__status='PAGO'), default=Decimal('0')),
+        total=Count('matriculas'),
+        pagas=Count('matriculas', filter=Q(matriculas__status='PAGO')),
+        pendentes=Count('matriculas', filter=Q(matriculas__status='PENDENTE')),
+    ).values_list('pk', 'devido', 'pago', 'total', 'pagas', 'pendentes')
+
+    lote = []
+    for pk, devido, pago, total, pagas, pendentes in linhas.iterator(chunk_size=2000):
+        lote.append(SaldoAluno(
+            aluno_id=pk,
+            total_devido=devido,
+            total_pago=pago,
+            total_matriculas=total,
+            matriculas_pagas=pagas,
+            matriculas_pendentes=pendentes,
+        ))
+        if len(lote) >= 2000:
+            SaldoAluno.objects.using(db).bulk_create(lote)
+            lote = []
+    if lote:
+        SaldoAluno.objects.using(db).bulk_create(lote)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaldoAluno',
+            fields=[
+                ('aluno', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='saldo', serialize=False, to='core.aluno', verbose_name='Aluno')),
+                ('total_devido', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=12, verbose_name='Total Devido')),
+                ('total_pago', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=12, verbose_name='Total Pago')),
+                ('total_matriculas', models.IntegerField(default=0, verbose_name='Total de Matrículas')),
+                ('matriculas_pagas', models.IntegerField(default=0, verbose_name='Matrículas Pagas')),
+                ('matriculas_pendentes', models.IntegerField(default=0, verbose_name='Matrículas Pendentes')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Saldo do Aluno',
+                'verbose_name_plural': 'Saldos dos Alunos',
+            },
+        ),
+        migrations.RunPython(preencher_saldos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.3 on 2026-10-17 03:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_saldoaluno'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='aluno',
+            index=models.Index(fields=['data_ingresso', 'id'], name='idx_aluno_ingresso_id'),
+        ),
+        migrations.AddIndex(
+            model_name='curso',
+            index=models.Index(fields=['nome', 'id'], name='idx_curso_nome_id'),
+        ),
+        migrations.AddIndex(
+            model_name='matricula',
+            index=models.Index(fields=['data_matricula', 'id'], name='idx_matricula_data_id'),
+        ),
+    ]
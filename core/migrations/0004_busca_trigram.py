@@ -0,0 +1,51 @@
+"""
+Busca por nome com pg_trgm, sem acento.
+
+unaccent() não é IMMUTABLE e não pode ser usado em índice, então criamos o
+wrapper core_unaccent() e indexamos core_unaccent(nome) com gin_trgm_ops.
+Os índices são criados com CONCURRENTLY (migration não atômica) para não
+bloquear escritas em tabelas grandes. Só roda no PostgreSQL.
+"""
+from django.db import migrations
+
+SQL_CRIAR = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    """
+    CREATE OR REPLACE FUNCTION core_unaccent(text) RETURNS text AS $$
+        SELECT public.unaccent('public.unaccent'::regdictionary, $1)
+    $$ LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+    """,
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_aluno_nome_trgm "
+    "ON core_aluno USING gin (core_unaccent(nome) gin_trgm_ops)",
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_curso_nome_trgm "
+    "ON core_curso USING gin (core_unaccent(nome) gin_trgm_ops)",
+]
+
+SQL_REMOVER = [
+    "DROP INDEX CONCURRENTLY IF EXISTS idx_curso_nome_trgm",
+    "DROP INDEX CONCURRENTLY IF EXISTS idx_aluno_nome_trgm",
+    "DROP FUNCTION IF EXISTS core_unaccent(text)",
+]
+
+
+def _executar(comandos):
+    def operacao(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for sql in comandos:
+            schema_editor.execute(sql)
+    return operacao
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('core', '0003_indices_paginacao_keyset'),
+    ]
+
+    operations = [
+        migrations.RunPython(_executar(SQL_CRIAR), _executar(SQL_REMOVER)),
+    ]
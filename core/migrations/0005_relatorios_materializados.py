@@ -0,0 +1,95 @@
+# Generated by Django 5.1.3 on 2026-10-17 04:00
+
+from django.db import migrations, models
+from django.utils import timezone
+
+# SQL congelado nesta migration (não importar de core/relatorios.py, que
+# pode mudar depois). Os índices únicos permitem REFRESH ... CONCURRENTLY.
+SQL_CRIAR = [
+    """
+    CREATE MATERIALIZED VIEW core_mv_relatorio_alunos AS
+    SELECT
+        a.id as aluno_id,
+        a.nome as aluno_nome,
+        a.email as aluno_email,
+        a.cpf as aluno_cpf,
+        a.data_ingresso,
+        COALESCE(s.total_matriculas, 0) as total_matriculas,
+        COALESCE(s.matriculas_pagas, 0) as matriculas_pagas,
+        COALESCE(s.matriculas_pendentes, 0) as matriculas_pendentes,
+        COALESCE(s.total_pago, 0) as total_pago,
+        COALESCE(s.total_devido, 0) as total_devido,
+        COALESCE(s.total_pago + s.total_devido, 0) as total_geral
+    FROM core_aluno a
+    LEFT JOIN core_saldoaluno s ON s.aluno_id = a.id
+    """,
+    "CREATE UNIQUE INDEX idx_mv_relatorio_alunos_id ON core_mv_relatorio_alunos (aluno_id)",
+    "CREATE INDEX idx_mv_relatorio_alunos_total ON core_mv_relatorio_alunos (total_geral DESC, aluno_id)",
+    """
+    CREATE MATERIALIZED VIEW core_mv_cursos_populares AS
+    SELECT
+        c.id as curso_id,
+        c.nome as curso_nome,
+        c.carga_horaria,
+        c.valor_inscricao,
+        c.status,
+        COUNT(m.id) as total_matriculas,
+        COUNT(CASE WHEN m.status = 'PAGO' THEN 1 END) as matriculas_pagas,
+        COUNT(CASE WHEN m.status = 'PENDENTE' THEN 1 END) as matriculas_pendentes,
+        COALESCE(SUM(CASE WHEN m.status = 'PAGO' THEN c.valor_inscricao ELSE 0 END), 0) as total_arrecadado
+    FROM core_curso c
+    LEFT JOIN core_matricula m ON c.id = m.curso_id
+    GROUP BY c.id, c.nome, c.carga_horaria, c.valor_inscricao, c.status
+    """,
+    "CREATE UNIQUE INDEX idx_mv_cursos_populares_id ON core_mv_cursos_populares (curso_id)",
+    "CREATE INDEX idx_mv_cursos_populares_total ON core_mv_cursos_populares (total_matriculas DESC, curso_id)",
+]
+
+SQL_REMOVER = [
+    "DROP MATERIALIZED VIEW IF EXISTS core_mv_cursos_populares",
+    "DROP MATERIALIZED VIEW IF EXISTS core_mv_relatorio_alunos",
+]
+
+
+def criar_views(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for sql in SQL_CRIAR:
+        schema_editor.execute(sql)
+    # as views são criadas já populadas
+    AtualizacaoRelatorio = apps.get_model('core', 'AtualizacaoRelatorio')
+    agora = timezone.now()
+    for nome in ('alunos', 'cursos_populares'):
+        AtualizacaoRelatorio.objects.using(schema_editor.connection.alias).update_or_create(
+            nome=nome, defaults={'atualizado_em': agora},
+        )
+
+
+def remover_views(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for sql in SQL_REMOVER:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_busca_trigram'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AtualizacaoRelatorio',
+            fields=[
+                ('nome', models.CharField(max_length=50, primary_key=True, serialize=False, verbose_name='Relatório')),
+                ('atualizado_em', models.DateTimeField(verbose_name='Atualizado em')),
+                ('duracao_ms', models.IntegerField(default=0, verbose_name='Duração (ms)')),
+            ],
+            options={
+                'verbose_name': 'Atualização de Relatório',
+                'verbose_name_plural': 'Atualizações de Relatórios',
+            },
+        ),
+        migrations.RunPython(criar_views, remover_views),
+    ]
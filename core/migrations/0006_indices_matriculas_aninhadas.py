@@ -0,0 +1,21 @@
+# Generated by Django 5.1.3 on 2026-10-17 04:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_relatorios_materializados'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='matricula',
+            index=models.Index(fields=['aluno', 'data_matricula', 'id'], name='idx_matricula_aluno_data'),
+        ),
+        migrations.AddIndex(
+            model_name='matricula',
+            index=models.Index(fields=['curso', 'data_matricula', 'id'], name='idx_matricula_curso_data'),
+        ),
+    ]
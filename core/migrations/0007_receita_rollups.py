@@ -0,0 +1,51 @@
+# Generated by Django 5.1.3 on 2026-10-17 04:33
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_indices_matriculas_aninhadas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReceitaDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('PAGO', 'Pago'), ('PENDENTE', 'Pendente')], max_length=10, verbose_name='Status de Pagamento')),
+                ('quantidade', models.IntegerField(default=0, verbose_name='Matrículas')),
+                ('valor', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14, verbose_name='Valor')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('data', models.DateField(verbose_name='Dia')),
+                ('curso', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.curso', verbose_name='Curso')),
+            ],
+            options={
+                'verbose_name': 'Receita Diária',
+                'verbose_name_plural': 'Receitas Diárias',
+                'indexes': [models.Index(fields=['curso', 'data'], name='idx_receita_diaria_curso')],
+                'constraints': [models.UniqueConstraint(fields=('data', 'curso', 'status'), name='uniq_receita_diaria')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ReceitaMensal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('PAGO', 'Pago'), ('PENDENTE', 'Pendente')], max_length=10, verbose_name='Status de Pagamento')),
+                ('quantidade', models.IntegerField(default=0, verbose_name='Matrículas')),
+                ('valor', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=14, verbose_name='Valor')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('data', models.DateField(verbose_name='Mês')),
+                ('curso', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.curso', verbose_name='Curso')),
+            ],
+            options={
+                'verbose_name': 'Receita Mensal',
+                'verbose_name_plural': 'Receitas Mensais',
+                'indexes': [models.Index(fields=['curso', 'data'], name='idx_receita_mensal_curso')],
+                'constraints': [models.UniqueConstraint(fields=('data', 'curso', 'status'), name='uniq_receita_mensal')],
+            },
+        ),
+    ]
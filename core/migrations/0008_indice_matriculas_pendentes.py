@@ -0,0 +1,46 @@
+"""
+Índice parcial das matrículas pendentes (core/pendencias.py).
+
+Só as linhas com status = 'PENDENTE' entram no índice, ordenadas por
+data_matricula (a idade da pendência) e id. No PostgreSQL o índice
+inclui curso_id e aluno_id, para que o resumo por faixas seja uma
+varredura só do índice, e é criado com CONCURRENTLY (migration não
+atômica) para não bloquear escritas em tabelas grandes.
+"""
+from django.db import migrations
+
+CONDICAO = "WHERE status = 'PENDENTE'"
+
+
+def criar(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_matricula_pendente_data "
+            "ON core_matricula (data_matricula, id) INCLUDE (curso_id, aluno_id) "
+            + CONDICAO
+        )
+    else:
+        schema_editor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_matricula_pendente_data "
+            "ON core_matricula (data_matricula, id) " + CONDICAO
+        )
+
+
+def remover(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX CONCURRENTLY IF EXISTS idx_matricula_pendente_data")
+    else:
+        schema_editor.execute("DROP INDEX IF EXISTS idx_matricula_pendente_data")
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('core', '0007_receita_rollups'),
+    ]
+
+    operations = [
+        migrations.RunPython(criar, remover),
+    ]
@@ -0,0 +1,58 @@
+"""
+Índices compostos das matrículas por status (apontados pelo comando
+auditar_consultas).
+
+(aluno_id, status, curso_id) cobre os totais por aluno
+(com_totais_calculados, recálculo do livro de saldos) e (curso_id,
+status) cobre as contagens por curso (estatisticas, total_arrecadado):
+as duas consultas passam a ler só o índice, sem visitar a tabela.
+
+No PostgreSQL os índices são criados com CONCURRENTLY (migration não
+atômica) para não bloquear escritas em tabelas grandes; o estado dos
+models é o mesmo nos dois casos.
+"""
+from django.db import migrations, models
+
+INDICES = [
+    models.Index(fields=['aluno', 'status', 'curso'], name='idx_matricula_aluno_status'),
+    models.Index(fields=['curso', 'status'], name='idx_matricula_curso_status'),
+]
+
+
+def criar(apps, schema_editor):
+    Matricula = apps.get_model('core', 'Matricula')
+    concorrente = schema_editor.connection.vendor == 'postgresql'
+    for indice in INDICES:
+        if concorrente:
+            schema_editor.add_index(Matricula, indice, concurrently=True)
+        else:
+            schema_editor.add_index(Matricula, indice)
+
+
+def remover(apps, schema_editor):
+    Matricula = apps.get_model('core', 'Matricula')
+    concorrente = schema_editor.connection.vendor == 'postgresql'
+    for indice in INDICES:
+        if concorrente:
+            schema_editor.remove_index(Matricula, indice, concurrently=True)
+        else:
+            schema_editor.remove_index(Matricula, indice)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('core', '0008_indice_matriculas_pendentes'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[migrations.RunPython(criar, remover)],
+            state_operations=[
+                migrations.AddIndex(model_name='matricula', index=indice)
+                for indice in INDICES
+            ],
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.3 on 2026-10-17 04:49
+
+import django.core.serializers.json
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_indices_status_matriculas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventoOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('matricula_criada', 'Matrícula criada'), ('matricula_excluida', 'Matrícula excluída'), ('matricula_status', 'Status da matrícula alterado'), ('curso_alterado', 'Valor ou status do curso alterado')], max_length=30, verbose_name='Tipo')),
+                ('objeto_id', models.BigIntegerField(verbose_name='Objeto')),
+                ('dados', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Dados')),
+                ('criado_em', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Criado em')),
+                ('processado_em', models.DateTimeField(blank=True, null=True, verbose_name='Processado em')),
+                ('tentativas', models.IntegerField(default=0, verbose_name='Tentativas')),
+                ('erro', models.TextField(blank=True, default='', verbose_name='Último erro')),
+            ],
+            options={
+                'verbose_name': 'Evento da Outbox',
+                'verbose_name_plural': 'Eventos da Outbox',
+                'indexes': [models.Index(condition=models.Q(('processado_em__isnull', True)), fields=['id'], name='idx_outbox_pendentes')],
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.1.3 on 2026-10-17 04:51
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_outbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobRelatorio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('alunos', 'Financeiro por aluno'), ('cursos_populares', 'Cursos populares'), ('pendencias', 'Pendências por faixa')], max_length=30, verbose_name='Tipo')),
+                ('formato', models.CharField(choices=[('csv', 'CSV'), ('ndjson', 'NDJSON')], default='csv', max_length=10, verbose_name='Formato')),
+                ('parametros', models.JSONField(default=dict, verbose_name='Parâmetros')),
+                ('chave', models.CharField(max_length=64, verbose_name='Chave')),
+                ('status', models.CharField(choices=[('PENDENTE', 'Pendente'), ('PROCESSANDO', 'Processando'), ('CONCLUIDO', 'Concluído'), ('ERRO', 'Erro')], default='PENDENTE', max_length=15, verbose_name='Status')),
+                ('criado_em', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Criado em')),
+                ('iniciado_em', models.DateTimeField(blank=True, null=True, verbose_name='Iniciado em')),
+                ('concluido_em', models.DateTimeField(blank=True, null=True, verbose_name='Concluído em')),
+                ('expira_em', models.DateTimeField(blank=True, null=True, verbose_name='Expira em')),
+                ('tentativas', models.IntegerField(default=0, verbose_name='Tentativas')),
+                ('erro', models.TextField(blank=True, default='', verbose_name='Último erro')),
+                ('arquivo', models.CharField(blank=True, default='', max_length=255, verbose_name='Arquivo')),
+                ('linhas', models.IntegerField(blank=True, null=True, verbose_name='Linhas')),
+                ('tamanho_bytes', models.BigIntegerField(blank=True, null=True, verbose_name='Tamanho (bytes)')),
+            ],
+            options={
+                'verbose_name': 'Job de Relatório',
+                'verbose_name_plural': 'Jobs de Relatório',
+                'indexes': [models.Index(condition=models.Q(('status', 'PENDENTE')), fields=['criado_em', 'id'], name='idx_job_relatorio_fila'), models.Index(fields=['expira_em'], name='idx_job_relatorio_expira')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('status__in', ['PENDENTE', 'PROCESSANDO'])), fields=('chave',), name='uniq_job_relatorio_em_andamento')],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+"""
+Busca de e-mail por substring no admin (core/busca.py, filtro_contem).
+
+`email ILIKE '%termo%'` usa um índice GIN com gin_trgm_ops (pg_trgm já
+criada pela 0004). Criado com CONCURRENTLY (migration não atômica) para
+não bloquear escritas em core_aluno. Só roda no PostgreSQL.
+"""
+from django.db import migrations
+
+SQL_CRIAR = [
+    "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_aluno_email_trgm "
+    "ON core_aluno USING gin (email gin_trgm_ops)",
+]
+
+SQL_REMOVER = [
+    "DROP INDEX CONCURRENTLY IF EXISTS idx_aluno_email_trgm",
+]
+
+
+def _executar(comandos):
+    def operacao(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for sql in comandos:
+            schema_editor.execute(sql)
+    return operacao
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('core', '0011_jobs_relatorio'),
+    ]
+
+    operations = [
+        migrations.RunPython(_executar(SQL_CRIAR), _executar(SQL_REMOVER)),
+    ]
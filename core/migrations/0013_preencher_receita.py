@@ -0,0 +1,50 @@
+"""
+Preenche os rollups de receita com o histórico anterior à 0007.
+
+A manutenção incremental (core/receita.py) supõe que toda matrícula já
+tem a linha do seu período, curso e status: a mudança de status soma um
+delta negativo na linha de origem. Sem o histórico, esse upsert criaria
+linhas com quantidade e valor negativos. Mesmo agregado do comando
+recalcular_receita, com os models históricos.
+"""
+from django.db import migrations
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+
+def preencher(apps, schema_editor):
+    Matricula = apps.get_model('core', 'Matricula')
+    alias = schema_editor.connection.alias
+    ops = schema_editor.connection.ops
+    agora = ops.adapt_datetimefield_value(timezone.now())
+    for nome, periodo in (
+        ('ReceitaDiaria', F('data_matricula')),
+        ('ReceitaMensal', TruncMonth('data_matricula')),
+    ):
+        modelo = apps.get_model('core', nome)
+        agregado = Matricula.objects.using(alias).order_by().values(
+            'curso_id', 'status', periodo=periodo,
+        ).annotate(
+            total=Count('pk'),
+            soma=Sum('curso__valor_inscricao'),
+        )
+        subconsulta, params = agregado.query.sql_with_params()
+        tabela = ops.quote_name(modelo._meta.db_table)
+        modelo.objects.using(alias).all().delete()
+        schema_editor.execute(
+            f'INSERT INTO {tabela} (data, curso_id, status, quantidade, valor, updated_at) '
+            f'SELECT periodo, curso_id, status, total, soma, %s FROM ({subconsulta}) agregado',
+            [agora, *params],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_busca_email_trgm'),
+    ]
+
+    operations = [
+        migrations.RunPython(preencher, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.3 on 2026-10-17 05:21
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_preencher_receita'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eventooutbox',
+            name='disponivel_em',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Disponível em'),
+        ),
+    ]
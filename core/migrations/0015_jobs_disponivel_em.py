@@ -0,0 +1,19 @@
+# Generated by Django 5.1.3 on 2026-10-17 05:30
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_outbox_disponivel_em'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='jobrelatorio',
+            name='disponivel_em',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Disponível em'),
+        ),
+    ]
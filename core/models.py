@@ -1,7 +1,120 @@
-from django.db import models
+from decimal import Decimal
+
+from django.db import connections, models, transaction
+from django.db.models import Count, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.core.serializers.json import DjangoJSONEncoder
 from django.core.validators import EmailValidator
 from django.utils import timezone
 
+from .signals import lote_criado, queryset_atualizado
+
+
+# linhas por UPDATE em update()
+TAMANHO_LOTE_UPDATE = 2000
+
+
+class RastreavelQuerySet(models.QuerySet):
+    """
+    QuerySet que avisa (via sinais queryset_atualizado e lote_criado)
+    quando update() ou bulk_create() sao chamados, ja que eles nao
+    disparam pre_save/post_save.
+    campos_rastreados define quais valores anteriores sao enviados.
+    """
+    campos_rastreados = ()
+
+    def update(self, **kwargs):
+        """
+        UPDATE em lotes de TAMANHO_LOTE_UPDATE linhas, percorridas por pk.
+        Cada lote e lido com SELECT ... FOR UPDATE antes do UPDATE, entao
+        os valores anteriores enviados no sinal sao os que o UPDATE
+        substituiu, mesmo com escritas simultaneas, e a lista de pks nunca
+        passa do tamanho do lote. O sinal sai uma vez por lote.
+        """
+        if self.query.is_sliced:
+            raise TypeError('Cannot update a query once a slice has been taken.')
+        # self.db deve apontar para o banco de escrita (ver core/roteamento.py)
+        self._for_write = True
+        alvo = self
+        if self.query.distinct or self.query.combinator:
+            # FOR UPDATE nao aceita DISTINCT: filtra pelos pks do queryset
+            alvo = self.model._base_manager.using(self.db).filter(pk__in=self.values('pk'))
+        alvo = alvo.order_by('pk').select_for_update(of=('self',))
+
+        linhas = 0
+        ultimo = None
+        with transaction.atomic(using=self.db):
+            while True:
+                lote = alvo if ultimo is None else alvo.filter(pk__gt=ultimo)
+                anteriores = list(
+                    lote.values('pk', *self.campos_rastreados)[:TAMANHO_LOTE_UPDATE]
+                )
+                if not anteriores:
+                    break
+                ultimo = anteriores[-1]['pk']
+                linhas += self.model._base_manager.using(self.db).filter(
+                    pk__in=[item['pk'] for item in anteriores]
+                ).update(**kwargs)
+                queryset_atualizado.send(
+                    sender=self.model,
+                    anteriores=anteriores,
+                    campos=set(kwargs),
+                    valores=kwargs,
+                    using=self.db,
+                )
+                if len(anteriores) < TAMANHO_LOTE_UPDATE:
+                    break
+        return linhas
+    update.alters_data = True
+
+    def bulk_create(self, objs, *args, **kwargs):
+        self._for_write = True
+        with transaction.atomic(using=self.db):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            if objs:
+                lote_criado.send(sender=self.model, objs=objs, using=self.db)
+        return objs
+    bulk_create.alters_data = True
+
+
+class AlunoQuerySet(RastreavelQuerySet):
+    def com_totais(self):
+        """
+        Anota valor_devido, valor_pago e qtd_matriculas lendo o livro de
+        saldos (SaldoAluno), sem agregar as matriculas de cada aluno.
+        """
+        zero = Value(Decimal('0'), output_field=models.DecimalField())
+        return self.annotate(
+            valor_devido=Coalesce('saldo__total_devido', zero),
+            valor_pago=Coalesce('saldo__total_pago', zero),
+            qtd_matriculas=Coalesce('saldo__total_matriculas', 0),
+        )
+
+    def com_totais_calculados(self):
+        """
+        Calcula os mesmos totais de com_totais() direto das matriculas, em
+        uma unica consulta agrupada. E a fonte de verdade do livro de saldos.
+        """
+        queryset = self
+        # consultas com GROUP BY ignoram o Meta.ordering, entao reaplicamos
+        if not queryset.query.order_by:
+            queryset = queryset.order_by(*self.model._meta.ordering)
+        return queryset.annotate(
+            valor_devido=Sum(
+                'matriculas__curso__valor_inscricao',
+                filter=Q(matriculas__status='PENDENTE'),
+                default=Decimal('0'),
+            ),
+            valor_pago=Sum(
+                'matriculas__curso__valor_inscricao',
+                filter=Q(matriculas__status='PAGO'),
+                default=Decimal('0'),
+            ),
+            qtd_matriculas=Count('matriculas'),
+            qtd_pagas=Count('matriculas', filter=Q(matriculas__status='PAGO')),
+            qtd_pendentes=Count('matriculas', filter=Q(matriculas__status='PENDENTE')),
+        )
+
 
 class Aluno(models.Model):
     nome = models.CharField(max_length=200, verbose_name="Nome Completo")
@@ -23,21 +136,36 @@ class Aluno(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = AlunoQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Aluno"
         verbose_name_plural = "Alunos"
         ordering = ['-data_ingresso']
+        indexes = [
+            # chave da paginação keyset (Meta.ordering + id)
+            models.Index(fields=['data_ingresso', 'id'], name='idx_aluno_ingresso_id'),
+        ]
 
     def __str__(self):
         return f"{self.nome} - {self.cpf}"
 
     def total_devido(self):
-        matriculas_pendentes = self.matriculas.filter(status='PENDENTE')
-        return sum(m.curso.valor_inscricao for m in matriculas_pendentes)
+        return self._saldo('total_devido')
 
     def total_pago(self):
-        matriculas_pagas = self.matriculas.filter(status='PAGO')
-        return sum(m.curso.valor_inscricao for m in matriculas_pagas)
+        return self._saldo('total_pago')
+
+    def _saldo(self, campo):
+        """le um valor do livro de saldos (busca pela chave primaria)"""
+        valor = SaldoAluno.objects.filter(aluno_id=self.pk).values_list(
+            campo, flat=True
+        ).first()
+        return valor if valor is not None else Decimal('0')
+
+
+class CursoQuerySet(RastreavelQuerySet):
+    campos_rastreados = ('valor_inscricao', 'status')
 
 
 class Curso(models.Model):
@@ -65,10 +193,15 @@ class Curso(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CursoQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Curso"
         verbose_name_plural = "Cursos"
         ordering = ['nome']
+        indexes = [
+            models.Index(fields=['nome', 'id'], name='idx_curso_nome_id'),
+        ]
 
     def __str__(self):
         return f"{self.nome} ({self.get_status_display()})"
@@ -80,6 +213,71 @@ class Curso(models.Model):
         matriculas_pagas = self.matriculas.filter(status='PAGO')
         return matriculas_pagas.count() * self.valor_inscricao
 
+    def save(self, *args, **kwargs):
+        # mudancas de valor_inscricao atualizam o livro de saldos no
+        # post_save; ambos precisam estar na mesma transacao
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
+
+class MatriculaQuerySet(RastreavelQuerySet):
+    campos_rastreados = ('aluno_id', 'curso_id', 'status', 'data_matricula')
+
+    def transicionar_status(self, novo_status):
+        """
+        Muda o status das matriculas do queryset com um unico UPDATE
+        condicional com RETURNING: a subconsulta trava (FOR UPDATE) as
+        linhas que ainda nao estao em novo_status e o RETURNING devolve o
+        status que cada uma tinha.
+        Retorna a lista de (id, aluno_id, curso_id, status_anterior) que
+        realmente mudaram.
+        """
+        self._for_write = True
+        conexao = connections[self.db]
+        tabela = conexao.ops.quote_name(self.model._meta.db_table)
+        agora = timezone.now()
+        with transaction.atomic(using=self.db):
+            alvo = (
+                self.exclude(status=novo_status).order_by()
+                .select_for_update(of=('self',)).values('pk', 'status')
+            )
+            subconsulta, params = alvo.query.sql_with_params()
+            if conexao.vendor == 'postgresql':
+                sql = (
+                    f'UPDATE {tabela} m SET status = %s, updated_at = %s '
+                    f'FROM ({subconsulta}) anterior '
+                    f'WHERE m.id = anterior.id AND m.status <> %s '
+                    f'RETURNING m.id, m.aluno_id, m.curso_id, m.data_matricula, anterior.status'
+                )
+            else:
+                # o RETURNING do SQLite nao enxerga as tabelas do FROM; so
+                # existem dois status, entao o anterior e o outro
+                anterior = 'PENDENTE' if novo_status == 'PAGO' else 'PAGO'
+                sql = (
+                    f'UPDATE {tabela} SET status = %s, updated_at = %s '
+                    f'WHERE id IN (SELECT anterior.id FROM ({subconsulta}) anterior) AND status <> %s '
+                    f"RETURNING id, aluno_id, curso_id, data_matricula, '{anterior}'"
+                )
+            with conexao.cursor() as cursor:
+                cursor.execute(sql, [novo_status, agora, *params, novo_status])
+                linhas = cursor.fetchall()
+            if linhas:
+                queryset_atualizado.send(
+                    sender=self.model,
+                    anteriores=[
+                        {
+                            'pk': pk, 'aluno_id': aluno_id, 'curso_id': curso_id,
+                            'status': status, 'data_matricula': data_matricula,
+                        }
+                        for pk, aluno_id, curso_id, data_matricula, status in linhas
+                    ],
+                    campos={'status', 'updated_at'},
+                    valores={'status': novo_status, 'updated_at': agora},
+                    using=self.db,
+                )
+        return [(pk, aluno_id, curso_id, status) for pk, aluno_id, curso_id, _, status in linhas]
+    transicionar_status.alters_data = True
+
 
 class Matricula(models.Model):
     STATUS_CHOICES = [
@@ -112,15 +310,265 @@ class Matricula(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = MatriculaQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Matrícula"
         verbose_name_plural = "Matrículas"
         ordering = ['-data_matricula']
         unique_together = ['aluno', 'curso']
+        indexes = [
+            models.Index(fields=['data_matricula', 'id'], name='idx_matricula_data_id'),
+            # páginas de /alunos/{id}/matriculas/ e /cursos/{id}/matriculas/
+            models.Index(fields=['aluno', 'data_matricula', 'id'], name='idx_matricula_aluno_data'),
+            models.Index(fields=['curso', 'data_matricula', 'id'], name='idx_matricula_curso_data'),
+            # totais por aluno e por curso filtrados por status, lidos só
+            # do índice (ver comando auditar_consultas)
+            models.Index(fields=['aluno', 'status', 'curso'], name='idx_matricula_aluno_status'),
+            models.Index(fields=['curso', 'status'], name='idx_matricula_curso_status'),
+        ]
 
     def __str__(self):
         return f"{self.aluno.nome} - {self.curso.nome} ({self.get_status_display()})"
 
+    def save(self, *args, **kwargs):
+        # o livro de saldos e atualizado no post_save; ambos na mesma transacao
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
     def marcar_como_pago(self):
         self.status = 'PAGO'
-        self.save()
\ No newline at end of file
+        self.save(update_fields=['status', 'updated_at'])
+
+
+class SaldoAluno(models.Model):
+    """
+    Livro de saldos por aluno (tabela desnormalizada).
+    Mantido incrementalmente em core/saldos.py a cada escrita em Matricula
+    ou Curso; o comando verificar_saldos compara com o recalculo completo.
+    """
+    aluno = models.OneToOneField(
+        Aluno,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='saldo',
+        verbose_name="Aluno"
+    )
+    total_devido = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=Decimal('0'),
+        verbose_name="Total Devido"
+    )
+    total_pago = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=Decimal('0'),
+        verbose_name="Total Pago"
+    )
+    total_matriculas = models.IntegerField(default=0, verbose_name="Total de Matrículas")
+    matriculas_pagas = models.IntegerField(default=0, verbose_name="Matrículas Pagas")
+    matriculas_pendentes = models.IntegerField(default=0, verbose_name="Matrículas Pendentes")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Saldo do Aluno"
+        verbose_name_plural = "Saldos dos Alunos"
+
+    def __str__(self):
+        return f"Saldo de {self.aluno_id}: devido {self.total_devido} / pago {self.total_pago}"
+
+
+class AtualizacaoRelatorio(models.Model):
+    """
+    Registro da última atualização de cada view materializada de
+    relatório (ver core/relatorios.py).
+    """
+    nome = models.CharField(max_length=50, primary_key=True, verbose_name="Relatório")
+    atualizado_em = models.DateTimeField(verbose_name="Atualizado em")
+    duracao_ms = models.IntegerField(default=0, verbose_name="Duração (ms)")
+
+    class Meta:
+        verbose_name = "Atualização de Relatório"
+        verbose_name_plural = "Atualizações de Relatórios"
+
+    def __str__(self):
+        return f"{self.nome} ({self.atualizado_em:%d/%m/%Y %H:%M})"
+
+
+class ReceitaPeriodo(models.Model):
+    """
+    Base dos rollups de receita: matrículas e valor por período, curso e
+    status (tabelas desnormalizadas). Mantidos incrementalmente em
+    core/receita.py; o comando recalcular_receita refaz o histórico a
+    partir das matrículas.
+    """
+    curso = models.ForeignKey(
+        Curso,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name="Curso"
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=Matricula.STATUS_CHOICES,
+        verbose_name="Status de Pagamento"
+    )
+    quantidade = models.IntegerField(default=0, verbose_name="Matrículas")
+    valor = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=Decimal('0'),
+        verbose_name="Valor"
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        abstract = True
+
+
+class ReceitaDiaria(ReceitaPeriodo):
+    data = models.DateField(verbose_name="Dia")
+
+    class Meta:
+        verbose_name = "Receita Diária"
+        verbose_name_plural = "Receitas Diárias"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['data', 'curso', 'status'], name='uniq_receita_diaria',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['curso', 'data'], name='idx_receita_diaria_curso'),
+        ]
+
+    def __str__(self):
+        return f"{self.data:%d/%m/%Y} curso {self.curso_id} {self.status}: {self.quantidade}"
+
+
+class ReceitaMensal(ReceitaPeriodo):
+    # primeiro dia do mês
+    data = models.DateField(verbose_name="Mês")
+
+    class Meta:
+        verbose_name = "Receita Mensal"
+        verbose_name_plural = "Receitas Mensais"
+        constraints = [
+            models.UniqueConstraint(
+                fields=['data', 'curso', 'status'], name='uniq_receita_mensal',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['curso', 'data'], name='idx_receita_mensal_curso'),
+        ]
+
+    def __str__(self):
+        return f"{self.data:%m/%Y} curso {self.curso_id} {self.status}: {self.quantidade}"
+
+
+class EventoOutbox(models.Model):
+    """
+    Caixa de saída transacional (core/outbox.py): cada mudança de
+    matrícula ou curso grava um evento na mesma transação da escrita, e o
+    comando processar_outbox entrega os eventos aos consumidores fora da
+    requisição.
+    """
+    TIPOS = [
+        ('matricula_criada', 'Matrícula criada'),
+        ('matricula_excluida', 'Matrícula excluída'),
+        ('matricula_status', 'Status da matrícula alterado'),
+        ('curso_alterado', 'Valor ou status do curso alterado'),
+    ]
+
+    tipo = models.CharField(max_length=30, choices=TIPOS, verbose_name="Tipo")
+    # id da matrícula ou do curso
+    objeto_id = models.BigIntegerField(verbose_name="Objeto")
+    dados = models.JSONField(encoder=DjangoJSONEncoder, default=dict, verbose_name="Dados")
+    criado_em = models.DateTimeField(default=timezone.now, verbose_name="Criado em")
+    processado_em = models.DateTimeField(null=True, blank=True, verbose_name="Processado em")
+    tentativas = models.IntegerField(default=0, verbose_name="Tentativas")
+    erro = models.TextField(blank=True, default='', verbose_name="Último erro")
+    # depois de uma falha o evento só volta à fila após a espera (backoff)
+    disponivel_em = models.DateTimeField(default=timezone.now, verbose_name="Disponível em")
+
+    class Meta:
+        verbose_name = "Evento da Outbox"
+        verbose_name_plural = "Eventos da Outbox"
+        indexes = [
+            # fila: só os eventos ainda não processados, em ordem de id
+            models.Index(
+                fields=['id'],
+                condition=Q(processado_em__isnull=True),
+                name='idx_outbox_pendentes',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.tipo} #{self.objeto_id} ({self.criado_em:%d/%m/%Y %H:%M:%S})"
+
+
+class JobRelatorio(models.Model):
+    """
+    Relatório gerado fora da requisição (core/jobs.py): a API enfileira,
+    o comando processar_jobs_relatorio gera o arquivo compactado e o
+    cliente consulta o status e baixa o resultado.
+    """
+    TIPOS = [
+        ('alunos', 'Financeiro por aluno'),
+        ('cursos_populares', 'Cursos populares'),
+        ('pendencias', 'Pendências por faixa'),
+    ]
+    FORMATOS = [
+        ('csv', 'CSV'),
+        ('ndjson', 'NDJSON'),
+    ]
+    STATUS_CHOICES = [
+        ('PENDENTE', 'Pendente'),
+        ('PROCESSANDO', 'Processando'),
+        ('CONCLUIDO', 'Concluído'),
+        ('ERRO', 'Erro'),
+    ]
+    EM_ANDAMENTO = ('PENDENTE', 'PROCESSANDO')
+
+    tipo = models.CharField(max_length=30, choices=TIPOS, verbose_name="Tipo")
+    formato = models.CharField(max_length=10, choices=FORMATOS, default='csv', verbose_name="Formato")
+    parametros = models.JSONField(default=dict, verbose_name="Parâmetros")
+    # hash de tipo, formato e parâmetros: identifica jobs idênticos
+    chave = models.CharField(max_length=64, verbose_name="Chave")
+    status = models.CharField(max_length=15, choices=STATUS_CHOICES, default='PENDENTE', verbose_name="Status")
+    criado_em = models.DateTimeField(default=timezone.now, verbose_name="Criado em")
+    iniciado_em = models.DateTimeField(null=True, blank=True, verbose_name="Iniciado em")
+    concluido_em = models.DateTimeField(null=True, blank=True, verbose_name="Concluído em")
+    expira_em = models.DateTimeField(null=True, blank=True, verbose_name="Expira em")
+    tentativas = models.IntegerField(default=0, verbose_name="Tentativas")
+    erro = models.TextField(blank=True, default='', verbose_name="Último erro")
+    # depois de uma falha o job só volta a ser reservado após a espera
+    disponivel_em = models.DateTimeField(default=timezone.now, verbose_name="Disponível em")
+    # caminho relativo a RELATORIOS_JOBS_DIR
+    arquivo = models.CharField(max_length=255, blank=True, default='', verbose_name="Arquivo")
+    linhas = models.IntegerField(null=True, blank=True, verbose_name="Linhas")
+    tamanho_bytes = models.BigIntegerField(null=True, blank=True, verbose_name="Tamanho (bytes)")
+
+    class Meta:
+        verbose_name = "Job de Relatório"
+        verbose_name_plural = "Jobs de Relatório"
+        constraints = [
+            # no máximo um job idêntico pendente ou em andamento
+            models.UniqueConstraint(
+                fields=['chave'],
+                condition=Q(status__in=['PENDENTE', 'PROCESSANDO']),
+                name='uniq_job_relatorio_em_andamento',
+            ),
+        ]
+        indexes = [
+            # fila: só os pendentes, do mais antigo para o mais novo
+            models.Index(
+                fields=['criado_em', 'id'],
+                condition=Q(status='PENDENTE'),
+                name='idx_job_relatorio_fila',
+            ),
+            models.Index(fields=['expira_em'], name='idx_job_relatorio_expira'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} ({self.get_status_display()})"
@@ -0,0 +1,374 @@
+"""
+Caixa de saída transacional (EventoOutbox).
+
+Toda mudança que interessa aos dados derivados vira um evento gravado na
+mesma transação da escrita, então um evento existe se e somente se a
+escrita foi confirmada:
+- matrícula criada (save, bulk_create, importação) ou excluída;
+- status da matrícula alterado (save, marcar_como_pago, QuerySet.update()
+  das ações do admin, transicionar_status);
+- Curso.valor_inscricao ou Curso.status alterados (save ou update()).
+
+O comando `python manage.py processar_outbox` drena a fila em lotes com
+SELECT ... FOR UPDATE SKIP LOCKED: cada worker trava só as linhas que
+pegou, então vários workers rodam em paralelo sem pegar o mesmo evento.
+Cada lote é entregue a todos os consumidores (funções registradas com
+@consumidor) e marcado como processado na mesma transação. Se um
+consumidor falha, os eventos do lote são entregues um a um e só os que
+falharem voltam para a fila, com o erro registrado e uma espera
+exponencial (disponivel_em) antes da próxima tentativa; depois de
+MAX_TENTATIVAS o evento é marcado como processado com o erro, para não
+travar a fila. A entrega é "pelo menos uma vez": consumidores devem ser
+idempotentes.
+
+Os relatórios materializados (core/relatorios.py) não são um consumidor:
+um REFRESH por lote rodaria dentro da transação que trava os eventos e
+repetiria a view inteira a cada lote. drenar() atualiza as views depois
+que os lotes foram confirmados, no máximo uma vez a cada
+OUTBOX_INTERVALO_RELATORIOS_S (contando REFRESHs de outros workers e do
+cron); os eventos que chegarem nesse intervalo entram no próximo.
+
+O livro de saldos, os rollups de receita e a invalidação do cache
+continuam síncronos: são incrementais e as leituras da API dependem
+deles na mesma requisição.
+"""
+import traceback
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.expressions import Combinable
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import AtualizacaoRelatorio, Curso, EventoOutbox, Matricula
+from .receita import _data
+from .roteamento import ler_do_primario
+from .signals import ExclusaoAgrupada, lote_criado, queryset_atualizado
+
+TAMANHO_LOTE = 500
+MAX_TENTATIVAS = 5
+# espera antes de repetir um evento que falhou: 30s, 1min, 2min... até 1h
+ESPERA_BASE_S = 30
+ESPERA_MAXIMA_S = 3600
+
+_consumidores = []
+
+# eventos processados por este worker que as views ainda não refletem
+_relatorios = {'pendentes': False}
+
+
+def consumidor(funcao):
+    """registra funcao(eventos), chamada com cada lote processado"""
+    _consumidores.append(funcao)
+    return funcao
+
+
+# ============================================
+# GRAVACAO
+# ============================================
+
+def registrar(eventos, using=None):
+    """grava EventoOutbox não salvos na transação corrente de `using`"""
+    if eventos:
+        EventoOutbox.objects.db_manager(using).bulk_create(eventos, batch_size=TAMANHO_LOTE)
+
+
+def _evento(tipo, objeto_id, **dados):
+    return EventoOutbox(tipo=tipo, objeto_id=objeto_id, dados=dados)
+
+
+def _evento_status(pk, aluno_id, curso_id, anterior, novo):
+    return _evento(
+        'matricula_status', pk,
+        aluno_id=aluno_id, curso_id=curso_id, status_anterior=anterior, status=novo,
+    )
+
+
+def _valor_literal(valores, campo):
+    """valor do update() para `campo`, se não for uma expressão (F(), Case...)"""
+    valor = (valores or {}).get(campo)
+    if valor is None or isinstance(valor, Combinable) or hasattr(valor, 'resolve_expression'):
+        return None
+    return valor
+
+
+# ============================================
+# PROCESSAMENTO
+# ============================================
+
+def _entregar(eventos):
+    """entrega `eventos` a todos os consumidores; retorna o erro ou None"""
+    try:
+        # o savepoint desfaz o que os consumidores gravaram se algum falhar
+        with transaction.atomic():
+            for funcao in _consumidores:
+                funcao(eventos)
+    except Exception:
+        return traceback.format_exc(limit=5)
+    return None
+
+
+def espera_apos_falha(tentativas):
+    """backoff exponencial até a próxima tentativa de um evento"""
+    return timedelta(seconds=min(ESPERA_BASE_S * 2 ** (tentativas - 1), ESPERA_MAXIMA_S))
+
+
+def processar_lote(tamanho=TAMANHO_LOTE):
+    """
+    Trava até `tamanho` eventos disponíveis (SKIP LOCKED), entrega aos
+    consumidores e os marca como processados. Se o lote falha, cada
+    evento é entregue sozinho: só os que falharem de novo voltam para a
+    fila, com o erro e a espera da próxima tentativa. Retorna
+    (processados, com_falha).
+    """
+    agora = timezone.now()
+    # a fila é lida e travada no primário
+    with ler_do_primario(), transaction.atomic():
+        eventos = list(
+            EventoOutbox.objects.select_for_update(skip_locked=True)
+            .filter(processado_em__isnull=True, disponivel_em__lte=agora)
+            .order_by('id')[:tamanho]
+        )
+        if not eventos:
+            return 0, 0
+
+        falhas = {}
+        erro = _entregar(eventos)
+        if erro is not None and len(eventos) == 1:
+            falhas[eventos[0].pk] = erro
+        elif erro is not None:
+            # um evento com problema não derruba os outros do lote
+            for evento in eventos:
+                erro_evento = _entregar([evento])
+                if erro_evento is not None:
+                    falhas[evento.pk] = erro_evento
+
+        agora = timezone.now()
+        EventoOutbox.objects.filter(
+            pk__in=[evento.pk for evento in eventos if evento.pk not in falhas],
+        ).update(processado_em=agora, erro='')
+
+        com_falha = [evento for evento in eventos if evento.pk in falhas]
+        for evento in com_falha:
+            evento.tentativas += 1
+            evento.erro = falhas[evento.pk]
+            evento.disponivel_em = agora + espera_apos_falha(evento.tentativas)
+            # esgotadas as tentativas, sai da fila com o erro registrado
+            if evento.tentativas >= MAX_TENTATIVAS:
+                evento.processado_em = agora
+        EventoOutbox.objects.bulk_update(
+            com_falha, ['tentativas', 'erro', 'disponivel_em', 'processado_em'],
+        )
+        return len(eventos) - len(com_falha), len(com_falha)
+
+
+def drenar(tamanho=TAMANHO_LOTE):
+    """
+    Processa lotes até a fila não ter mais eventos disponíveis; depois
+    atualiza os relatórios materializados, se for a hora. Eventos que
+    falharam só voltam depois da espera, então não são repetidos aqui.
+    """
+    processados = falhas = 0
+    while True:
+        ok, com_falha = processar_lote(tamanho)
+        processados += ok
+        falhas += com_falha
+        if ok + com_falha < tamanho:
+            break
+    atualizar_relatorios_materializados(processados > 0)
+    return processados, falhas
+
+
+def atualizar_relatorios_materializados(houve_eventos):
+    """
+    REFRESH das views fora da transação dos lotes, se há eventos que elas
+    ainda não refletem e o último REFRESH tem mais de
+    OUTBOX_INTERVALO_RELATORIOS_S. Retorna True se atualizou.
+    """
+    from .relatorios import RELATORIOS, atualizar_relatorios, usa_view_materializada
+    if not usa_view_materializada():
+        return False
+    _relatorios['pendentes'] = _relatorios['pendentes'] or houve_eventos
+    if not _relatorios['pendentes']:
+        return False
+    with ler_do_primario():
+        atualizacoes = list(AtualizacaoRelatorio.objects.filter(
+            nome__in=RELATORIOS,
+        ).values_list('atualizado_em', flat=True))
+    intervalo = timedelta(seconds=settings.OUTBOX_INTERVALO_RELATORIOS_S)
+    if len(atualizacoes) == len(RELATORIOS) and timezone.now() - min(atualizacoes) < intervalo:
+        return False
+    atualizar_relatorios()
+    _relatorios['pendentes'] = False
+    return True
+
+
+def limpar_processados(dias):
+    """apaga eventos processados há mais de `dias` dias"""
+    limite = timezone.now() - timedelta(days=dias)
+    apagados, _ = EventoOutbox.objects.filter(processado_em__lt=limite).delete()
+    return apagados
+
+
+def pendentes():
+    return EventoOutbox.objects.filter(processado_em__isnull=True).count()
+
+
+# ============================================
+# CONSUMIDORES
+# ============================================
+
+@consumidor
+def aquecer_resumo_geral(eventos):
+    # recalcula o resumo do dashboard no cache versionado. Com locmem o
+    # cache e por processo e o worker nao aquece o dos servidores web.
+    from .cache import cache_compartilhado, obter_ou_calcular
+    if not cache_compartilhado():
+        return
+    from .estatisticas import estatisticas_gerais
+    obter_ou_calcular('estatisticas_gerais', estatisticas_gerais)
+
+
+# ============================================
+# EVENTOS (sinais)
+# ============================================
+
+@receiver(post_init, sender=Matricula)
+def guardar_status_outbox(sender, instance, **kwargs):
+    # __dict__ evita consultas extras em instancias com campos adiados
+    instance._outbox_status = instance.__dict__.get('status')
+
+
+@receiver(post_save, sender=Matricula)
+def registrar_matricula(sender, instance, created, raw=False, using=None, **kwargs):
+    if raw:
+        return
+    anterior = instance._outbox_status
+    instance._outbox_status = instance.status
+    if created:
+        registrar([_evento(
+            'matricula_criada', instance.pk,
+            aluno_id=instance.aluno_id, curso_id=instance.curso_id,
+            status=instance.status, data_matricula=_data(instance.data_matricula),
+        )], using)
+    elif anterior is not None and anterior != instance.status:
+        registrar([_evento_status(instance.pk, instance.aluno_id, instance.curso_id, anterior, instance.status)], using)
+
+
+def _evento_exclusao(instance):
+    return _evento(
+        'matricula_excluida', instance.pk,
+        aluno_id=instance.aluno_id, curso_id=instance.curso_id, status=instance.status,
+    )
+
+
+_exclusao = ExclusaoAgrupada('exclusao_outbox', eventos=list)
+
+
+@receiver(pre_delete, sender=Matricula)
+def acumular_exclusao_matricula_outbox(sender, instance, origin=None, **kwargs):
+    # em massa ou em cascata os eventos saem num unico INSERT
+    if not isinstance(origin, Matricula):
+        _exclusao.de(origin)['eventos'].append(_evento_exclusao(instance))
+
+
+@receiver(post_delete, sender=Matricula)
+def registrar_exclusao_matricula(sender, instance, origin=None, using=None, **kwargs):
+    if isinstance(origin, Matricula):
+        registrar([_evento_exclusao(instance)], using)
+        return
+    atual = _exclusao.retirar(origin)
+    if atual is not None:
+        registrar(atual['eventos'], using)
+
+
+@receiver(queryset_atualizado, sender=Matricula)
+def registrar_status_em_massa(sender, anteriores, campos, valores=None, using=None, **kwargs):
+    if 'status' not in campos:
+        return
+    novo = _valor_literal(valores, 'status')
+    if novo is not None:
+        novos = {item['pk']: novo for item in anteriores}
+    else:
+        novos = dict(Matricula.objects.using(using).filter(
+            pk__in=[item['pk'] for item in anteriores]
+        ).values_list('pk', 'status'))
+    registrar([
+        _evento_status(item['pk'], item['aluno_id'], item['curso_id'], item['status'], novos[item['pk']])
+        for item in anteriores
+        if item['pk'] in novos and novos[item['pk']] != item['status']
+    ], using)
+
+
+@receiver(lote_criado, sender=Matricula)
+def registrar_matriculas_lote(sender, objs, using=None, **kwargs):
+    # sem pk (backends sem RETURNING) nao ha como identificar o evento
+    registrar([
+        _evento(
+            'matricula_criada', obj.pk,
+            aluno_id=obj.aluno_id, curso_id=obj.curso_id, status=obj.status,
+            data_matricula=_data(obj.__dict__.get('data_matricula')),
+        )
+        for obj in objs if obj.pk is not None
+    ], using)
+
+
+@receiver(post_init, sender=Curso)
+def guardar_estado_curso_outbox(sender, instance, **kwargs):
+    instance._outbox_estado = (
+        instance.__dict__.get('valor_inscricao'),
+        instance.__dict__.get('status'),
+    )
+
+
+def _evento_curso(pk, valor_anterior, valor, status_anterior, status):
+    return _evento(
+        'curso_alterado', pk,
+        curso_id=pk, valor_anterior=valor_anterior, valor=valor,
+        status_anterior=status_anterior, status=status,
+    )
+
+
+def _mudou(anterior, atual):
+    if isinstance(anterior, (Decimal, int, float)) or isinstance(atual, (Decimal, int, float)):
+        return Decimal(str(anterior)) != Decimal(str(atual))
+    return anterior != atual
+
+
+@receiver(post_save, sender=Curso)
+def registrar_curso(sender, instance, created, raw=False, using=None, **kwargs):
+    valor_anterior, status_anterior = instance._outbox_estado
+    instance._outbox_estado = (instance.valor_inscricao, instance.status)
+    if created or raw or valor_anterior is None:
+        return
+    if _mudou(valor_anterior, instance.valor_inscricao) or status_anterior != instance.status:
+        registrar([_evento_curso(
+            instance.pk, valor_anterior, instance.valor_inscricao, status_anterior, instance.status,
+        )], using)
+
+
+@receiver(queryset_atualizado, sender=Curso)
+def registrar_cursos_em_massa(sender, anteriores, campos, using=None, **kwargs):
+    if not campos & {'valor_inscricao', 'status'}:
+        return
+    # os valores novos podem ser expressoes (ex.: F('valor_inscricao') * 1.1)
+    atuais = {
+        linha['pk']: linha
+        for linha in Curso.objects.using(using).filter(
+            pk__in=[item['pk'] for item in anteriores]
+        ).values('pk', 'valor_inscricao', 'status')
+    }
+    registrar([
+        _evento_curso(
+            item['pk'], item['valor_inscricao'], atual['valor_inscricao'],
+            item['status'], atual['status'],
+        )
+        for item in anteriores
+        if (atual := atuais.get(item['pk'])) is not None and (
+            _mudou(item['valor_inscricao'], atual['valor_inscricao'])
+            or item['status'] != atual['status']
+        )
+    ], using)
@@ -0,0 +1,190 @@
+"""
+Paginação das APIs.
+
+O padrão continua sendo PageNumberPagination (?page=N). Para listas
+grandes, o cliente pode optar pela paginação por chave (keyset) enviando
+?paginacao=keyset na primeira página e depois seguindo os links
+next/previous (?cursor=...). A chave é o Meta.ordering do model mais o id
+como desempate, então cada página é uma busca no índice composto, sem
+COUNT(*) nem OFFSET: a página 10.000 custa o mesmo que a primeira.
+"""
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError as ErroValidacao
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginação por chave composta (campos de ordenação + id).
+    Todos os campos usam a direção do primeiro, para que o banco
+    percorra um único índice (ex.: data_ingresso DESC, id DESC).
+    """
+    cursor_query_param = 'cursor'
+    page_size = api_settings.PAGE_SIZE
+    invalid_cursor_message = 'Cursor inválido.'
+
+    def __init__(self, page_size=None):
+        if page_size is not None:
+            self.page_size = page_size
+
+    def get_ordering(self, queryset):
+        # pk pelo nome do campo: as linhas de values_list(named=True) da
+        # leitura rápida (core/serializers.py) não têm o atributo pk
+        pk = queryset.model._meta.pk.name
+        ordering = list(queryset.query.order_by or queryset.model._meta.ordering)
+        if not ordering:
+            ordering = [pk]
+        descendente = ordering[0].startswith('-')
+        campos = [pk if campo.lstrip('-') == 'pk' else campo.lstrip('-') for campo in ordering]
+        nomes = {f.name for f in queryset.model._meta.concrete_fields}
+        if not set(campos) <= nomes:
+            # ex.: ordenação por relevância (?q=) não tem chave estável
+            raise ErroValidacao('A paginação keyset exige ordenação por campos do model.')
+        if pk not in campos:
+            campos.append(pk)
+        return campos, descendente
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.campos, self.descendente = self.get_ordering(queryset)
+        self.base_url = request.build_absolute_uri()
+
+        chave, self.voltando = self.decodificar_cursor(request, queryset.model)
+
+        # ao voltar, lê na direção inversa e desinverte a página no final
+        descendente = self.descendente != self.voltando
+        prefixo = '-' if descendente else ''
+        queryset = queryset.order_by(*[prefixo + campo for campo in self.campos])
+        if chave is not None:
+            queryset = queryset.filter(self.filtro_apos(chave, descendente))
+
+        # uma linha a mais indica se existe próxima página
+        pagina = list(queryset[:self.page_size + 1])
+        tem_mais = len(pagina) > self.page_size
+        pagina = pagina[:self.page_size]
+        if self.voltando:
+            pagina.reverse()
+
+        if self.voltando:
+            self.tem_anterior = tem_mais
+            self.tem_proxima = True
+        else:
+            self.tem_anterior = chave is not None
+            self.tem_proxima = tem_mais
+        self.pagina = pagina
+        return pagina
+
+    def filtro_apos(self, chave, descendente):
+        """
+        (c1 < v1) OR (c1 = v1 AND c2 < v2) OR ...
+        com c1 <= v1 repetido na frente, para o índice começar na chave.
+        """
+        operador = 'lt' if descendente else 'gt'
+        filtro = Q()
+        iguais = {}
+        for campo, valor in zip(self.campos, chave):
+            filtro |= Q(**iguais, **{f'{campo}__{operador}': valor})
+            iguais[campo] = valor
+        primeiro = self.campos[0]
+        limite = {f'{primeiro}__{operador}e': chave[0]}
+        return Q(**limite) & filtro
+
+    def chave_de(self, obj):
+        return [getattr(obj, campo) for campo in self.campos]
+
+    def codificar_cursor(self, obj, voltando):
+        dados = {
+            'k': [str(valor) for valor in self.chave_de(obj)],
+            'v': int(voltando),
+        }
+        cursor = base64.urlsafe_b64encode(json.dumps(dados).encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def decodificar_cursor(self, request, model):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, False
+        try:
+            dados = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+            valores = dados['k']
+            if len(valores) != len(self.campos):
+                raise ValueError
+            chave = [
+                model._meta.get_field(campo).to_python(valor)
+                for campo, valor in zip(self.campos, valores)
+            ]
+            return chave, bool(dados.get('v'))
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.tem_proxima or not self.pagina:
+            return None
+        return self.codificar_cursor(self.pagina[-1], voltando=False)
+
+    def get_previous_link(self):
+        if not self.tem_anterior or not self.pagina:
+            return None
+        return self.codificar_cursor(self.pagina[0], voltando=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class PaginacaoPadrao(PageNumberPagination):
+    """
+    PageNumberPagination por padrão; KeysetPagination quando o cliente
+    envia ?paginacao=keyset ou um ?cursor=.
+    """
+    keyset_query_param = 'paginacao'
+
+    def usa_keyset(self, request):
+        return (
+            request.query_params.get(self.keyset_query_param) == 'keyset'
+            or KeysetPagination.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.usa_keyset(request):
+            self.keyset = KeysetPagination(page_size=self.page_size)
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_next_link(self):
+        if self.keyset is not None:
+            return self.keyset.get_next_link()
+        return super().get_next_link()
+
+    def get_previous_link(self):
+        if self.keyset is not None:
+            return self.keyset.get_previous_link()
+        return super().get_previous_link()
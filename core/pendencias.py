@@ -0,0 +1,74 @@
+"""
+Envelhecimento das matrículas pendentes (consulta 4 de database.sql).
+
+As matrículas PENDENTE são agrupadas por dias desde data_matricula em
+faixas fixas. As faixas viram intervalos de data_matricula calculados a
+partir de hoje, e não uma conta por linha, para que o banco use o índice
+parcial idx_matricula_pendente_data (migration 0008): as pendentes são
+uma fração pequena da tabela e o índice só tem essas linhas.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .models import Matricula
+
+# (nome, dias mínimo, dias máximo ou None)
+FAIXAS = [
+    ('0-30', 0, 30),
+    ('31-60', 31, 60),
+    ('61-90', 61, 90),
+    ('90+', 91, None),
+]
+NOMES_FAIXAS = [nome for nome, _, _ in FAIXAS]
+
+
+def filtro_faixa(nome, hoje=None):
+    """Q sobre data_matricula para uma faixa de dias pendente"""
+    hoje = hoje or timezone.localdate()
+    _, minimo, maximo = next(faixa for faixa in FAIXAS if faixa[0] == nome)
+    # a primeira faixa também leva datas futuras (dias negativos)
+    filtro = Q(data_matricula__lte=hoje - timedelta(days=minimo)) if minimo else Q()
+    if maximo is not None:
+        filtro &= Q(data_matricula__gte=hoje - timedelta(days=maximo))
+    return filtro
+
+
+def matriculas_pendentes(curso_id=None):
+    matriculas = Matricula.objects.filter(status='PENDENTE')
+    if curso_id is not None:
+        matriculas = matriculas.filter(curso_id=curso_id)
+    return matriculas
+
+
+def resumo_pendencias(curso_id=None, hoje=None):
+    """
+    Quantidade e valor das pendentes por faixa, em uma consulta de
+    agregação condicional.
+    """
+    hoje = hoje or timezone.localdate()
+    agregados = {}
+    for indice, (nome, _, _) in enumerate(FAIXAS):
+        filtro = filtro_faixa(nome, hoje)
+        agregados[f'qtd_{indice}'] = Count('pk', filter=filtro)
+        agregados[f'valor_{indice}'] = Sum('curso__valor_inscricao', filter=filtro, default=Decimal('0'))
+    totais = matriculas_pendentes(curso_id).aggregate(**agregados)
+
+    faixas = [
+        {
+            'faixa': nome,
+            'dias_min': minimo,
+            'dias_max': maximo,
+            'matriculas': totais[f'qtd_{indice}'],
+            'valor': totais[f'valor_{indice}'],
+        }
+        for indice, (nome, minimo, maximo) in enumerate(FAIXAS)
+    ]
+    return {
+        'data_referencia': hoje,
+        'total_matriculas': sum(faixa['matriculas'] for faixa in faixas),
+        'total_valor': sum((faixa['valor'] for faixa in faixas), Decimal('0')),
+        'faixas': faixas,
+    }
@@ -0,0 +1,398 @@
+"""
+Rollups de receita por dia e por mês (ReceitaDiaria e ReceitaMensal).
+
+Cada linha guarda, para um período, um curso e um status, quantas
+matrículas foram feitas e a soma de Curso.valor_inscricao delas, de modo
+que /api/relatorios/receita/ lê no máximo uma linha por período, curso e
+status em vez de varrer core_matricula.
+
+Os rollups são mantidos incrementalmente a cada escrita, como o livro de
+saldos (core/saldos.py):
+- criar uma matrícula soma nela com INSERT ... ON CONFLICT DO UPDATE
+  (cria a linha do período se ainda não existir);
+- excluir subtrai com UPDATE e F(); exclusões em massa ou em cascata
+  subtraem o agregado das matrículas em um único upsert, ignorando os
+  cursos que estão sendo excluídos junto (as linhas deles saem em
+  cascata);
+- mudar o status (também via QuerySet.update() e transicionar_status)
+  move a matrícula de uma linha para a outra;
+- trocar curso ou data (save ou update()) e alterar
+  Curso.valor_inscricao recalculam apenas os meses afetados de cada curso;
+- bulk_create() soma o lote agregado em uma consulta.
+
+O histórico anterior aos rollups foi preenchido pela migration 0013, então
+toda matrícula tem a linha do seu período, curso e status; um período
+divergente é refeito com `python manage.py recalcular_receita`.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connections, router, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Curso, Matricula, ReceitaDiaria, ReceitaMensal
+from .roteamento import ler_do_primario
+from .signals import ExclusaoAgrupada, lote_criado, queryset_atualizado
+
+ROLLUPS = (ReceitaDiaria, ReceitaMensal)
+GRANULARIDADES = {'dia': ReceitaDiaria, 'mes': ReceitaMensal}
+
+TAMANHO_LOTE = 500
+
+_campo_data = Matricula._meta.get_field('data_matricula')
+
+
+def _data(valor):
+    # o default de data_matricula (timezone.now) é um datetime e os
+    # cursores crus do SQLite devolvem texto
+    return _campo_data.to_python(valor)
+
+
+def inicio_do_mes(data):
+    return data.replace(day=1)
+
+
+def fim_do_mes(data):
+    return (data.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+
+
+def _periodo(modelo, data):
+    return inicio_do_mes(data) if modelo is ReceitaMensal else data
+
+
+# ============================================
+# DELTAS
+# ============================================
+
+def somar(deltas):
+    """
+    Soma nos rollups um dict {(data, curso_id, status): (quantidade, valor)},
+    criando as linhas que faltarem. Só use deltas negativos para linhas que
+    já existem (ex.: a origem de uma mudança de status).
+    """
+    agora = timezone.now()
+    for modelo in ROLLUPS:
+        por_periodo = {}
+        for (data, curso_id, status), (quantidade, valor) in deltas.items():
+            _acumular(por_periodo, (_periodo(modelo, _data(data)), curso_id, status), quantidade, valor)
+        linhas = [(chave, delta) for chave, delta in por_periodo.items() if delta != (0, 0)]
+        for inicio in range(0, len(linhas), TAMANHO_LOTE):
+            _upsert(modelo, linhas[inicio:inicio + TAMANHO_LOTE], agora)
+
+
+def _upsert(modelo, linhas, agora):
+    conexao = connections[router.db_for_write(modelo)]
+    ops = conexao.ops
+    params = []
+    for (data, curso_id, status), (quantidade, valor) in linhas:
+        params += [
+            ops.adapt_datefield_value(data), curso_id, status, quantidade,
+            ops.adapt_decimalfield_value(valor), ops.adapt_datetimefield_value(agora),
+        ]
+    tabela = conexao.ops.quote_name(modelo._meta.db_table)
+    valores = ', '.join(['(%s, %s, %s, %s, %s, %s)'] * len(linhas))
+    sql = (
+        f'INSERT INTO {tabela} (data, curso_id, status, quantidade, valor, updated_at) '
+        f'VALUES {valores} '
+        f'ON CONFLICT (data, curso_id, status) DO UPDATE SET '
+        f'quantidade = {tabela}.quantidade + EXCLUDED.quantidade, '
+        f'valor = {tabela}.valor + EXCLUDED.valor, '
+        f'updated_at = EXCLUDED.updated_at'
+    )
+    with conexao.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def subtrair(data, curso_id, status, valor):
+    """tira uma matrícula dos rollups; linhas ausentes ficam como estão"""
+    data = _data(data)
+    for modelo in ROLLUPS:
+        modelo.objects.filter(
+            data=_periodo(modelo, data), curso_id=curso_id, status=status,
+        ).update(
+            quantidade=F('quantidade') - 1,
+            valor=F('valor') - valor,
+            updated_at=timezone.now(),
+        )
+
+
+# ============================================
+# RECALCULO
+# ============================================
+
+def recalcular_receita(inicio=None, fim=None, curso_ids=None):
+    """
+    Refaz os rollups a partir das matrículas. Os limites são ampliados
+    para meses inteiros; sem limites, refaz todo o histórico.
+    """
+    rollups, matriculas = Q(), Q()
+    if inicio is not None:
+        rollups &= Q(data__gte=inicio_do_mes(inicio))
+        matriculas &= Q(data_matricula__gte=inicio_do_mes(inicio))
+    if fim is not None:
+        rollups &= Q(data__lte=fim_do_mes(fim))
+        matriculas &= Q(data_matricula__lte=fim_do_mes(fim))
+    if curso_ids is not None:
+        curso_ids = list(curso_ids)
+        if not curso_ids:
+            return
+        rollups &= Q(curso_id__in=curso_ids)
+        matriculas &= Q(curso_id__in=curso_ids)
+    _recalcular(rollups, matriculas)
+
+
+def _recalcular_intervalos(intervalos):
+    """
+    Refaz os meses entre a menor e a maior data de cada curso:
+    {curso_id: (data_minima, data_maxima)}.
+    """
+    rollups, matriculas = Q(), Q()
+    for curso_id, (menor, maior) in intervalos.items():
+        meses = (inicio_do_mes(menor), fim_do_mes(maior))
+        rollups |= Q(curso_id=curso_id, data__range=meses)
+        matriculas |= Q(curso_id=curso_id, data_matricula__range=meses)
+    if intervalos:
+        _recalcular(rollups, matriculas)
+
+
+def _incluir(intervalos, curso_id, data):
+    if curso_id is None or data is None:
+        return
+    data = _data(data)
+    menor, maior = intervalos.get(curso_id, (data, data))
+    intervalos[curso_id] = (min(menor, data), max(maior, data))
+
+
+def _recalcular(filtro_rollups, filtro_matriculas):
+    """
+    Apaga as linhas dos rollups em `filtro_rollups` e as regrava com um
+    INSERT ... SELECT agregado das matrículas em `filtro_matriculas`
+    (os dois filtros cobrem os mesmos cursos e meses).
+    """
+    agora = timezone.now()
+    # o recálculo grava o que leu: nunca ler de uma réplica
+    with ler_do_primario():
+        for modelo in ROLLUPS:
+            periodo = TruncMonth('data_matricula') if modelo is ReceitaMensal else F('data_matricula')
+            agregado = Matricula.objects.filter(filtro_matriculas).order_by().values(
+                'curso_id', 'status', periodo=periodo,
+            ).annotate(
+                total=Count('pk'),
+                soma=Sum('curso__valor_inscricao'),
+            )
+            subconsulta, params = agregado.query.sql_with_params()
+            conexao = connections[router.db_for_write(modelo)]
+            tabela = conexao.ops.quote_name(modelo._meta.db_table)
+            with transaction.atomic(using=conexao.alias):
+                # um DELETE só: com o post_delete genérico do cache o
+                # delete() buscaria os ids e apagaria de 100 em 100
+                modelo.objects.using(conexao.alias).filter(filtro_rollups)._raw_delete(conexao.alias)
+                with conexao.cursor() as cursor:
+                    cursor.execute(
+                        f'INSERT INTO {tabela} (data, curso_id, status, quantidade, valor, updated_at) '
+                        f'SELECT periodo, curso_id, status, total, soma, %s FROM ({subconsulta}) agregado',
+                        [conexao.ops.adapt_datetimefield_value(agora), *params],
+                    )
+
+
+# ============================================
+# CONSULTA
+# ============================================
+
+def receita_por_periodo(granularidade='dia', inicio=None, fim=None, curso_id=None):
+    """
+    Matrículas e valores pagos/pendentes por dia ou por mês, somados dos
+    rollups (todos os cursos ou só `curso_id`).
+    """
+    modelo = GRANULARIDADES[granularidade]
+    linhas = modelo.objects.filter(quantidade__gt=0)
+    if inicio is not None:
+        linhas = linhas.filter(data__gte=_periodo(modelo, inicio))
+    if fim is not None:
+        linhas = linhas.filter(data__lte=fim)
+    if curso_id is not None:
+        linhas = linhas.filter(curso_id=curso_id)
+
+    pagas = Q(status='PAGO')
+    pendentes = Q(status='PENDENTE')
+    linhas = linhas.order_by('data').values('data').annotate(
+        matriculas=Sum('quantidade'),
+        matriculas_pagas=Sum('quantidade', filter=pagas, default=0),
+        matriculas_pendentes=Sum('quantidade', filter=pendentes, default=0),
+        valor_pago=Sum('valor', filter=pagas, default=Decimal('0')),
+        valor_pendente=Sum('valor', filter=pendentes, default=Decimal('0')),
+        valor_total=Sum('valor'),
+    )
+    formato = '%Y-%m' if modelo is ReceitaMensal else '%Y-%m-%d'
+    return [
+        {'periodo': linha.pop('data').strftime(formato), **linha}
+        for linha in linhas
+    ]
+
+
+# ============================================
+# MANUTENCAO INCREMENTAL (sinais)
+# ============================================
+
+@receiver(post_init, sender=Matricula)
+def guardar_estado_receita(sender, instance, **kwargs):
+    # __dict__ evita consultas extras em instancias com campos adiados
+    instance._receita_estado = (
+        instance.__dict__.get('curso_id'),
+        instance.__dict__.get('data_matricula'),
+        instance.__dict__.get('status'),
+    )
+
+
+@receiver(post_save, sender=Matricula)
+def atualizar_receita_matricula(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    curso_anterior, data_anterior, status_anterior = instance._receita_estado
+    instance._receita_estado = (instance.curso_id, instance.data_matricula, instance.status)
+    valor = instance.curso.valor_inscricao
+
+    if created:
+        somar({(instance.data_matricula, instance.curso_id, instance.status): (1, valor)})
+    elif (
+        curso_anterior != instance.curso_id
+        or (data_anterior is not None and _data(data_anterior) != _data(instance.data_matricula))
+    ):
+        intervalos = {}
+        _incluir(intervalos, curso_anterior, data_anterior)
+        _incluir(intervalos, instance.curso_id, instance.data_matricula)
+        _recalcular_intervalos(intervalos)
+    elif status_anterior != instance.status:
+        subtrair(instance.data_matricula, instance.curso_id, status_anterior, valor)
+        somar({(instance.data_matricula, instance.curso_id, instance.status): (1, valor)})
+
+
+_exclusao = ExclusaoAgrupada('exclusao_receita', quantidades=dict, cursos_excluidos=set)
+
+
+@receiver(pre_delete, sender=Matricula)
+def acumular_exclusao_receita(sender, instance, origin=None, **kwargs):
+    # em massa ou em cascata: conta as matrículas por linha dos rollups e
+    # subtrai tudo de uma vez no primeiro post_delete
+    if not isinstance(origin, Matricula):
+        quantidades = _exclusao.de(origin)['quantidades']
+        chave = (_data(instance.data_matricula), instance.curso_id, instance.status)
+        quantidades[chave] = quantidades.get(chave, 0) + 1
+
+
+@receiver(pre_delete, sender=Curso)
+def acumular_exclusao_curso_receita(sender, instance, origin=None, **kwargs):
+    # as linhas de um curso excluído saem junto com ele (CASCADE)
+    _exclusao.de(origin)['cursos_excluidos'].add(instance.pk)
+
+
+@receiver(post_delete, sender=Matricula)
+def remover_receita_matricula(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, Matricula):
+        subtrair(
+            instance.data_matricula, instance.curso_id, instance.status,
+            instance.curso.valor_inscricao,
+        )
+        return
+    atual = _exclusao.retirar(origin)
+    if atual is None:
+        return
+    quantidades = {
+        chave: quantidade
+        for chave, quantidade in atual['quantidades'].items()
+        if chave[1] not in atual['cursos_excluidos']
+    }
+    with ler_do_primario():
+        valores = dict(Curso.objects.filter(
+            pk__in={curso_id for _, curso_id, _ in quantidades},
+        ).values_list('pk', 'valor_inscricao'))
+    # as linhas existem (migration 0013): o delta negativo nunca cria uma
+    somar({
+        chave: (-quantidade, -quantidade * valores[chave[1]])
+        for chave, quantidade in quantidades.items()
+    })
+
+
+@receiver(queryset_atualizado, sender=Matricula)
+def atualizar_receita_em_massa(sender, anteriores, campos, **kwargs):
+    if not campos & {'status', 'curso', 'curso_id', 'data_matricula'}:
+        return
+    pks = [item['pk'] for item in anteriores]
+    if campos & {'curso', 'curso_id', 'data_matricula'}:
+        intervalos = {}
+        for item in anteriores:
+            _incluir(intervalos, item['curso_id'], item['data_matricula'])
+        # o novo curso/data so e conhecido depois do update
+        with ler_do_primario():
+            novos = Matricula.objects.filter(pk__in=pks).values_list('curso_id', 'data_matricula')
+            for curso_id, data in novos:
+                _incluir(intervalos, curso_id, data)
+        _recalcular_intervalos(intervalos)
+        return
+
+    # so o status mudou: move cada matricula entre as linhas do mesmo
+    # periodo e curso, em um unico upsert por rollup. A linha de origem
+    # existe (migration 0013); o delta negativo nunca cria uma linha.
+    with ler_do_primario():
+        atuais = Matricula.objects.filter(pk__in=pks).values_list(
+            'pk', 'status', 'curso__valor_inscricao',
+        )
+        anteriores = {item['pk']: item for item in anteriores}
+        deltas = {}
+        for pk, status, valor in atuais:
+            item = anteriores[pk]
+            if item['status'] == status:
+                continue
+            _acumular(deltas, (item['data_matricula'], item['curso_id'], item['status']), -1, -valor)
+            _acumular(deltas, (item['data_matricula'], item['curso_id'], status), 1, valor)
+    if deltas:
+        somar(deltas)
+
+
+def _acumular(deltas, chave, quantidade, valor):
+    atual = deltas.get(chave, (0, Decimal('0')))
+    deltas[chave] = (atual[0] + quantidade, atual[1] + valor)
+
+
+@receiver(lote_criado, sender=Matricula)
+def atualizar_receita_lote(sender, objs, **kwargs):
+    # o lote é agregado no banco: objs do COPY (core/importacao.py) não
+    # trazem data_matricula. Sem pk (backends sem RETURNING), o comando
+    # recalcular_receita repara.
+    pks = [obj.pk for obj in objs if obj.pk is not None]
+    if not pks:
+        return
+    with ler_do_primario():
+        agregado = Matricula.objects.filter(pk__in=pks).order_by().values(
+            'data_matricula', 'curso_id', 'status',
+        ).annotate(total=Count('pk'), soma=Sum('curso__valor_inscricao'))
+        somar({
+            (linha['data_matricula'], linha['curso_id'], linha['status']): (linha['total'], linha['soma'])
+            for linha in agregado
+        })
+
+
+@receiver(post_init, sender=Curso)
+def guardar_valor_curso_receita(sender, instance, **kwargs):
+    instance._receita_valor = instance.__dict__.get('valor_inscricao')
+
+
+@receiver(post_save, sender=Curso)
+def atualizar_receita_curso(sender, instance, created, raw=False, **kwargs):
+    valor_anterior = instance._receita_valor
+    instance._receita_valor = instance.valor_inscricao
+    if created or raw or valor_anterior is None:
+        return
+    if Decimal(valor_anterior) != Decimal(instance.valor_inscricao):
+        recalcular_receita(curso_ids=[instance.pk])
+
+
+@receiver(queryset_atualizado, sender=Curso)
+def atualizar_receita_cursos_em_massa(sender, anteriores, campos, **kwargs):
+    if 'valor_inscricao' not in campos:
+        return
+    recalcular_receita(curso_ids=[item['pk'] for item in anteriores])
@@ -0,0 +1,158 @@
+"""
+Relatórios SQL (relatorio_sql_raw e cursos_populares_sql_raw).
+
+No PostgreSQL cada relatório é servido de uma view materializada (criada
+na migration 0005) com índice único, o que permite
+REFRESH MATERIALIZED VIEW CONCURRENTLY sem bloquear as leituras. A
+atualização roda fora da requisição:
+
+    python manage.py atualizar_relatorios            # uma vez (cron)
+    python manage.py atualizar_relatorios --intervalo 300
+
+Cada atualização fica registrada em AtualizacaoRelatorio, de onde vêm os
+metadados gerado_em/defasagem_segundos. Com ?fresh=1 o endpoint ignora a
+view e roda a consulta ao vivo. Fora do PostgreSQL a consulta é sempre
+ao vivo.
+"""
+import time
+from dataclasses import dataclass
+
+from django.db import connection
+from django.utils import timezone
+
+from .models import AtualizacaoRelatorio
+
+# SQL puro com JOIN no livro de saldos
+SQL_RELATORIO_ALUNOS = """
+    SELECT
+        a.id as aluno_id,
+        a.nome as aluno_nome,
+        a.email as aluno_email,
+        a.cpf as aluno_cpf,
+        a.data_ingresso,
+        COALESCE(s.total_matriculas, 0) as total_matriculas,
+        COALESCE(s.matriculas_pagas, 0) as matriculas_pagas,
+        COALESCE(s.matriculas_pendentes, 0) as matriculas_pendentes,
+        COALESCE(s.total_pago, 0) as total_pago,
+        COALESCE(s.total_devido, 0) as total_devido,
+        COALESCE(s.total_pago + s.total_devido, 0) as total_geral
+    FROM core_aluno a
+    LEFT JOIN core_saldoaluno s ON s.aluno_id = a.id
+"""
+
+SQL_CURSOS_POPULARES = """
+    SELECT
+        c.id as curso_id,
+        c.nome as curso_nome,
+        c.carga_horaria,
+        c.valor_inscricao,
+        c.status,
+        COUNT(m.id) as total_matriculas,
+        COUNT(CASE WHEN m.status = 'PAGO' THEN 1 END) as matriculas_pagas,
+        COUNT(CASE WHEN m.status = 'PENDENTE' THEN 1 END) as matriculas_pendentes,
+        COALESCE(SUM(CASE WHEN m.status = 'PAGO' THEN c.valor_inscricao ELSE 0 END), 0) as total_arrecadado
+    FROM core_curso c
+    LEFT JOIN core_matricula m ON c.id = m.curso_id
+    GROUP BY c.id, c.nome, c.carga_horaria, c.valor_inscricao, c.status
+"""
+
+
+@dataclass(frozen=True)
+class Relatorio:
+    nome: str
+    sql: str
+    view: str
+    ordem: str
+
+    def sql_ao_vivo(self):
+        return f'{self.sql} ORDER BY {self.ordem}'
+
+    def sql_materializado(self):
+        return f'SELECT * FROM {self.view} ORDER BY {self.ordem}'
+
+
+RELATORIOS = {
+    'alunos': Relatorio(
+        nome='alunos',
+        sql=SQL_RELATORIO_ALUNOS,
+        view='core_mv_relatorio_alunos',
+        ordem='total_geral DESC, aluno_id',
+    ),
+    'cursos_populares': Relatorio(
+        nome='cursos_populares',
+        sql=SQL_CURSOS_POPULARES,
+        view='core_mv_cursos_populares',
+        ordem='total_matriculas DESC, curso_id',
+    ),
+}
+
+
+def usa_view_materializada():
+    return connection.vendor == 'postgresql'
+
+
+def _resultado(relatorio, fresco, atualizacao):
+    agora = timezone.now()
+    if fresco or not usa_view_materializada():
+        return relatorio.sql_ao_vivo(), {
+            'fonte': 'ao_vivo',
+            'gerado_em': agora.isoformat(),
+            'defasagem_segundos': 0,
+        }
+
+    gerado_em = atualizacao.atualizado_em if atualizacao else None
+    return relatorio.sql_materializado(), {
+        'fonte': 'materializada',
+        'gerado_em': gerado_em.isoformat() if gerado_em else None,
+        'defasagem_segundos': round((agora - gerado_em).total_seconds()) if gerado_em else None,
+    }
+
+
+def _precisa_atualizacao(fresco):
+    return not fresco and usa_view_materializada()
+
+
+def consulta_relatorio(nome, fresco=False):
+    """
+    Retorna (sql, metadados) do relatório `nome`.
+    metadados: fonte ('materializada' ou 'ao_vivo'), gerado_em e
+    defasagem_segundos.
+    """
+    atualizacao = None
+    if _precisa_atualizacao(fresco):
+        atualizacao = AtualizacaoRelatorio.objects.filter(nome=nome).first()
+    return _resultado(RELATORIOS[nome], fresco, atualizacao)
+
+
+async def aconsulta_relatorio(nome, fresco=False):
+    """versão assíncrona de consulta_relatorio"""
+    atualizacao = None
+    if _precisa_atualizacao(fresco):
+        atualizacao = await AtualizacaoRelatorio.objects.filter(nome=nome).afirst()
+    return _resultado(RELATORIOS[nome], fresco, atualizacao)
+
+
+def atualizar_relatorios(nomes=None, concorrente=True):
+    """
+    Executa REFRESH MATERIALIZED VIEW [CONCURRENTLY] e registra a hora e a
+    duração. Retorna {nome: duracao_ms}.
+    """
+    if not usa_view_materializada():
+        return {}
+
+    resultado = {}
+    for nome in nomes or RELATORIOS:
+        relatorio = RELATORIOS[nome]
+        # os dados da view refletem o banco no início do REFRESH
+        iniciado_em = timezone.now()
+        inicio = time.monotonic()
+        modo = 'CONCURRENTLY ' if concorrente else ''
+        with connection.cursor() as cursor:
+            cursor.execute(f'REFRESH MATERIALIZED VIEW {modo}{relatorio.view}')
+        duracao_ms = round((time.monotonic() - inicio) * 1000)
+        AtualizacaoRelatorio.objects.update_or_create(
+            nome=nome,
+            defaults={'atualizado_em': iniciado_em, 'duracao_ms': duracao_ms},
+        )
+        resultado[nome] = duracao_ms
+    return resultado
@@ -0,0 +1,85 @@
+import csv
+import io
+import json
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+from .exportacao import converter_valor
+
+try:
+    import orjson
+except ImportError:  # sem orjson: json da biblioteca padrao
+    orjson = None
+
+# separadores de linha do JavaScript, escapados como no JSONRenderer
+_SEPARADORES_JS = ((b'\xe2\x80\xa8', b'\\u2028'), (b'\xe2\x80\xa9', b'\\u2029'))
+
+
+class JSONRapidoRenderer(JSONRenderer):
+    """
+    JSONRenderer do DRF serializado com orjson quando instalado.
+    Decimal, datas e os demais tipos extras passam pelo mesmo
+    JSONEncoder.default do DRF, entao a saida e a mesma; pedidos com
+    indentacao (Accept: application/json; indent=4) e ambientes sem
+    orjson usam o JSONRenderer original.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(
+                data,
+                default=self.encoder_class().default,
+                option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME,
+            )
+        except TypeError:
+            # ex.: inteiros acima de 64 bits
+            return super().render(data, accepted_media_type, renderer_context)
+        for separador, escapado in _SEPARADORES_JS:
+            if separador in ret:
+                ret = ret.replace(separador, escapado)
+        return ret
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Um objeto JSON por linha (application/x-ndjson).
+    As exportacoes grandes nao passam por aqui: a view devolve um
+    StreamingHttpResponse (ver core/exportacao.py). Este renderer cobre
+    respostas comuns, como erros, quando o cliente pediu ndjson.
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        linhas = data if isinstance(data, list) else [data]
+        return ''.join(
+            json.dumps(linha, default=converter_valor, ensure_ascii=False) + '\n'
+            for linha in linhas
+        ).encode(self.charset)
+
+
+class CSVRenderer(BaseRenderer):
+    """
+    CSV com cabecalho (text/csv). Mesma observacao do NDJSONRenderer.
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        linhas = data if isinstance(data, list) else [data]
+        saida = io.StringIO()
+        if linhas and isinstance(linhas[0], dict):
+            escritor = csv.DictWriter(saida, fieldnames=list(linhas[0]))
+            escritor.writeheader()
+            escritor.writerows(linhas)
+        return saida.getvalue().encode(self.charset)
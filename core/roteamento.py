@@ -0,0 +1,140 @@
+"""
+Roteamento de leituras para réplicas (DATABASE_ROUTERS).
+
+Com réplicas configuradas (POSTGRES_REPLICA_HOSTS, ver settings.py):
+- escritas vão sempre para o `default` (primário);
+- leituras do ORM e os cursores dos relatórios SQL (alias_leitura) vão
+  para uma réplica, sorteada uma vez por requisição para que as leituras
+  da mesma requisição vejam o mesmo ponto da replicação;
+- leituras voltam para o primário (fixação) quando:
+  * a requisição é de escrita (POST, PUT, PATCH, DELETE), já que as
+    validações leem antes de gravar;
+  * já houve uma escrita no mesmo contexto (ex.: o recálculo do livro de
+    saldos depois do save, ou um comando de manutenção);
+  * o cliente fez uma escrita há menos de REPLICA_FIXACAO_SEGUNDOS: o
+    middleware grava um cookie na resposta da escrita, e as leituras
+    seguintes dessa sessão enxergam o que ela acabou de gravar.
+
+Sem réplicas configuradas tudo continua no `default`.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+COOKIE_FIXACAO = 'core_primario'
+METODOS_ESCRITA = {'POST', 'PUT', 'PATCH', 'DELETE'}
+
+_fixar_primario = ContextVar('core_fixar_primario', default=False)
+_houve_escrita = ContextVar('core_houve_escrita', default=False)
+_replica = ContextVar('core_replica', default=None)
+
+
+def replicas():
+    return getattr(settings, 'REPLICAS', [])
+
+
+def alias_leitura():
+    """banco para uma leitura agora (réplica ou primário)"""
+    aliases = replicas()
+    if not aliases or _fixar_primario.get() or _houve_escrita.get():
+        return DEFAULT_DB_ALIAS
+    replica = _replica.get()
+    if replica is None:
+        replica = random.choice(aliases)
+        _replica.set(replica)
+    return replica
+
+
+@contextmanager
+def ler_do_primario():
+    """força as leituras do bloco para o primário"""
+    token = _fixar_primario.set(True)
+    try:
+        yield
+    finally:
+        _fixar_primario.reset(token)
+
+
+class RoteadorReplicas:
+    def db_for_read(self, model, **hints):
+        return alias_leitura()
+
+    def db_for_write(self, model, **hints):
+        _houve_escrita.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # réplicas têm os mesmos dados do primário
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in replicas():
+            return False
+        return None
+
+
+class FixacaoPrimarioMiddleware:
+    """
+    Reinicia o estado de roteamento a cada requisição e aplica a fixação
+    no primário depois de escritas (ver docstring do módulo).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.assincrono = iscoroutinefunction(get_response)
+        if self.assincrono:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.assincrono:
+            return self.__acall__(request)
+        if not replicas():
+            return self.get_response(request)
+
+        tokens = self._iniciar(request)
+        try:
+            return self._finalizar(self.get_response(request))
+        finally:
+            self._restaurar(tokens)
+
+    async def __acall__(self, request):
+        if not replicas():
+            return await self.get_response(request)
+
+        tokens = self._iniciar(request)
+        try:
+            return self._finalizar(await self.get_response(request))
+        finally:
+            self._restaurar(tokens)
+
+    def _iniciar(self, request):
+        fixar = (
+            request.method in METODOS_ESCRITA
+            or request.COOKIES.get(COOKIE_FIXACAO) == '1'
+        )
+        return (
+            _fixar_primario.set(fixar),
+            _houve_escrita.set(False),
+            _replica.set(None),
+        )
+
+    def _finalizar(self, response):
+        if _houve_escrita.get():
+            response.set_cookie(
+                COOKIE_FIXACAO,
+                '1',
+                max_age=settings.REPLICA_FIXACAO_SEGUNDOS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+    def _restaurar(self, tokens):
+        for variavel, token in zip((_fixar_primario, _houve_escrita, _replica), tokens):
+            variavel.reset(token)
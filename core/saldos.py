@@ -0,0 +1,289 @@
+"""
+Livro de saldos por aluno (SaldoAluno).
+
+Os saldos sao mantidos incrementalmente a cada escrita:
+- criar/excluir matricula soma/subtrai o valor do curso (UPDATE com F());
+- mudar o status move o valor entre total_devido e total_pago;
+- trocar aluno/curso, alterar Curso.valor_inscricao ou usar
+  QuerySet.update()/bulk_create() recalcula apenas os alunos afetados;
+- exclusoes em massa ou em cascata (QuerySet.delete(), excluir um curso)
+  recalculam uma vez os alunos afetados, e nao uma matricula por vez.
+
+O comando `python manage.py verificar_saldos` compara o livro com o
+recalculo completo e corrige divergencias.
+"""
+from decimal import Decimal
+
+from django.db.models import F, QuerySet
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Aluno, Curso, Matricula, SaldoAluno
+from .roteamento import ler_do_primario
+from .signals import ExclusaoAgrupada, lote_criado, queryset_atualizado
+
+CAMPOS_SALDO = [
+    'total_devido',
+    'total_pago',
+    'total_matriculas',
+    'matriculas_pagas',
+    'matriculas_pendentes',
+]
+
+TAMANHO_LOTE = 2000
+
+
+def _campos_por_status(status):
+    if status == 'PAGO':
+        return 'total_pago', 'matriculas_pagas'
+    return 'total_devido', 'matriculas_pendentes'
+
+
+def saldos_calculados(aluno_ids=None):
+    """
+    Calcula os saldos a partir das matriculas (fonte de verdade).
+    Retorna um gerador de SaldoAluno nao salvos.
+    """
+    alunos = Aluno.objects.all()
+    if aluno_ids is not None:
+        alunos = alunos.filter(pk__in=aluno_ids)
+    linhas = alunos.com_totais_calculados().order_by('pk').values_list(
+        'pk', 'valor_devido', 'valor_pago', 'qtd_matriculas', 'qtd_pagas', 'qtd_pendentes'
+    )
+    for pk, devido, pago, total, pagas, pendentes in linhas.iterator(chunk_size=TAMANHO_LOTE):
+        yield SaldoAluno(
+            aluno_id=pk,
+            total_devido=devido,
+            total_pago=pago,
+            total_matriculas=total,
+            matriculas_pagas=pagas,
+            matriculas_pendentes=pendentes,
+        )
+
+
+def recalcular_saldos(aluno_ids=None):
+    """
+    Recalcula e grava (upsert) os saldos dos alunos informados.
+    Sem aluno_ids, recalcula todos os alunos.
+    """
+    # QuerySets de ids sao mantidos como subconsulta
+    if aluno_ids is not None and not isinstance(aluno_ids, QuerySet):
+        aluno_ids = list(aluno_ids)
+        if not aluno_ids:
+            return 0
+
+    total = 0
+    lote = []
+    # o recálculo grava o que leu: nunca ler de uma réplica
+    with ler_do_primario():
+        for saldo in saldos_calculados(aluno_ids):
+            saldo.updated_at = timezone.now()
+            lote.append(saldo)
+            if len(lote) >= TAMANHO_LOTE:
+                total += _gravar(lote)
+                lote = []
+        if lote:
+            total += _gravar(lote)
+    return total
+
+
+def _gravar(saldos):
+    SaldoAluno.objects.bulk_create(
+        saldos,
+        update_conflicts=True,
+        unique_fields=['aluno'],
+        update_fields=CAMPOS_SALDO + ['updated_at'],
+    )
+    return len(saldos)
+
+
+def aplicar_delta(aluno_id, status, valor, quantidade):
+    """
+    Soma (quantidade=1) ou subtrai (quantidade=-1) uma matricula no saldo.
+    """
+    campo_valor, campo_qtd = _campos_por_status(status)
+    atualizados = SaldoAluno.objects.filter(aluno_id=aluno_id).update(**{
+        campo_valor: F(campo_valor) + valor * quantidade,
+        campo_qtd: F(campo_qtd) + quantidade,
+        'total_matriculas': F('total_matriculas') + quantidade,
+        'updated_at': timezone.now(),
+    })
+    # aluno ainda sem linha no livro: cria a partir das matriculas.
+    # Na exclusao nao recriamos, pois o aluno pode estar sendo excluido.
+    if not atualizados and quantidade > 0:
+        recalcular_saldos([aluno_id])
+
+
+def mover_status(aluno_id, status_anterior, status_novo, valor):
+    """move o valor de uma matricula entre pendente e pago"""
+    origem_valor, origem_qtd = _campos_por_status(status_anterior)
+    destino_valor, destino_qtd = _campos_por_status(status_novo)
+    atualizados = SaldoAluno.objects.filter(aluno_id=aluno_id).update(**{
+        origem_valor: F(origem_valor) - valor,
+        origem_qtd: F(origem_qtd) - 1,
+        destino_valor: F(destino_valor) + valor,
+        destino_qtd: F(destino_qtd) + 1,
+        'updated_at': timezone.now(),
+    })
+    if not atualizados:
+        recalcular_saldos([aluno_id])
+
+
+def verificar_saldos(corrigir=False):
+    """
+    Compara o livro com o recalculo completo, em lotes.
+    Retorna a lista de aluno_ids divergentes (corrigidos se corrigir=True).
+    """
+    divergentes = []
+    lote = []
+    for saldo in saldos_calculados():
+        lote.append(saldo)
+        if len(lote) >= TAMANHO_LOTE:
+            divergentes.extend(_comparar(lote))
+            lote = []
+    if lote:
+        divergentes.extend(_comparar(lote))
+
+    if corrigir and divergentes:
+        recalcular_saldos(divergentes)
+    return divergentes
+
+
+def _comparar(calculados):
+    gravados = SaldoAluno.objects.in_bulk([s.aluno_id for s in calculados])
+    divergentes = []
+    for esperado in calculados:
+        atual = gravados.get(esperado.aluno_id)
+        if atual is None or any(
+            getattr(atual, campo) != getattr(esperado, campo)
+            for campo in CAMPOS_SALDO
+        ):
+            divergentes.append(esperado.aluno_id)
+    return divergentes
+
+
+# ============================================
+# MANUTENCAO INCREMENTAL (sinais)
+# ============================================
+
+@receiver(post_save, sender=Aluno)
+def criar_saldo_aluno(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        criar_saldos_zerados([instance.pk])
+
+
+@receiver(lote_criado, sender=Aluno)
+def criar_saldo_alunos_lote(sender, objs, **kwargs):
+    # sem pk (backends sem RETURNING) o comando verificar_saldos repara
+    criar_saldos_zerados([obj.pk for obj in objs if obj.pk is not None])
+
+
+def criar_saldos_zerados(aluno_ids):
+    SaldoAluno.objects.bulk_create(
+        [SaldoAluno(aluno_id=pk) for pk in aluno_ids],
+        batch_size=TAMANHO_LOTE,
+        ignore_conflicts=True,
+    )
+
+
+@receiver(post_init, sender=Matricula)
+def guardar_estado_matricula(sender, instance, **kwargs):
+    # __dict__ evita consultas extras em instancias com campos adiados
+    instance._saldo_estado = (
+        instance.__dict__.get('aluno_id'),
+        instance.__dict__.get('curso_id'),
+        instance.__dict__.get('status'),
+    )
+
+
+@receiver(post_save, sender=Matricula)
+def atualizar_saldo_matricula(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    aluno_anterior, curso_anterior, status_anterior = instance._saldo_estado
+    instance._saldo_estado = (instance.aluno_id, instance.curso_id, instance.status)
+
+    if created:
+        aplicar_delta(instance.aluno_id, instance.status, instance.curso.valor_inscricao, 1)
+    elif aluno_anterior != instance.aluno_id or curso_anterior != instance.curso_id:
+        recalcular_saldos({aluno_anterior, instance.aluno_id} - {None})
+    elif status_anterior != instance.status:
+        mover_status(
+            instance.aluno_id, status_anterior, instance.status,
+            instance.curso.valor_inscricao,
+        )
+
+
+_exclusao = ExclusaoAgrupada('exclusao_saldos', afetados=set, excluidos=set)
+
+
+@receiver(pre_delete, sender=Matricula)
+def acumular_exclusao_matricula(sender, instance, origin=None, **kwargs):
+    # o Collector manda todos os pre_delete antes de apagar qualquer linha
+    if not isinstance(origin, Matricula):
+        _exclusao.de(origin)['afetados'].add(instance.aluno_id)
+
+
+@receiver(pre_delete, sender=Aluno)
+def acumular_exclusao_aluno(sender, instance, origin=None, **kwargs):
+    # o saldo de um aluno excluido sai junto com ele (CASCADE)
+    _exclusao.de(origin)['excluidos'].add(instance.pk)
+
+
+@receiver(post_delete, sender=Matricula)
+def remover_saldo_matricula(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, Matricula):
+        aplicar_delta(instance.aluno_id, instance.status, instance.curso.valor_inscricao, -1)
+        return
+    # em massa ou em cascata: no primeiro post_delete todas as matriculas
+    # da exclusao ja foram apagadas, entao um recalculo dos alunos basta
+    atual = _exclusao.retirar(origin)
+    if atual is not None:
+        recalcular_saldos(atual['afetados'] - atual['excluidos'])
+
+
+@receiver(post_init, sender=Curso)
+def guardar_valor_curso(sender, instance, **kwargs):
+    instance._saldo_valor = instance.__dict__.get('valor_inscricao')
+
+
+@receiver(post_save, sender=Curso)
+def atualizar_saldo_curso(sender, instance, created, raw=False, **kwargs):
+    valor_anterior = instance._saldo_valor
+    instance._saldo_valor = instance.valor_inscricao
+    if created or raw or valor_anterior is None:
+        return
+    if Decimal(valor_anterior) != Decimal(instance.valor_inscricao):
+        recalcular_saldos(_alunos_dos_cursos([instance.pk]))
+
+
+@receiver(queryset_atualizado, sender=Matricula)
+def atualizar_saldo_em_massa(sender, anteriores, campos, **kwargs):
+    if not campos & {'status', 'aluno', 'aluno_id', 'curso', 'curso_id'}:
+        return
+    aluno_ids = {item['aluno_id'] for item in anteriores}
+    if campos & {'aluno', 'aluno_id'}:
+        # o novo aluno so e conhecido depois do update
+        aluno_ids |= set(Matricula.objects.filter(
+            pk__in=[item['pk'] for item in anteriores]
+        ).values_list('aluno_id', flat=True))
+    recalcular_saldos(aluno_ids)
+
+
+@receiver(lote_criado, sender=Matricula)
+def atualizar_saldo_lote(sender, objs, **kwargs):
+    recalcular_saldos({obj.aluno_id for obj in objs})
+
+
+@receiver(queryset_atualizado, sender=Curso)
+def atualizar_saldo_cursos_em_massa(sender, anteriores, campos, **kwargs):
+    if 'valor_inscricao' not in campos:
+        return
+    recalcular_saldos(_alunos_dos_cursos([item['pk'] for item in anteriores]))
+
+
+def _alunos_dos_cursos(curso_ids):
+    return Matricula.objects.filter(curso_id__in=curso_ids).values_list(
+        'aluno_id', flat=True
+    ).distinct()
@@ -1,5 +1,97 @@
+from decimal import Decimal
+
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.urls import reverse
+from django.utils import timezone
 from rest_framework import serializers
-from .models import Aluno, Curso, Matricula
+from .models import Aluno, Curso, JobRelatorio, Matricula
+from .pendencias import NOMES_FAIXAS
+from .validadores import normalizar_cpf
+
+
+# ============================================
+# LEITURA RAPIDA (listas)
+# ============================================
+
+CENTAVOS = Decimal('0.01')
+
+
+def _data(valor):
+    return valor.isoformat()
+
+
+def _data_hora(fuso):
+    # mesmo formato do DateTimeField do DRF: fuso atual, UTC como Z.
+    # o fuso e resolvido uma vez por lista, nao a cada valor
+    def converter(valor):
+        texto = valor.astimezone(fuso).isoformat()
+        if texto.endswith('+00:00'):
+            texto = texto[:-6] + 'Z'
+        return texto
+    return converter
+
+
+def _dias_ate_hoje(fuso):
+    # dias entre a data e hoje, com hoje resolvido uma vez por lista
+    hoje = timezone.localdate(timezone=fuso)
+
+    def converter(valor):
+        return (hoje - valor).days
+    return converter
+
+
+# conversores que dependem do fuso atual: resolvidos em converter()
+_POR_LISTA = {_data_hora, _dias_ate_hoje}
+
+
+def _decimal_texto(valor):
+    # DecimalField do DRF: string com 2 casas
+    return f'{valor.quantize(CENTAVOS):f}'
+
+
+class LeituraRapida:
+    """
+    caminho rapido de leitura de um serializer, para listas grandes.
+    em vez de instanciar models e passar cada campo pelo to_representation
+    do DRF, le tuplas de values_list(named=True) e converte cada coluna
+    com uma funcao escolhida uma vez so. a saida e identica a do
+    serializer (ver ListaRapidaMixin em views.py).
+
+    campos: (nome na saida, coluna ou anotacao, conversor ou None)
+    anotacoes: expressoes extras do queryset (ex.: agregados que o
+    serializer calcularia com uma consulta por objeto)
+    """
+    def __init__(self, campos, anotacoes=None):
+        self.campos = list(campos)
+        self.anotacoes = anotacoes or {}
+        self.colunas = [coluna for _, coluna, _ in campos]
+        self.saidas = [(nome, conversor) for nome, _, conversor in campos]
+
+    def anotar(self, queryset):
+        # as anotacoes tambem servem ao serializer quando o caminho rapido
+        # esta desligado (LEITURA_RAPIDA=0)
+        if self.anotacoes:
+            queryset = queryset.annotate(**self.anotacoes)
+        return queryset
+
+    def preparar(self, queryset):
+        # named=True: a paginacao keyset le a chave por atributo
+        return self.anotar(queryset).values_list(*self.colunas, named=True)
+
+    def converter(self, linhas):
+        fuso = timezone.get_current_timezone()
+        saidas = [
+            (nome, conversor(fuso) if conversor in _POR_LISTA else conversor)
+            for nome, conversor in self.saidas
+        ]
+        return [
+            {
+                nome: valor if conversor is None or valor is None else conversor(valor)
+                for (nome, conversor), valor in zip(saidas, linha)
+            }
+            for linha in linhas
+        ]
 
 
 class AlunoSerializer(serializers.ModelSerializer):
@@ -29,22 +121,43 @@ class AlunoSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
 
+    # mesma saida, a partir de Aluno.objects.com_totais()
+    leitura_rapida = LeituraRapida([
+        ('id', 'id', None),
+        ('nome', 'nome', None),
+        ('email', 'email', None),
+        ('cpf', 'cpf', None),
+        ('data_ingresso', 'data_ingresso', _data),
+        ('total_devido', 'valor_devido', float),
+        ('total_pago', 'valor_pago', float),
+        ('total_matriculas', 'qtd_matriculas', None),
+        ('created_at', 'created_at', _data_hora),
+        ('updated_at', 'updated_at', _data_hora),
+    ])
+
     def get_total_devido(self, obj):
         """metodo para calcular total devido"""
+        # usa a anotacao de Aluno.objects.com_totais() quando disponivel
+        if hasattr(obj, 'valor_devido'):
+            return float(obj.valor_devido)
         return float(obj.total_devido())
 
     def get_total_pago(self, obj):
         """metodo para calcular total pago"""
+        if hasattr(obj, 'valor_pago'):
+            return float(obj.valor_pago)
         return float(obj.total_pago())
 
     def get_total_matriculas(self, obj):
         """metodo para contar matrículas"""
+        if hasattr(obj, 'qtd_matriculas'):
+            return obj.qtd_matriculas
         return obj.matriculas.count()
 
     def validate_cpf(self, value):
         """validacao customizada do CPF"""
         # remove caracteres nao numericos
-        cpf = ''.join(filter(str.isdigit, value))
+        cpf = normalizar_cpf(value)
         
         # valida se tem 11 digitos
         if len(cpf) != 11:
@@ -57,6 +170,21 @@ class AlunoSerializer(serializers.ModelSerializer):
         return cpf
 
 
+def _matriculas_do_curso(**filtros):
+    """
+    subconsulta correlacionada com o total de matriculas do curso: o banco
+    so a calcula para as linhas da pagina, sem agregar a tabela inteira
+    """
+    contagem = (
+        Matricula.objects.filter(curso=OuterRef('pk'), **filtros)
+        .order_by()
+        .values('curso')
+        .annotate(total=Count('*'))
+        .values('total')
+    )
+    return Coalesce(Subquery(contagem), 0)
+
+
 class CursoSerializer(serializers.ModelSerializer):
     """
     serializer para o model Curso.
@@ -80,12 +208,39 @@ class CursoSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
 
+    # os dois totais viram agregados na mesma consulta (sem N+1)
+    leitura_rapida = LeituraRapida(
+        [
+            ('id', 'id', None),
+            ('nome', 'nome', None),
+            ('carga_horaria', 'carga_horaria', None),
+            ('valor_inscricao', 'valor_inscricao', _decimal_texto),
+            ('status', 'status', None),
+            ('total_matriculas', 'qtd_matriculas', None),
+            ('total_arrecadado', 'valor_arrecadado', float),
+            ('created_at', 'created_at', _data_hora),
+            ('updated_at', 'updated_at', _data_hora),
+        ],
+        anotacoes={
+            'qtd_matriculas': _matriculas_do_curso(),
+            'valor_arrecadado': ExpressionWrapper(
+                _matriculas_do_curso(status='PAGO') * F('valor_inscricao'),
+                output_field=DecimalField(max_digits=14, decimal_places=2),
+            ),
+        },
+    )
+
     def get_total_matriculas(self, obj):
         """conta total de matriculas"""
+        # usa as anotacoes da leitura rapida quando disponiveis
+        if hasattr(obj, 'qtd_matriculas'):
+            return obj.qtd_matriculas
         return obj.matriculas.count()
 
     def get_total_arrecadado(self, obj):
         """calcula total arrecadado (apenas matriculas pagas)"""
+        if hasattr(obj, 'valor_arrecadado'):
+            return float(obj.valor_arrecadado)
         return float(obj.total_arrecadado())
 
     def validate_carga_horaria(self, value):
@@ -131,6 +286,20 @@ class MatriculaSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
 
+    # aluno e curso entram por JOIN na propria consulta
+    leitura_rapida = LeituraRapida([
+        ('id', 'id', None),
+        ('aluno', 'aluno_id', None),
+        ('aluno_nome', 'aluno__nome', None),
+        ('curso', 'curso_id', None),
+        ('curso_nome', 'curso__nome', None),
+        ('valor_curso', 'curso__valor_inscricao', _decimal_texto),
+        ('data_matricula', 'data_matricula', _data),
+        ('status', 'status', None),
+        ('created_at', 'created_at', _data_hora),
+        ('updated_at', 'updated_at', _data_hora),
+    ])
+
     def validate(self, data):
         """
         validacao customizada ao criar matricula.
@@ -155,6 +324,31 @@ class MatriculaSerializer(serializers.ModelSerializer):
         return data
 
 
+class MatriculaPendenteSerializer(MatriculaSerializer):
+    """
+    matricula pendente para cobranca (/api/matriculas/pendentes/):
+    mesma saida do MatriculaSerializer com o email do aluno e os dias
+    desde a matricula.
+    """
+    aluno_email = serializers.EmailField(source='aluno.email', read_only=True)
+    dias_pendente = serializers.SerializerMethodField()
+
+    class Meta(MatriculaSerializer.Meta):
+        fields = MatriculaSerializer.Meta.fields + ['aluno_email', 'dias_pendente']
+
+    # data_matricula de novo com outro nome: values_list nao repete colunas
+    leitura_rapida = LeituraRapida(
+        MatriculaSerializer.leitura_rapida.campos + [
+            ('aluno_email', 'aluno__email', None),
+            ('dias_pendente', 'pendente_desde', _dias_ate_hoje),
+        ],
+        anotacoes={'pendente_desde': F('data_matricula')},
+    )
+
+    def get_dias_pendente(self, obj):
+        return (timezone.localdate() - obj.data_matricula).days
+
+
 class MatriculaCreateSerializer(serializers.ModelSerializer):
     """
     serializer simplificado para criar matriculas.
@@ -179,4 +373,151 @@ class MatriculaCreateSerializer(serializers.ModelSerializer):
                 "Nao eh possivel matricular em curso inativo."
             )
 
-        return data
\ No newline at end of file
+        return data
+
+class MatriculaLoteItemSerializer(serializers.Serializer):
+    """
+    item do lote de matriculas (apenas estrutura dos dados).
+    as regras que dependem do banco (duplicidade, curso inativo) sao
+    verificadas para o lote inteiro em core/lotes.py.
+    """
+    aluno = serializers.IntegerField(min_value=1)
+    curso = serializers.IntegerField(min_value=1)
+    status = serializers.ChoiceField(choices=Matricula.STATUS_CHOICES, default='PENDENTE')
+    data_matricula = serializers.DateField(required=False)
+
+
+class MatriculaLoteSerializer(serializers.Serializer):
+    """
+    serializer para POST /api/matriculas/bulk/.
+    modo 'parcial' grava os itens validos; 'tudo_ou_nada' nao grava
+    nada se algum item for rejeitado.
+    """
+    MODOS = [
+        ('parcial', 'Parcial'),
+        ('tudo_ou_nada', 'Tudo ou nada'),
+    ]
+    LIMITE_ITENS = 50000
+
+    modo = serializers.ChoiceField(choices=MODOS, default='parcial')
+    itens = serializers.ListField(
+        child=serializers.DictField(),
+        allow_empty=False,
+        max_length=LIMITE_ITENS,
+    )
+
+
+class MatriculaTransicaoSerializer(serializers.Serializer):
+    """
+    serializer para POST /api/matriculas/transicao-status/.
+    recebe o novo status e uma lista de ids e/ou filtros.
+    """
+    LIMITE_IDS = 100000
+
+    status = serializers.ChoiceField(choices=Matricula.STATUS_CHOICES)
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=LIMITE_IDS,
+        required=False,
+    )
+    aluno = serializers.IntegerField(min_value=1, required=False)
+    curso = serializers.IntegerField(min_value=1, required=False)
+    data_inicio = serializers.DateField(required=False)
+    data_fim = serializers.DateField(required=False)
+
+    def validate(self, data):
+        """exige ids ou pelo menos um filtro, para nao alterar tudo por engano"""
+        criterios = {'ids', 'aluno', 'curso', 'data_inicio', 'data_fim'}
+        if not criterios & set(data):
+            raise serializers.ValidationError(
+                "Informe ids ou pelo menos um filtro (aluno, curso, data_inicio, data_fim)."
+            )
+        if data.get('data_inicio') and data.get('data_fim') and data['data_inicio'] > data['data_fim']:
+            raise serializers.ValidationError("data_inicio deve ser anterior a data_fim.")
+        return data
+
+
+class JobRelatorioSerializer(serializers.ModelSerializer):
+    """
+    serializer para consultar um job de relatorio (/api/relatorios/jobs/).
+    download_url so aparece com o job CONCLUIDO.
+    """
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = JobRelatorio
+        fields = [
+            'id',
+            'tipo',
+            'formato',
+            'parametros',
+            'status',
+            'criado_em',
+            'iniciado_em',
+            'concluido_em',
+            'expira_em',
+            'tentativas',
+            'erro',
+            'linhas',
+            'tamanho_bytes',
+            'download_url',
+        ]
+        read_only_fields = fields
+
+    def get_download_url(self, obj):
+        if obj.status != 'CONCLUIDO':
+            return None
+        url = reverse('job-relatorio-download', args=[obj.pk])
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+
+class JobRelatorioCreateSerializer(serializers.Serializer):
+    """
+    serializer para POST /api/relatorios/jobs/.
+    Corpo: {"tipo": "alunos" | "cursos_populares" | "pendencias",
+            "formato": "csv" | "ndjson",
+            "parametros": {"fresco": true} ou {"faixa": "90+", "curso": 1}}
+    os parametros sao normalizados (padroes preenchidos) para que pedidos
+    iguais gerem a mesma chave de deduplicacao.
+    """
+    # parametro: (tipos que aceitam, valor padrao)
+    PARAMETROS = {
+        'fresco': ({'alunos', 'cursos_populares'}, False),
+        'faixa': ({'pendencias'}, None),
+        'curso': ({'pendencias'}, None),
+    }
+
+    tipo = serializers.ChoiceField(choices=JobRelatorio.TIPOS)
+    formato = serializers.ChoiceField(choices=JobRelatorio.FORMATOS, default='csv')
+    parametros = serializers.DictField(required=False, default=dict)
+
+    def validate(self, data):
+        tipo = data['tipo']
+        recebidos = data['parametros']
+        aceitos = {nome for nome, (tipos, _) in self.PARAMETROS.items() if tipo in tipos}
+        invalidos = set(recebidos) - aceitos
+        if invalidos:
+            raise serializers.ValidationError({
+                'parametros': f"Nao aceitos para {tipo}: {', '.join(sorted(invalidos))}."
+            })
+
+        parametros = {
+            nome: recebidos.get(nome, padrao)
+            for nome, (tipos, padrao) in self.PARAMETROS.items()
+            if tipo in tipos
+        }
+        if 'fresco' in parametros and not isinstance(parametros['fresco'], bool):
+            raise serializers.ValidationError({'parametros': "fresco deve ser true ou false."})
+        if parametros.get('faixa') is not None and parametros['faixa'] not in NOMES_FAIXAS:
+            raise serializers.ValidationError({
+                'parametros': f"faixa deve ser uma de: {', '.join(NOMES_FAIXAS)}."
+            })
+        curso = parametros.get('curso')
+        if curso is not None and (
+            isinstance(curso, bool) or not isinstance(curso, int) or curso < 1
+        ):
+            raise serializers.ValidationError({'parametros': "curso deve ser um id inteiro positivo."})
+        data['parametros'] = parametros
+        return data
@@ -0,0 +1,47 @@
+from contextvars import ContextVar
+
+from django.dispatch import Signal
+
+# Enviado depois de um QuerySet.update() em models rastreados.
+# Argumentos: sender (model), anteriores (lista de dicts com pk e os
+# campos rastreados ANTES do update), campos (nomes atualizados),
+# valores (os kwargs do update; podem ser expressoes como F()), using.
+# O update() do Django nao dispara pre_save/post_save, entao os dados
+# derivados (saldos, caches) dependem deste sinal.
+queryset_atualizado = Signal()
+
+# Enviado depois de um QuerySet.bulk_create() em models rastreados, que
+# tambem nao dispara post_save. Argumentos: sender (model), objs (objetos
+# criados), using.
+lote_criado = Signal()
+
+
+class ExclusaoAgrupada:
+    """
+    Estado de uma exclusao em andamento (Collector.delete) para receivers
+    que agrupam exclusoes em massa ou em cascata. O Collector manda todos
+    os pre_delete antes de apagar qualquer linha e depois um post_delete
+    por objeto: os pre_delete acumulam com de(origin) e o primeiro
+    post_delete da mesma exclusao aplica tudo com retirar(origin).
+    `origin` (o objeto ou queryset em que delete() foi chamado) identifica
+    a exclusao.
+    """
+
+    def __init__(self, nome, **iniciais):
+        self._atual = ContextVar(nome, default=None)
+        self._iniciais = iniciais
+
+    def de(self, origin):
+        atual = self._atual.get()
+        if atual is None or atual['origem'] is not origin:
+            atual = {'origem': origin, **{chave: tipo() for chave, tipo in self._iniciais.items()}}
+            self._atual.set(atual)
+        return atual
+
+    def retirar(self, origin):
+        """o estado acumulado para `origin`, uma unica vez (None depois)"""
+        atual = self._atual.get()
+        if atual is None or atual['origem'] is not origin:
+            return None
+        self._atual.set(None)
+        return atual
@@ -0,0 +1,85 @@
+"""
+Listas aninhadas de matrículas (/api/alunos/{id}/matriculas/ e
+/api/cursos/{id}/matriculas/): paginação, filtros e custo por página.
+"""
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+
+from .models import Curso, Matricula
+from .tests import CoreTestCase
+
+
+class MatriculasAninhadasTests(CoreTestCase):
+
+    def cursos_por_matriculas(self):
+        return list(
+            Curso.objects.annotate(total=Count('matriculas')).order_by('total', 'pk')
+        )
+
+    def ids(self, dados):
+        return [item['id'] for item in dados['results']]
+
+    def test_curso_pagina_as_matriculas(self):
+        curso = self.cursos_por_matriculas()[-1]
+        self.assertGreater(curso.total, 10)
+        dados = self.client.get(f'/api/cursos/{curso.pk}/matriculas/').json()
+        self.assertEqual(dados['count'], curso.total)
+        self.assertEqual(len(dados['results']), 10)
+        self.assertIsNotNone(dados['next'])
+        self.assertEqual({item['curso'] for item in dados['results']}, {curso.pk})
+
+    def test_aluno_filtra_por_status(self):
+        matricula = Matricula.objects.filter(status='PAGO').order_by('pk').first()
+        aluno_id = matricula.aluno_id
+        dados = self.client.get(f'/api/alunos/{aluno_id}/matriculas/?status=pago').json()
+        esperado = Matricula.objects.filter(aluno_id=aluno_id, status='PAGO')
+        self.assertEqual(sorted(self.ids(dados)), sorted(esperado.values_list('pk', flat=True)))
+
+    def test_filtra_por_periodo(self):
+        curso = self.cursos_por_matriculas()[-1]
+        datas = sorted(Matricula.objects.filter(curso=curso).values_list('data_matricula', flat=True))
+        inicio, fim = datas[len(datas) // 4], datas[len(datas) // 2]
+        dados = self.client.get(
+            f'/api/cursos/{curso.pk}/matriculas/',
+            {'data_inicio': inicio.isoformat(), 'data_fim': fim.isoformat()},
+        ).json()
+        esperado = Matricula.objects.filter(
+            curso=curso, data_matricula__gte=inicio, data_matricula__lte=fim
+        ).count()
+        self.assertEqual(dados['count'], esperado)
+
+    def test_data_invalida(self):
+        curso = Curso.objects.order_by('pk').first()
+        resposta = self.client.get(f'/api/cursos/{curso.pk}/matriculas/?data_inicio=31/12/2024')
+        self.assertEqual(resposta.status_code, 400)
+        self.assertIn('data_inicio', resposta.json())
+
+    def test_pai_inexistente(self):
+        self.assertEqual(self.client.get('/api/alunos/999999/matriculas/').status_code, 404)
+        self.assertEqual(self.client.get('/api/cursos/999999/matriculas/').status_code, 404)
+
+    def test_custo_nao_depende_do_tamanho_do_curso(self):
+        cursos = self.cursos_por_matriculas()
+        menor, maior = cursos[0], cursos[-1]
+        self.assertLess(menor.total, maior.total)
+        consultas = []
+        for curso in (menor, maior):
+            with CaptureQueriesContext(connection) as contexto:
+                resposta = self.client.get(f'/api/cursos/{curso.pk}/matriculas/')
+            self.assertEqual(resposta.status_code, 200)
+            consultas.append(len(contexto))
+        self.assertEqual(consultas[0], consultas[1])
+
+    def test_paginacao_keyset(self):
+        curso = self.cursos_por_matriculas()[-1]
+        vistos = []
+        url = f'/api/cursos/{curso.pk}/matriculas/?paginacao=keyset'
+        while url:
+            dados = self.client.get(url).json()
+            vistos += self.ids(dados)
+            url = dados['next']
+        self.assertEqual(sorted(vistos), sorted(
+            Matricula.objects.filter(curso=curso).values_list('pk', flat=True)
+        ))
+        self.assertEqual(len(vistos), len(set(vistos)))
@@ -0,0 +1,34 @@
+"""
+Views assíncronas (core/views_async.py): mesmas respostas das versões
+síncronas, pelo handler ASGI.
+"""
+from .benchmark import PARES_ASYNC, _preencher, ids_de_exemplo
+from .tests import CoreTestCase
+
+# links de paginação (prefixo /api/async/) e horário de geração dos relatórios
+VARIAVEIS = {'next', 'previous', 'gerado_em'}
+
+
+def _conteudo(resposta):
+    return {chave: valor for chave, valor in resposta.json().items() if chave not in VARIAVEIS}
+
+
+class ViewsAsyncTests(CoreTestCase):
+
+    async def test_mesmas_respostas_das_views_sincronas(self):
+        from asgiref.sync import sync_to_async
+
+        ids = await sync_to_async(ids_de_exemplo)()
+        for nome, sincrona, assincrona in PARES_ASYNC:
+            with self.subTest(rota=nome):
+                esperado = await sync_to_async(self.client.get)(_preencher(sincrona, ids))
+                resposta = await self.async_client.get(_preencher(assincrona, ids))
+                self.assertEqual(resposta.status_code, esperado.status_code)
+                if resposta['Content-Type'] == 'application/json':
+                    self.assertEqual(_conteudo(resposta), _conteudo(esperado))
+
+    async def test_detalhe_inexistente(self):
+        for url in ['/api/async/alunos/0/', '/api/async/cursos/0/', '/api/async/matriculas/0/']:
+            with self.subTest(url=url):
+                resposta = await self.async_client.get(url)
+                self.assertEqual(resposta.status_code, 404)
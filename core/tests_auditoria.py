@@ -0,0 +1,115 @@
+"""
+Auditoria dos planos de execução (core/auditoria.py e o comando
+auditar_consultas). O EXPLAIN do PostgreSQL é conferido com um plano
+pronto; o do SQLite roda de verdade.
+"""
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from . import auditoria
+from .auditoria import Consulta, auditar, consultas_da_rota
+from .benchmark import ROTAS, ids_de_exemplo
+from .models import Matricula
+from .tests import CoreTestCase
+
+PLANO_POSTGRES = [{
+    'Execution Time': 12.5,
+    'Plan': {
+        'Node Type': 'Hash Join',
+        'Plan Rows': 10,
+        'Actual Rows': 5000,
+        'Actual Loops': 1,
+        'Shared Hit Blocks': 40,
+        'Shared Read Blocks': 2,
+        'Plans': [
+            {
+                'Node Type': 'Seq Scan',
+                'Relation Name': 'core_matricula',
+                'Plan Rows': 5000,
+                'Actual Rows': 4000,
+                'Actual Loops': 1,
+                'Rows Removed by Filter': 6000,
+                'Filter': "((status)::text = 'PAGO'::text)",
+            },
+            {
+                'Node Type': 'Seq Scan',
+                'Relation Name': 'core_curso',
+                'Plan Rows': 6,
+                'Actual Rows': 6,
+                'Actual Loops': 1,
+            },
+        ],
+    },
+}]
+
+
+class AuditoriaTests(CoreTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # contagem de linhas por tabela guardada entre chamadas
+        auditoria._totais_sqlite.clear()
+        self.addCleanup(auditoria._totais_sqlite.clear)
+
+    def rota(self, nome):
+        return next(rota for rota in ROTAS if rota.nome == nome)
+
+    def test_plano_do_postgres(self):
+        conexao = mock.MagicMock(vendor='postgresql', alias='default')
+        cursor = conexao.cursor.return_value.__enter__.return_value
+        cursor.fetchone.return_value = [json.dumps(PLANO_POSTGRES)]
+        consulta = Consulta('default', 'SELECT 1')
+        with mock.patch('core.auditoria.connections', {'default': conexao}):
+            auditar(consulta, min_linhas=1000, fator_estimativa=10)
+        cursor.execute.assert_called_once_with('EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) SELECT 1')
+        self.assertEqual(consulta.tempo_ms, 12.5)
+        self.assertEqual(consulta.buffers, 42)
+        alertas = [(alerta.tipo, alerta.tabela) for alerta in consulta.alertas]
+        # core_curso é pequena: lida inteira sem alerta
+        self.assertEqual(alertas, [('estimativa', 'Hash Join'), ('seq_scan', 'core_matricula')])
+        self.assertIn('10000 linhas lidas', consulta.alertas[1].detalhe)
+
+    def test_scan_sem_indice_no_sqlite(self):
+        sql = 'SELECT c.nome FROM core_curso c WHERE c.carga_horaria > 10'
+        consulta = auditar(Consulta('default', sql), min_linhas=1)
+        self.assertEqual([(a.tipo, a.tabela) for a in consulta.alertas], [('seq_scan', 'core_curso')])
+        # abaixo de min_linhas a tabela é lida inteira de propósito
+        auditoria._totais_sqlite.clear()
+        self.assertEqual(auditar(Consulta('default', sql), min_linhas=1000).alertas, [])
+
+    def test_rota_de_escrita_e_desfeita(self):
+        antes = Matricula.objects.count()
+        consultas = consultas_da_rota(self.rota('matricula_criar'), ids_de_exemplo())
+        self.assertEqual(Matricula.objects.count(), antes)
+        self.assertTrue(consultas)
+        self.assertTrue(all(c.sql.lstrip().upper().startswith(('SELECT', 'WITH')) for c in consultas))
+        self.assertEqual(len({c.sql for c in consultas}), len(consultas))
+
+    def test_comando(self):
+        diretorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, diretorio, ignore_errors=True)
+        caminho = os.path.join(diretorio, 'auditoria.json')
+        saida = StringIO()
+        call_command(
+            'auditar_consultas', rota=['cursos_lista', 'aluno.total_pago'],
+            min_linhas=1, json=caminho, stdout=saida,
+        )
+        self.assertIn('2 alvo(s) auditado(s)', saida.getvalue())
+        with open(caminho, encoding='utf-8') as arquivo:
+            resultados = json.load(arquivo)
+        self.assertEqual([r['alvo'] for r in resultados], ['cursos_lista', 'aluno.total_pago'])
+        self.assertTrue(resultados[0]['consultas'])
+
+    def test_comando_estrito(self):
+        # ?nome= vira LIKE '%...%': sem PostgreSQL não há índice que ajude
+        opcoes = {'rota': ['alunos_busca_nome'], 'estrito': True, 'stdout': StringIO()}
+        with self.assertRaisesMessage(CommandError, '1 alerta(s)'):
+            call_command('auditar_consultas', min_linhas=1, **opcoes)
+        call_command('auditar_consultas', min_linhas=10**9, **opcoes)
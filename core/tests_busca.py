@@ -0,0 +1,64 @@
+"""
+Busca por nome (core/busca.py). Sem PostgreSQL a busca cai para icontains;
+o SQL com pg_trgm é conferido pela compilação da consulta, sem executá-la.
+"""
+from unittest import mock
+
+from django.contrib.admin.sites import site
+from django.test import RequestFactory
+
+from .busca import (
+    buscar_por_relevancia, escapar_like, filtro_contem, filtro_por_nome,
+    remover_acentos,
+)
+from .models import Aluno
+from .tests import CoreTestCase
+
+
+class BuscaTests(CoreTestCase):
+
+    def test_remove_acentos_como_o_unaccent(self):
+        self.assertEqual(remover_acentos('João Conceição Ávila'), 'Joao Conceicao Avila')
+
+    def test_escapa_curingas_do_like(self):
+        self.assertEqual(escapar_like('50%_a\\b'), '50\\%\\_a\\\\b')
+
+    def test_filtro_por_nome_no_postgres_usa_o_indice_sem_acento(self):
+        queryset = Aluno.objects.all()
+        with mock.patch('core.busca.usa_trigram', return_value=True):
+            filtro = filtro_por_nome(queryset, ['nome'], 'João_')
+            contem = filtro_contem(queryset, ['email'], 'Ana%')
+        self.assertEqual(filtro.children, [('nome__sem_acento__ilike', '%Joao\\_%')])
+        self.assertEqual(contem.children, [('email__ilike', '%Ana\\%%')])
+        sql = str(queryset.filter(filtro).query)
+        self.assertIn('core_unaccent', sql)
+        self.assertIn('ILIKE', sql)
+        self.assertNotIn('UPPER', sql)
+
+    def test_filtro_por_nome_sem_postgres(self):
+        aluno = Aluno.objects.order_by('pk').first()
+        trecho = aluno.nome.split()[0].lower()
+        dados = self.client.get('/api/alunos/', {'nome': trecho}).json()
+        ids = {item['id'] for item in dados['results']}
+        self.assertIn(aluno.pk, ids)
+        esperado = Aluno.objects.filter(nome__icontains=trecho).count()
+        self.assertEqual(dados['count'], esperado)
+
+    def test_busca_por_relevancia_anota_similaridade(self):
+        aluno = Aluno.objects.order_by('pk').first()
+        resultado = buscar_por_relevancia(Aluno.objects.all(), 'nome', aluno.nome)
+        self.assertIn(aluno, resultado)
+        self.assertTrue(all(item.similaridade == 1.0 for item in resultado))
+        resposta = self.client.get('/api/alunos/', {'q': aluno.nome})
+        self.assertEqual(resposta.status_code, 200)
+        self.assertIn(aluno.pk, [item['id'] for item in resposta.json()['results']])
+
+    def test_busca_do_admin_por_prefixo_de_cpf(self):
+        aluno = Aluno.objects.order_by('pk').first()
+        modelo_admin = site._registry[Aluno]
+        requisicao = RequestFactory().get('/admin/core/aluno/')
+        resultado, duplicados = modelo_admin.get_search_results(
+            requisicao, Aluno.objects.all(), aluno.cpf[:9]
+        )
+        self.assertIn(aluno, resultado)
+        self.assertFalse(duplicados)
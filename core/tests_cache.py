@@ -0,0 +1,47 @@
+"""
+Cache versionado dos resumos e dos fragmentos por aluno (core/cache.py).
+No TestCase os callbacks de on_commit não rodam sozinhos: as trocas de
+geração usam captureOnCommitCallbacks(execute=True).
+"""
+from django.core.cache import cache
+
+from .cache import _chave_geracao, obter_ou_calcular, obter_ou_calcular_aluno
+from .models import Aluno, Matricula
+from .tests import CoreTestCase
+
+
+class CacheTests(CoreTestCase):
+
+    def contador(self, valor='resumo'):
+        chamadas = []
+
+        def calcular():
+            chamadas.append(1)
+            return f'{valor} {len(chamadas)}'
+        return calcular, chamadas
+
+    def test_escrita_invalida_o_resumo(self):
+        calcular, chamadas = self.contador()
+        obter_ou_calcular('teste', calcular)
+        obter_ou_calcular('teste', calcular)
+        self.assertEqual(len(chamadas), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            Matricula.objects.filter(pk=self.matricula_pendente().pk).update(status='PAGO')
+        self.assertEqual(obter_ou_calcular('teste', calcular), 'resumo 2')
+
+    def test_geracao_despejada_nao_reaproveita_resumo(self):
+        obter_ou_calcular('teste', lambda: 'antigo')
+        cache.delete(_chave_geracao(Matricula))
+        self.assertEqual(obter_ou_calcular('teste', lambda: 'novo'), 'novo')
+
+    def test_historico_invalida_so_o_aluno(self):
+        aluno, curso = self.par_livre()
+        outro = Aluno.objects.exclude(pk=aluno.pk).order_by('pk').first()
+        calcular, chamadas = self.contador()
+        obter_ou_calcular_aluno('historico', aluno.pk, calcular)
+        obter_ou_calcular_aluno('historico', outro.pk, calcular)
+        with self.captureOnCommitCallbacks(execute=True):
+            Matricula.objects.create(aluno=aluno, curso=curso)
+        obter_ou_calcular_aluno('historico', aluno.pk, calcular)
+        obter_ou_calcular_aluno('historico', outro.pk, calcular)
+        self.assertEqual(len(chamadas), 3)
@@ -0,0 +1,35 @@
+"""
+ETag e GET condicional das listagens: só há validadores quando o cache é
+compartilhado entre os processos (senão cada worker teria a sua geração).
+"""
+import shutil
+import tempfile
+
+from django.test import override_settings
+
+from .models import Curso
+from .tests import CoreTestCase
+
+
+class GetCondicionalTests(CoreTestCase):
+
+    def test_sem_cache_compartilhado_nao_envia_validadores(self):
+        resposta = self.client.get('/api/cursos/')
+        self.assertEqual(resposta.status_code, 200)
+        self.assertFalse(resposta.has_header('ETag'))
+
+    def test_get_condicional_com_cache_compartilhado(self):
+        diretorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, diretorio, ignore_errors=True)
+        caches = {'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': diretorio,
+        }}
+        with override_settings(CACHES=caches):
+            etag = self.client.get('/api/cursos/')['ETag']
+            resposta = self.client.get('/api/cursos/', HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(resposta.status_code, 304)
+            with self.captureOnCommitCallbacks(execute=True):
+                Curso.objects.filter(pk=Curso.objects.order_by('pk').first().pk).update(nome='Outro nome')
+            resposta = self.client.get('/api/cursos/', HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(resposta.status_code, 200)
@@ -0,0 +1,53 @@
+"""
+Exportação em streaming dos relatórios SQL (core/exportacao.py):
+?format=ndjson|csv ou o header Accept equivalente.
+"""
+import csv
+import io
+import json
+
+from django.db import connection
+from django.test import TransactionTestCase
+
+from .exportacao import linhas_sql
+from .tests import CoreTestCase
+
+
+def _texto(resposta):
+    return b''.join(resposta.streaming_content).decode()
+
+
+class ExportacaoStreamingTests(CoreTestCase):
+
+    def test_ndjson_igual_ao_json(self):
+        for url, chave in [('/api/relatorio-sql/', 'alunos'), ('/api/cursos-populares-sql/', 'cursos')]:
+            with self.subTest(url=url):
+                esperado = self.client.get(f'{url}?format=json').json()[chave]
+                resposta = self.client.get(f'{url}?format=ndjson')
+                self.assertTrue(resposta.streaming)
+                self.assertTrue(resposta['Content-Type'].startswith('application/x-ndjson'))
+                linhas = [json.loads(linha) for linha in _texto(resposta).splitlines()]
+                self.assertEqual(linhas, esperado)
+
+    def test_csv_com_cabecalho(self):
+        esperado = self.client.get('/api/relatorio-sql/?format=json').json()['alunos']
+        resposta = self.client.get('/api/relatorio-sql/', HTTP_ACCEPT='text/csv')
+        self.assertTrue(resposta.streaming)
+        self.assertIn('relatorio_alunos.csv', resposta['Content-Disposition'])
+        linhas = list(csv.reader(io.StringIO(_texto(resposta))))
+        self.assertEqual(linhas[0], list(esperado[0]))
+        self.assertEqual(len(linhas), len(esperado) + 1)
+        self.assertEqual(linhas[1][0], str(esperado[0][linhas[0][0]]))
+
+
+class ExportacaoTransacaoTests(TransactionTestCase):
+
+    def test_lotes_dentro_de_uma_transacao(self):
+        lotes = linhas_sql('SELECT 1 AS um UNION ALL SELECT 2 UNION ALL SELECT 3', tamanho_lote=2)
+        self.assertEqual(next(lotes), ['um'])
+        # em autocommit o cursor no servidor precisa de uma transação
+        self.assertTrue(connection.in_atomic_block)
+        self.assertEqual(len(next(lotes)), 2)
+        lotes.close()
+        self.assertFalse(connection.in_atomic_block)
+        self.assertTrue(connection.get_autocommit())
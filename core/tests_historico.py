@@ -0,0 +1,88 @@
+"""
+Histórico do aluno (aluno_historico_view): agregado em uma consulta
+(estatisticas.historico_aluno) e fragmento em cache por aluno.
+"""
+from datetime import date
+from decimal import Decimal
+
+from django.db.models import Count, Sum
+
+from .dados import cpf_sequencial
+from .estatisticas import historico_aluno
+from .models import Aluno, Curso, Matricula
+from .tests import CoreTestCase
+
+
+class HistoricoAlunoTests(CoreTestCase):
+
+    def aluno_com_matriculas(self):
+        return (
+            Aluno.objects.annotate(total=Count('matriculas'))
+            .filter(total__gt=1).order_by('pk').first()
+        )
+
+    def test_agregado_em_uma_consulta(self):
+        aluno = self.aluno_com_matriculas()
+        with self.assertNumQueries(1):
+            historico = historico_aluno(aluno.pk)
+        matriculas = Matricula.objects.filter(aluno=aluno)
+
+        def soma(status):
+            return matriculas.filter(status=status).aggregate(
+                total=Sum('curso__valor_inscricao')
+            )['total'] or Decimal('0')
+
+        self.assertEqual(historico['aluno']['nome'], aluno.nome)
+        self.assertEqual(
+            sorted(m['id'] for m in historico['matriculas']),
+            sorted(matriculas.values_list('pk', flat=True)),
+        )
+        self.assertEqual(historico['total_matriculas'], matriculas.count())
+        self.assertEqual(
+            historico['total_horas'],
+            matriculas.aggregate(total=Sum('curso__carga_horaria'))['total'],
+        )
+        self.assertEqual(historico['total_pago'], soma('PAGO'))
+        self.assertEqual(historico['total_devido'], soma('PENDENTE'))
+        self.assertEqual(historico['total_geral'], soma('PAGO') + soma('PENDENTE'))
+
+    def test_aluno_sem_matriculas(self):
+        aluno = Aluno.objects.create(
+            nome='Aluno Sem Matrículas',
+            email='sem.matriculas@exemplo.com.br',
+            cpf=cpf_sequencial(987_654_320),
+            data_ingresso=date(2024, 1, 15),
+        )
+        historico = historico_aluno(aluno.pk)
+        self.assertEqual(historico['matriculas'], [])
+        self.assertEqual(historico['total_horas'], 0)
+        self.assertEqual(historico['total_geral'], Decimal('0'))
+
+    def test_aluno_inexistente(self):
+        self.assertIsNone(historico_aluno(999999))
+        self.assertEqual(self.client.get('/alunos/999999/').status_code, 404)
+
+    def test_fragmento_em_cache(self):
+        aluno = self.aluno_com_matriculas()
+        resposta = self.client.get(f'/alunos/{aluno.pk}/')
+        self.assertContains(resposta, aluno.nome)
+        with self.assertNumQueries(0):
+            repetida = self.client.get(f'/alunos/{aluno.pk}/')
+        self.assertEqual(repetida.content, resposta.content)
+
+    def test_nova_matricula_invalida_o_fragmento(self):
+        aluno, curso = self.par_livre()
+        Curso.objects.filter(pk=curso.pk).update(nome='Curso Recém-Criado')
+        self.client.get(f'/alunos/{aluno.pk}/')
+        with self.captureOnCommitCallbacks(execute=True):
+            Matricula.objects.create(aluno=aluno, curso=curso)
+        self.assertContains(self.client.get(f'/alunos/{aluno.pk}/'), 'Curso Recém-Criado')
+
+    def test_curso_renomeado_invalida_o_fragmento(self):
+        matricula = Matricula.objects.order_by('pk').first()
+        self.client.get(f'/alunos/{matricula.aluno_id}/')
+        with self.captureOnCommitCallbacks(execute=True):
+            curso = matricula.curso
+            curso.nome = 'Nome Novo do Curso'
+            curso.save()
+        self.assertContains(self.client.get(f'/alunos/{matricula.aluno_id}/'), 'Nome Novo do Curso')
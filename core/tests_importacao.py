@@ -0,0 +1,75 @@
+"""
+Validação de CPF e importação de CSV em lotes (core/importacao.py).
+"""
+import io
+
+from .dados import cpf_sequencial
+from .importacao import (
+    MOTIVO_CPF_CADASTRADO, MOTIVO_CPF_INVALIDO, MOTIVO_EMAIL_CADASTRADO, importar_csv,
+)
+from .models import Aluno, Matricula, SaldoAluno
+from .tests import CoreTestCase
+from .validadores import cpf_valido, normalizar_cpf
+
+
+class CpfImportacaoTests(CoreTestCase):
+
+    def importar(self, tipo, texto, **kwargs):
+        erros = io.StringIO()
+        relatorio = importar_csv(tipo, io.StringIO(texto), erros, **kwargs)
+        return relatorio, erros.getvalue()
+
+    def test_cpf(self):
+        self.assertTrue(cpf_valido(cpf_sequencial(123)))
+        self.assertTrue(cpf_valido(normalizar_cpf('529.982.247-25')))
+        self.assertFalse(cpf_valido('52998224724'))
+        self.assertFalse(cpf_valido('11111111111'))
+        self.assertFalse(cpf_valido('5299822472'))
+
+    def test_importar_alunos(self):
+        existente = Aluno.objects.order_by('pk').first()
+        relatorio, erros = self.importar('alunos', '\n'.join([
+            'nome,email,cpf,data_ingresso',
+            f'Nova Aluna,nova@exemplo.com,{cpf_sequencial(900)},2024-01-10',
+            'Cpf Errado,errado@exemplo.com,52998224724,2024-01-10',
+            f'Email Repetido,{existente.email},{cpf_sequencial(901)},2024-01-10',
+            f'Cpf Repetido,outro@exemplo.com,{existente.cpf},10/01/2024',
+        ]))
+        self.assertEqual((relatorio.inseridos, relatorio.rejeitados), (1, 3))
+        self.assertTrue(Aluno.objects.filter(email='nova@exemplo.com').exists())
+        linhas = erros.splitlines()
+        self.assertIn(MOTIVO_CPF_INVALIDO, linhas[1])
+        self.assertIn(MOTIVO_EMAIL_CADASTRADO, linhas[2])
+        self.assertNotIn(MOTIVO_CPF_CADASTRADO, linhas[2])
+        self.assertIn(MOTIVO_CPF_CADASTRADO, linhas[3])
+        self.assertTrue(SaldoAluno.objects.filter(aluno__email='nova@exemplo.com').exists())
+
+    def test_importar_matriculas(self):
+        aluno, curso = self.par_livre()
+        existente = Matricula.objects.order_by('pk').first()
+        relatorio, _ = self.importar('matriculas', '\n'.join([
+            'aluno_cpf,curso_id,status,data_matricula',
+            f'{aluno.cpf},{curso.pk},PAGO,2024-02-01',
+            f'{cpf_sequencial(999)},{curso.pk},PAGO,2024-02-01',
+            f'{existente.aluno.cpf},{existente.curso_id},PAGO,2024-02-01',
+        ]))
+        self.assertEqual((relatorio.inseridos, relatorio.rejeitados), (1, 2))
+        self.assertDerivadosConsistentes()
+
+    def test_varios_lotes_na_mesma_transacao(self):
+        # o TestCase já roda dentro de uma transação: no PostgreSQL cada
+        # lote cria e apaga a sua tabela temporária
+        cpfs = [cpf_sequencial(numero) for numero in range(910, 915)]
+        relatorio, _ = self.importar('alunos', '\n'.join([
+            'nome,email,cpf,data_ingresso',
+            *(f'Aluno {cpf},aluno{cpf}@exemplo.com,{cpf},2024-01-10' for cpf in cpfs),
+        ]), tamanho_lote=2)
+        self.assertEqual((relatorio.inseridos, relatorio.rejeitados), (5, 0))
+
+        _, curso = self.par_livre()
+        relatorio, _ = self.importar('matriculas', '\n'.join([
+            'aluno_cpf,curso_id,status,data_matricula',
+            *(f'{cpf},{curso.pk},PENDENTE,2024-02-01' for cpf in cpfs),
+        ]), tamanho_lote=2)
+        self.assertEqual((relatorio.inseridos, relatorio.rejeitados), (5, 0))
+        self.assertDerivadosConsistentes()
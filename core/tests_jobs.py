@@ -0,0 +1,107 @@
+"""
+Jobs de relatório (core/jobs.py, /api/relatorios/jobs/ e o comando
+processar_jobs_relatorio).
+"""
+import gzip
+import shutil
+import tempfile
+from concurrent.futures import Future
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import override_settings
+from django.utils import timezone
+
+from . import jobs
+from .jobs import enfileirar, executar, limpar_expirados, processar_fila, reservar
+from .models import JobRelatorio
+from .tests import CoreTestCase
+
+
+class JobsTests(CoreTestCase):
+
+    def setUp(self):
+        super().setUp()
+        diretorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, diretorio, ignore_errors=True)
+        configuracao = override_settings(RELATORIOS_JOBS_DIR=diretorio)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+
+    def test_pedido_repetido_devolve_o_mesmo_job(self):
+        job, criado = enfileirar('alunos', 'csv', {'fresco': False})
+        repetido, criado_de_novo = enfileirar('alunos', 'csv', {'fresco': False})
+        self.assertEqual((repetido.pk, criado, criado_de_novo), (job.pk, True, False))
+
+    def test_processar_e_baixar(self):
+        resposta = self.client.post(
+            '/api/relatorios/jobs/', {'tipo': 'cursos_populares', 'formato': 'csv'},
+            content_type='application/json',
+        )
+        self.assertEqual(resposta.status_code, 202)
+        pk = resposta.json()['id']
+        self.assertEqual(self.client.get(f'/api/relatorios/jobs/{pk}/download/').status_code, 409)
+        self.assertEqual(processar_fila(), (1, 0))
+
+        resposta = self.client.get(f'/api/relatorios/jobs/{pk}/download/')
+        self.assertEqual(resposta.status_code, 200)
+        texto = gzip.decompress(b''.join(resposta.streaming_content)).decode()
+        job = JobRelatorio.objects.get(pk=pk)
+        self.assertEqual(len(texto.splitlines()), job.linhas + 1)
+
+    def test_tentativa_devolvida_a_fila_descarta_o_resultado(self):
+        job, _ = enfileirar('cursos_populares', 'csv', {'fresco': False})
+        lenta = reservar()
+        # recuperar_abandonados devolveu o job e outro worker o pegou
+        JobRelatorio.objects.filter(pk=job.pk).update(status='PENDENTE')
+        nova = reservar()
+        self.assertFalse(executar(lenta))
+        self.assertEqual(JobRelatorio.objects.get(pk=job.pk).status, 'PROCESSANDO')
+        self.assertTrue(executar(nova))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.tentativas), ('CONCLUIDO', 2))
+        self.assertIn('-2-', job.arquivo)
+
+    def test_expirados_sao_apagados(self):
+        enfileirar('alunos', 'ndjson', {'fresco': False})
+        processar_fila()
+        JobRelatorio.objects.update(expira_em=timezone.now() - timedelta(hours=1))
+        self.assertEqual(limpar_expirados(), 1)
+        self.assertFalse(JobRelatorio.objects.exists())
+
+    def test_falha_espera_antes_da_proxima_tentativa(self):
+        job, _ = enfileirar('cursos_populares', 'csv', {'fresco': False})
+        with mock.patch.dict(jobs.CONSULTAS, {'cursos_populares': mock.Mock(side_effect=RuntimeError('banco fora'))}):
+            self.assertEqual(processar_fila(), (0, 1))
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.tentativas), ('PENDENTE', 1))
+            self.assertIn('banco fora', job.erro)
+            self.assertGreater(job.disponivel_em, timezone.now())
+            # ainda na espera: a fila não repete o job em seguida
+            self.assertEqual(processar_fila(), (0, 0))
+
+        depois = job.disponivel_em + timedelta(seconds=1)
+        with mock.patch('django.utils.timezone.now', return_value=depois):
+            self.assertEqual(processar_fila(), (1, 0))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.tentativas), ('CONCLUIDO', 2))
+
+
+class ProcessarJobsComandoTests(CoreTestCase):
+
+    def test_ctrl_c_sem_intervalo_para_os_workers(self):
+        parados = []
+
+        def trabalhar(parar, intervalo):
+            parados.append(parar.wait(5))
+            return 0, 0
+
+        # o Ctrl-C chega enquanto o comando espera as threads
+        with mock.patch('core.management.commands.processar_jobs_relatorio._trabalhar', trabalhar), \
+                mock.patch.object(Future, 'result', side_effect=[KeyboardInterrupt, (0, 0)]):
+            saida = StringIO()
+            call_command('processar_jobs_relatorio', workers=1, stdout=saida)
+        self.assertIn('Interrompido', saida.getvalue())
+        self.assertEqual(parados, [True])
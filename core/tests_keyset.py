@@ -0,0 +1,33 @@
+"""
+Paginação keyset da lista de alunos (?paginacao=keyset e cursor).
+"""
+from .models import Aluno
+from .tests import CoreTestCase
+
+
+class KeysetTests(CoreTestCase):
+
+    def test_percorre_todos_sem_repetir(self):
+        vistos = []
+        paginas = []
+        url = '/api/alunos/?paginacao=keyset'
+        while url:
+            dados = self.client.get(url).json()
+            paginas.append([aluno['id'] for aluno in dados['results']])
+            vistos += paginas[-1]
+            url = dados['next']
+        esperado = list(Aluno.objects.order_by('-data_ingresso', '-id').values_list('pk', flat=True))
+        self.assertEqual(vistos, esperado)
+        self.assertGreater(len(paginas), 2)
+
+    def test_volta_para_a_pagina_anterior(self):
+        primeira = self.client.get('/api/alunos/?paginacao=keyset').json()
+        segunda = self.client.get(primeira['next']).json()
+        anterior = self.client.get(segunda['previous']).json()
+        self.assertEqual(
+            [aluno['id'] for aluno in anterior['results']],
+            [aluno['id'] for aluno in primeira['results']],
+        )
+
+    def test_cursor_invalido(self):
+        self.assertEqual(self.client.get('/api/alunos/?cursor=xyz').status_code, 404)
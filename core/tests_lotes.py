@@ -0,0 +1,130 @@
+"""
+Operações em lote: criação de matrículas (core/lotes.py e
+POST /api/matriculas/bulk/) e transição de status em massa
+(QuerySet.transicionar_status e POST /api/matriculas/transicao-status/).
+"""
+from unittest import mock
+
+from . import lotes
+from .lotes import MOTIVO_JA_MATRICULADO, MOTIVO_REPETIDO
+from .models import EventoOutbox, Matricula
+from .tests import CoreTestCase
+
+
+class TransicaoStatusTests(CoreTestCase):
+
+    def test_transicao_de_status(self):
+        aluno_id = self.matricula_pendente().aluno_id
+        pendentes = set(Matricula.objects.filter(
+            aluno_id=aluno_id, status='PENDENTE',
+        ).values_list('pk', flat=True))
+        dados = {'status': 'PAGO', 'aluno': aluno_id}
+        resposta = self.client.post('/api/matriculas/transicao-status/', dados, content_type='application/json')
+        self.assertEqual(set(resposta.json()['ids']), pendentes)
+        resposta = self.client.post('/api/matriculas/transicao-status/', dados, content_type='application/json')
+        self.assertEqual(resposta.json()['total_alteradas'], 0)
+        self.assertDerivadosConsistentes()
+
+    def test_transicao_limita_os_ids_da_resposta(self):
+        total = Matricula.objects.filter(status='PENDENTE').count()
+        with mock.patch('core.views.MatriculaViewSet.LIMITE_IDS_TRANSICAO', 3):
+            resposta = self.client.post(
+                '/api/matriculas/transicao-status/', {'status': 'PAGO', 'data_fim': '2100-01-01'},
+                content_type='application/json',
+            )
+        dados = resposta.json()
+        self.assertEqual(dados['total_alteradas'], total)
+        self.assertEqual(len(dados['ids']), 3)
+        self.assertTrue(dados['ids_truncados'])
+
+    def test_transicao_devolve_o_status_anterior(self):
+        alteradas = Matricula.objects.all().transicionar_status('PENDENTE')
+        self.assertEqual({status for *_, status in alteradas}, {'PAGO'})
+        eventos = EventoOutbox.objects.filter(tipo='matricula_status')
+        self.assertEqual(eventos.count(), len(alteradas))
+        self.assertTrue(all(evento.dados['status_anterior'] == 'PAGO' for evento in eventos))
+        self.assertDerivadosConsistentes()
+
+
+class LoteMatriculasTests(CoreTestCase):
+
+    def test_lote_parcial(self):
+        aluno, curso = self.par_livre()
+        existente = Matricula.objects.order_by('pk').first()
+        novo = {'aluno': aluno.pk, 'curso': curso.pk, 'status': 'PENDENTE'}
+        resposta = self.client.post('/api/matriculas/bulk/', {
+            'modo': 'parcial',
+            'itens': [
+                novo,
+                {'aluno': existente.aluno_id, 'curso': existente.curso_id},
+                novo,
+            ],
+        }, content_type='application/json')
+        self.assertEqual(resposta.status_code, 201)
+        dados = resposta.json()
+        self.assertEqual(dados['total_aceitos'], 1)
+        motivos = [motivo for rejeitado in dados['rejeitados'] for motivo in rejeitado['motivos']]
+        self.assertIn(MOTIVO_JA_MATRICULADO, motivos)
+        self.assertIn(MOTIVO_REPETIDO, motivos)
+        self.assertTrue(EventoOutbox.objects.filter(
+            tipo='matricula_criada', objeto_id=dados['aceitos'][0]['id'],
+        ).exists())
+        self.assertDerivadosConsistentes()
+
+    def test_lote_tudo_ou_nada(self):
+        aluno, curso = self.par_livre()
+        existente = Matricula.objects.order_by('pk').first()
+        total = Matricula.objects.count()
+        resposta = self.client.post('/api/matriculas/bulk/', {
+            'modo': 'tudo_ou_nada',
+            'itens': [
+                {'aluno': aluno.pk, 'curso': curso.pk},
+                {'aluno': existente.aluno_id, 'curso': existente.curso_id},
+            ],
+        }, content_type='application/json')
+        self.assertEqual(resposta.status_code, 400)
+        self.assertEqual(Matricula.objects.count(), total)
+
+    def itens_com_conflito(self):
+        aluno, curso = self.par_livre()
+        existente = Matricula.objects.order_by('pk').first()
+        return [
+            {'aluno': aluno.pk, 'curso': curso.pk, 'status': 'PENDENTE'},
+            {'aluno': existente.aluno_id, 'curso': existente.curso_id, 'status': 'PENDENTE'},
+        ]
+
+    def test_conflito_concorrente_revalida_o_lote(self):
+        # a primeira validação não vê a matrícula "criada por outra requisição"
+        pares_existentes = lotes._pares_existentes
+        chamadas = []
+
+        def cega_uma_vez(pares):
+            chamadas.append(pares)
+            return set() if len(chamadas) == 1 else pares_existentes(pares)
+
+        with mock.patch('core.lotes._pares_existentes', cega_uma_vez):
+            resultado = lotes.criar_matriculas_em_lote(self.itens_com_conflito())
+        self.assertEqual(len(chamadas), 2)
+        self.assertEqual([aceito['indice'] for aceito in resultado['aceitos']], [0])
+        self.assertEqual([rejeitado['indice'] for rejeitado in resultado['rejeitados']], [1])
+        self.assertDerivadosConsistentes()
+
+    def test_conflito_repetido_aponta_os_indices(self):
+        itens = self.itens_com_conflito()
+        with mock.patch('core.lotes._pares_existentes', return_value=set()):
+            resultado = lotes.criar_matriculas_em_lote(itens)
+        self.assertTrue(resultado['gravado'])
+        self.assertEqual([aceito['indice'] for aceito in resultado['aceitos']], [0])
+        self.assertEqual(resultado['rejeitados'], [
+            {'indice': 1, 'item': itens[1], 'motivos': [MOTIVO_JA_MATRICULADO]},
+        ])
+        self.assertDerivadosConsistentes()
+
+        total = Matricula.objects.count()
+        itens = self.itens_com_conflito()
+        with mock.patch('core.lotes._pares_existentes', return_value=set()):
+            resultado = lotes.criar_matriculas_em_lote(itens, tudo_ou_nada=True)
+        self.assertFalse(resultado['gravado'])
+        self.assertEqual([rejeitado['indice'] for rejeitado in resultado['rejeitados']], [1])
+        self.assertEqual(Matricula.objects.count(), total)
+        self.assertDerivadosConsistentes()
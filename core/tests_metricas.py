@@ -0,0 +1,75 @@
+"""
+Instrumentação por requisição (core/metricas.py): header Server-Timing e
+agregados por rota em /api/_metrics.
+"""
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+from .metricas import ColetorRequisicao, Histograma, impressao_digital, registro
+from .tests import CoreTestCase
+
+
+class MetricasTests(CoreTestCase):
+
+    def setUp(self):
+        super().setUp()
+        registro.limpar()
+        self.addCleanup(registro.limpar)
+
+    def test_impressao_digital_ignora_parametros(self):
+        self.assertEqual(
+            impressao_digital("SELECT * FROM t WHERE id = 12 AND nome = 'Ana'"),
+            impressao_digital("SELECT * FROM t WHERE id = 7 AND nome = 'Bia'"),
+        )
+        self.assertEqual(
+            impressao_digital('SELECT * FROM t WHERE id IN (%s, %s, %s)'),
+            impressao_digital('SELECT * FROM t WHERE id IN (%s, %s)'),
+        )
+
+    def test_coletor_conta_consultas_duplicadas(self):
+        coletor = ColetorRequisicao()
+        for sql in ('SELECT 1 FROM t WHERE id = 1', 'SELECT 1 FROM t WHERE id = 2', 'SELECT 2'):
+            coletor(lambda *args: None, sql, None, False, {})
+        self.assertEqual(coletor.duplicadas(), {'SELECT ? FROM t WHERE id = ?': 2})
+
+    def test_histograma_acumula_os_buckets(self):
+        histograma = Histograma((1, 5))
+        for valor in (0.5, 3, 9):
+            histograma.observar(valor)
+        linhas = list(histograma.linhas('x', 'rota="r"'))
+        self.assertEqual(linhas[:3], [
+            'x_bucket{rota="r",le="1"} 1',
+            'x_bucket{rota="r",le="5"} 2',
+            'x_bucket{rota="r",le="+Inf"} 3',
+        ])
+        self.assertEqual(linhas[-1], 'x_count{rota="r"} 3')
+
+    def test_server_timing_conta_as_consultas(self):
+        with CaptureQueriesContext(connection) as consultas:
+            resposta = self.client.get('/api/cursos/')
+        timing = resposta['Server-Timing']
+        self.assertIn(f'desc="{len(consultas)} consultas"', timing)
+        for metrica in ('db;dur=', 'dup;desc=', 'view;dur=', 'total;dur='):
+            self.assertIn(metrica, timing)
+
+    def test_endpoint_agrega_por_rota(self):
+        aluno_id = self.client.get('/api/alunos/').json()['results'][0]['id']
+        self.client.get(f'/api/alunos/{aluno_id}/')
+        self.client.get('/api/alunos/')
+        resposta = self.client.get('/api/_metrics')
+        self.assertTrue(resposta['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.assertFalse(resposta.has_header('Server-Timing'))
+        texto = resposta.content.decode()
+        self.assertIn('core_http_requisicoes_total{rota="api/alunos/$",metodo="GET",status="200"} 2', texto)
+        self.assertIn('core_http_consultas_count{rota="api/alunos/$",metodo="GET"} 2', texto)
+        # o padrão da URL, não o caminho com o id
+        self.assertRegex(texto, r'rota="api/alunos/\(\?P<pk>[^"]*\)/\$"')
+        self.assertNotIn(f'/{aluno_id}/', texto)
+        self.assertNotIn('_metrics', texto)
+
+    @override_settings(METRICAS_ATIVAS=False)
+    def test_desligado_por_configuracao(self):
+        resposta = self.client.get('/api/cursos/')
+        self.assertFalse(resposta.has_header('Server-Timing'))
+        self.assertNotIn('core_http_requisicoes_total{', registro.exportar())
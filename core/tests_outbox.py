@@ -0,0 +1,104 @@
+"""
+Caixa de saída transacional (core/outbox.py): eventos gravados pelas
+escritas, drenagem, falhas por evento e REFRESH dos relatórios.
+"""
+from datetime import timedelta
+from unittest import mock
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import outbox
+from .models import Curso, EventoOutbox, Matricula
+from .tests import CoreTestCase
+
+
+def _falhar(eventos):
+    raise RuntimeError('consumidor fora do ar')
+
+
+class OutboxTests(CoreTestCase):
+
+    def setUp(self):
+        super().setUp()
+        EventoOutbox.objects.all().delete()
+        outbox._relatorios['pendentes'] = False
+
+    def test_eventos_das_escritas(self):
+        aluno, curso = self.par_livre()
+        matricula = Matricula.objects.create(aluno=aluno, curso=curso, status='PENDENTE')
+        matricula.marcar_como_pago()
+        matricula.delete()
+        self.assertEqual(
+            list(EventoOutbox.objects.order_by('id').values_list('tipo', flat=True)),
+            ['matricula_criada', 'matricula_status', 'matricula_excluida'],
+        )
+        status = EventoOutbox.objects.get(tipo='matricula_status').dados
+        self.assertEqual((status['status_anterior'], status['status']), ('PENDENTE', 'PAGO'))
+
+    def test_exclusao_em_cascata_grava_os_eventos_de_uma_vez(self):
+        curso = Curso.objects.filter(matriculas__isnull=False).distinct().first()
+        matriculas = set(curso.matriculas.values_list('pk', flat=True))
+        self.assertGreater(len(matriculas), 1)
+        tabela = connection.ops.quote_name(EventoOutbox._meta.db_table)
+        with CaptureQueriesContext(connection) as consultas:
+            curso.delete()
+        inserts = [c for c in consultas.captured_queries if c['sql'].startswith(f'INSERT INTO {tabela}')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(
+            set(EventoOutbox.objects.filter(tipo='matricula_excluida').values_list('objeto_id', flat=True)),
+            matriculas,
+        )
+
+    def test_drenar_entrega_a_todos_os_consumidores(self):
+        Matricula.objects.filter(status='PENDENTE').update(status='PAGO')
+        total = EventoOutbox.objects.count()
+        recebidos = []
+        with mock.patch.object(outbox, '_consumidores', [recebidos.extend]):
+            self.assertEqual(outbox.drenar(tamanho=10), (total, 0))
+        self.assertEqual(len(recebidos), total)
+        self.assertEqual(outbox.pendentes(), 0)
+
+    def test_falha_de_um_evento_nao_devolve_o_lote(self):
+        Matricula.objects.filter(status='PENDENTE').update(status='PAGO')
+        total = EventoOutbox.objects.count()
+        ruim = EventoOutbox.objects.order_by('id')[1].pk
+
+        def falhar_um(eventos):
+            if any(evento.pk == ruim for evento in eventos):
+                raise RuntimeError('evento com problema')
+
+        with mock.patch.object(outbox, '_consumidores', [falhar_um]):
+            self.assertEqual(outbox.drenar(), (total - 1, 1))
+        evento = EventoOutbox.objects.get(processado_em__isnull=True)
+        self.assertEqual((evento.pk, evento.tentativas), (ruim, 1))
+        self.assertIn('evento com problema', evento.erro)
+
+    def test_falha_espera_antes_da_proxima_tentativa(self):
+        self.matricula_pendente().marcar_como_pago()
+        with mock.patch.object(outbox, '_consumidores', [_falhar]):
+            self.assertEqual(outbox.drenar(), (0, 1))
+            evento = EventoOutbox.objects.get()
+            self.assertIsNone(evento.processado_em)
+            self.assertIn('consumidor fora do ar', evento.erro)
+            self.assertGreater(evento.disponivel_em, timezone.now())
+            # ainda na espera: nao e repetido
+            self.assertEqual(outbox.drenar(), (0, 0))
+
+            depois = timezone.now()
+            for _ in range(outbox.MAX_TENTATIVAS - 1):
+                depois += timedelta(seconds=outbox.ESPERA_MAXIMA_S)
+                with mock.patch('django.utils.timezone.now', return_value=depois):
+                    outbox.drenar()
+        evento.refresh_from_db()
+        self.assertEqual(evento.tentativas, outbox.MAX_TENTATIVAS)
+        self.assertEqual(outbox.pendentes(), 0)
+
+    def test_relatorios_atualizados_uma_vez_por_drenagem(self):
+        Matricula.objects.filter(status='PENDENTE').update(status='PAGO')
+        with mock.patch('core.relatorios.usa_view_materializada', return_value=True), \
+                mock.patch('core.relatorios.atualizar_relatorios') as atualizar, \
+                mock.patch.object(outbox, '_consumidores', []):
+            outbox.drenar(tamanho=5)
+        atualizar.assert_called_once_with()
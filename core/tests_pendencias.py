@@ -0,0 +1,99 @@
+"""
+Envelhecimento das pendentes (core/pendencias.py): faixas de
+/api/relatorios/pendencias/ e o detalhe em /api/matriculas/pendentes/.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+from urllib.parse import urlsplit
+
+from django.utils import timezone
+
+from .models import Matricula
+from .pendencias import FAIXAS, NOMES_FAIXAS, filtro_faixa, resumo_pendencias
+from .tests import CoreTestCase
+
+
+def faixa_de(dias):
+    # as faixas estão em ordem: a primeira cujo máximo cobre os dias
+    return next(nome for nome, _, maximo in FAIXAS if maximo is None or dias <= maximo)
+
+
+class PendenciasTests(CoreTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # pendentes espalhadas por todas as faixas, incluindo os limites e
+        # uma data futura
+        hoje = timezone.localdate()
+        pendentes = Matricula.objects.filter(status='PENDENTE').order_by('pk')
+        for matricula, dias in zip(pendentes, (-3, 0, 30, 31, 60, 61, 90, 91, 400)):
+            Matricula.objects.filter(pk=matricula.pk).update(
+                data_matricula=hoje - timedelta(days=dias)
+            )
+
+    def esperado(self, curso_id=None):
+        hoje = timezone.localdate()
+        faixas = {nome: [0, Decimal('0')] for nome in NOMES_FAIXAS}
+        pendentes = Matricula.objects.filter(status='PENDENTE').select_related('curso')
+        if curso_id is not None:
+            pendentes = pendentes.filter(curso_id=curso_id)
+        for matricula in pendentes:
+            faixa = faixas[faixa_de((hoje - matricula.data_matricula).days)]
+            faixa[0] += 1
+            faixa[1] += matricula.curso.valor_inscricao
+        return faixas
+
+    def test_limites_das_faixas(self):
+        hoje = date(2024, 6, 30)
+        matricula = Matricula.objects.order_by('pk').first()
+        for dias, nome in ((-1, '0-30'), (30, '0-30'), (31, '31-60'), (90, '61-90'), (91, '90+')):
+            Matricula.objects.filter(pk=matricula.pk).update(data_matricula=hoje - timedelta(days=dias))
+            dentro = [
+                faixa for faixa in NOMES_FAIXAS
+                if Matricula.objects.filter(filtro_faixa(faixa, hoje), pk=matricula.pk).exists()
+            ]
+            self.assertEqual(dentro, [nome], msg=f'{dias} dias')
+
+    def test_resumo_bate_com_as_pendentes(self):
+        with self.assertNumQueries(1):
+            resumo = resumo_pendencias()
+        esperado = self.esperado()
+        for faixa in resumo['faixas']:
+            self.assertEqual([faixa['matriculas'], faixa['valor']], esperado[faixa['faixa']])
+        self.assertEqual(resumo['total_matriculas'], Matricula.objects.filter(status='PENDENTE').count())
+        self.assertTrue(all(faixa['matriculas'] for faixa in resumo['faixas']))
+
+    def test_drill_down_de_cada_faixa(self):
+        dados = self.client.get('/api/relatorios/pendencias/').json()
+        self.assertEqual([faixa['faixa'] for faixa in dados['faixas']], NOMES_FAIXAS)
+        for faixa in dados['faixas']:
+            itens = []
+            url = faixa['matriculas_url']
+            while url:
+                partes = urlsplit(url)
+                detalhe = self.client.get(f'{partes.path}?{partes.query}').json()
+                itens += detalhe['results']
+                url = detalhe['next']
+            with self.subTest(faixa=faixa['faixa']):
+                self.assertEqual(len(itens), faixa['matriculas'])
+                self.assertEqual({item['status'] for item in itens}, {'PENDENTE'})
+                dias = [item['dias_pendente'] for item in itens]
+                # da mais antiga para a mais nova
+                self.assertEqual(dias, sorted(dias, reverse=True))
+                self.assertTrue(all(faixa_de(d) == faixa['faixa'] for d in dias))
+
+    def test_filtro_por_curso(self):
+        curso_id = Matricula.objects.filter(status='PENDENTE').order_by('pk').first().curso_id
+        dados = self.client.get(f'/api/relatorios/pendencias/?curso={curso_id}').json()
+        self.assertEqual(dados['curso'], curso_id)
+        esperado = self.esperado(curso_id)
+        for faixa in dados['faixas']:
+            self.assertEqual(faixa['matriculas'], esperado[faixa['faixa']][0])
+            self.assertIn(f'curso={curso_id}', faixa['matriculas_url'])
+
+    def test_parametros_invalidos(self):
+        self.assertEqual(self.client.get('/api/relatorios/pendencias/?curso=abc').status_code, 400)
+        resposta = self.client.get('/api/matriculas/pendentes/?faixa=10-20')
+        self.assertEqual(resposta.status_code, 400)
+        self.assertIn('faixa', resposta.json())
@@ -0,0 +1,67 @@
+"""
+Rollups de receita (core/receita.py) e /api/relatorios/receita/.
+"""
+from datetime import date
+from decimal import Decimal
+
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+
+from .models import Aluno, Curso, Matricula
+from .receita import ROLLUPS, recalcular_receita
+from .tests import CoreTestCase
+
+
+class ReceitaTests(CoreTestCase):
+
+    def test_rollups_acompanham_as_escritas(self):
+        aluno, curso = self.par_livre()
+        Matricula.objects.create(aluno=aluno, curso=curso, status='PAGO', data_matricula=date(2024, 3, 5))
+        Matricula.objects.filter(curso=curso).update(status='PENDENTE')
+        Matricula.objects.filter(aluno=aluno).update(data_matricula=date(2023, 1, 1))
+        Curso.objects.filter(pk=curso.pk).update(valor_inscricao=Decimal('321.00'))
+        Matricula.objects.filter(status='PENDENTE').transicionar_status('PAGO')
+        Matricula.objects.order_by('pk').first().delete()
+        self.assertDerivadosConsistentes()
+        for modelo in ROLLUPS:
+            self.assertFalse(modelo.objects.filter(quantidade__lt=0).exists())
+
+    def test_exclusao_em_massa_subtrai_de_uma_vez(self):
+        aluno = Aluno.objects.annotate(total=Count('matriculas')).filter(total__gt=1).first()
+        tabelas = [connection.ops.quote_name(modelo._meta.db_table) for modelo in ROLLUPS]
+        with CaptureQueriesContext(connection) as consultas:
+            aluno.delete()
+        escritas = [
+            c['sql'] for c in consultas.captured_queries
+            if any(tabela in c['sql'] for tabela in tabelas)
+        ]
+        # um upsert por rollup, sem consultar o curso de cada matrícula
+        self.assertEqual(len(escritas), len(ROLLUPS))
+        Matricula.objects.filter(pk__in=Matricula.objects.order_by('pk').values('pk')[:10]).delete()
+        self.assertDerivadosConsistentes()
+
+    def test_exclusao_de_curso(self):
+        Curso.objects.filter(matriculas__isnull=False).distinct().first().delete()
+        self.assertDerivadosConsistentes()
+        for modelo in ROLLUPS:
+            self.assertFalse(modelo.objects.filter(quantidade__lt=0).exists())
+
+    def test_relatorio_soma_todas_as_matriculas(self):
+        resposta = self.client.get('/api/relatorios/receita/?granularidade=mes')
+        self.assertEqual(resposta.status_code, 200)
+        periodos = resposta.json()['periodos']
+        self.assertEqual(sum(linha['matriculas'] for linha in periodos), Matricula.objects.count())
+
+    def test_recalculo_apaga_as_linhas_com_um_delete(self):
+        curso = Curso.objects.filter(matriculas__isnull=False).distinct().first()
+        tabelas = [connection.ops.quote_name(modelo._meta.db_table) for modelo in ROLLUPS]
+        with CaptureQueriesContext(connection) as consultas:
+            recalcular_receita(curso_ids=[curso.pk])
+        escritas = [
+            c['sql'].split()[0] for c in consultas.captured_queries
+            if any(tabela in c['sql'] for tabela in tabelas)
+        ]
+        # DELETE e INSERT ... SELECT por rollup, sem buscar os ids antes
+        self.assertEqual(escritas, ['DELETE', 'INSERT'] * len(ROLLUPS))
+        self.assertDerivadosConsistentes()
@@ -0,0 +1,66 @@
+"""
+Relatórios SQL servidos das views materializadas (core/relatorios.py).
+Sem PostgreSQL não há view: os testes do caminho materializado trocam
+usa_view_materializada e conferem o SQL e os metadados sem executá-lo.
+"""
+from datetime import timedelta
+from unittest import mock
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.utils import timezone
+
+from .models import AtualizacaoRelatorio, Curso
+from .relatorios import RELATORIOS, atualizar_relatorios, consulta_relatorio
+from .tests import CoreTestCase
+
+
+class RelatoriosMaterializadosTests(CoreTestCase):
+
+    def test_sem_postgres_consulta_ao_vivo(self):
+        dados = self.client.get('/api/cursos-populares-sql/').json()
+        self.assertEqual(dados['fonte'], 'ao_vivo')
+        self.assertEqual(dados['defasagem_segundos'], 0)
+        self.assertEqual(dados['total_cursos'], Curso.objects.count())
+
+    def test_view_materializada_informa_a_defasagem(self):
+        atualizado_em = timezone.now() - timedelta(minutes=2)
+        AtualizacaoRelatorio.objects.create(nome='alunos', atualizado_em=atualizado_em)
+        with mock.patch('core.relatorios.usa_view_materializada', return_value=True):
+            sql, metadados = consulta_relatorio('alunos')
+        self.assertEqual(sql, RELATORIOS['alunos'].sql_materializado())
+        self.assertIn('core_mv_relatorio_alunos', sql)
+        self.assertEqual(metadados['fonte'], 'materializada')
+        self.assertEqual(metadados['gerado_em'], atualizado_em.isoformat())
+        self.assertAlmostEqual(metadados['defasagem_segundos'], 120, delta=2)
+
+    def test_view_nunca_atualizada(self):
+        with mock.patch('core.relatorios.usa_view_materializada', return_value=True):
+            _, metadados = consulta_relatorio('cursos_populares')
+        self.assertIsNone(metadados['gerado_em'])
+        self.assertIsNone(metadados['defasagem_segundos'])
+
+    def test_fresh_ignora_a_view(self):
+        with mock.patch('core.relatorios.usa_view_materializada', return_value=True):
+            sql, metadados = consulta_relatorio('cursos_populares', fresco=True)
+            dados = self.client.get('/api/cursos-populares-sql/?fresh=1').json()
+        self.assertEqual(sql, RELATORIOS['cursos_populares'].sql_ao_vivo())
+        self.assertEqual(metadados['fonte'], 'ao_vivo')
+        self.assertEqual(dados['fonte'], 'ao_vivo')
+        self.assertEqual(dados['total_cursos'], Curso.objects.count())
+
+    def test_atualizar_registra_o_refresh_concorrente(self):
+        with mock.patch('core.relatorios.connection') as conexao:
+            conexao.vendor = 'postgresql'
+            duracoes = atualizar_relatorios(nomes=['cursos_populares'])
+        cursor = conexao.cursor.return_value.__enter__.return_value
+        cursor.execute.assert_called_once_with(
+            'REFRESH MATERIALIZED VIEW CONCURRENTLY core_mv_cursos_populares'
+        )
+        self.assertEqual(list(duracoes), ['cursos_populares'])
+        self.assertTrue(AtualizacaoRelatorio.objects.filter(nome='cursos_populares').exists())
+
+    def test_atualizar_sem_postgres(self):
+        self.assertEqual(atualizar_relatorios(), {})
+        with self.assertRaises(CommandError):
+            call_command('atualizar_relatorios')
@@ -0,0 +1,111 @@
+"""
+Roteamento de leituras para réplicas (core/roteamento.py). Não há réplica
+de verdade nos testes: as rotas são conferidas pelo alias escolhido, e cada
+teste roda num contexto próprio, sem a réplica sorteada nem as escritas
+de testes anteriores.
+"""
+from contextvars import copy_context
+
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from .models import Aluno
+from .roteamento import (
+    COOKIE_FIXACAO, FixacaoPrimarioMiddleware, RoteadorReplicas,
+    _fixar_primario, _houve_escrita, _replica, alias_leitura, ler_do_primario,
+)
+
+REPLICAS = ['replica_1', 'replica_2']
+
+
+@override_settings(REPLICAS=REPLICAS, REPLICA_FIXACAO_SEGUNDOS=5)
+class RoteamentoTests(SimpleTestCase):
+
+    def setUp(self):
+        self.roteador = RoteadorReplicas()
+        self.fabrica = RequestFactory()
+
+    def em_contexto(self, funcao, *args):
+        def sem_estado():
+            # escritas de outros testes nesta thread já marcaram o contexto
+            _fixar_primario.set(False)
+            _houve_escrita.set(False)
+            _replica.set(None)
+            return funcao(*args)
+        return copy_context().run(sem_estado)
+
+    def requisicao(self, requisicao, escrever=False):
+        return self.em_contexto(self.atender, requisicao, escrever)
+
+    def atender(self, requisicao, escrever=False):
+        """(resposta, aliases de leitura vistos pela view)"""
+        vistos = []
+
+        def view(request):
+            vistos.append(self.roteador.db_for_read(Aluno))
+            if escrever:
+                self.roteador.db_for_write(Aluno)
+            vistos.append(self.roteador.db_for_read(Aluno))
+            return HttpResponse()
+
+        return FixacaoPrimarioMiddleware(view)(requisicao), vistos
+
+    def test_leituras_da_requisicao_usam_a_mesma_replica(self):
+        def ler():
+            return {self.roteador.db_for_read(Aluno) for _ in range(20)}
+        lidos = self.em_contexto(ler)
+        self.assertEqual(len(lidos), 1)
+        self.assertIn(lidos.pop(), REPLICAS)
+
+    def test_escrita_fixa_as_leituras_seguintes_no_primario(self):
+        def escrever_e_ler():
+            antes = alias_leitura()
+            escrita = self.roteador.db_for_write(Aluno)
+            return antes, escrita, alias_leitura()
+        antes, escrita, depois = self.em_contexto(escrever_e_ler)
+        self.assertIn(antes, REPLICAS)
+        self.assertEqual((escrita, depois), ('default', 'default'))
+
+    def test_ler_do_primario(self):
+        def ler():
+            with ler_do_primario():
+                return alias_leitura()
+        self.assertEqual(self.em_contexto(ler), 'default')
+
+    def test_replicas_nao_recebem_migrations(self):
+        self.assertFalse(self.roteador.allow_migrate('replica_1', 'core'))
+        self.assertIsNone(self.roteador.allow_migrate('default', 'core'))
+
+    def test_get_le_da_replica_sem_cookie(self):
+        resposta, vistos = self.requisicao(self.fabrica.get('/api/alunos/'))
+        self.assertIn(vistos[0], REPLICAS)
+        self.assertNotIn(COOKIE_FIXACAO, resposta.cookies)
+
+    def test_escrita_grava_o_cookie_de_fixacao(self):
+        resposta, vistos = self.requisicao(self.fabrica.post('/api/alunos/'), escrever=True)
+        # requisições de escrita já leem do primário (validações)
+        self.assertEqual(vistos, ['default', 'default'])
+        cookie = resposta.cookies[COOKIE_FIXACAO]
+        self.assertEqual(cookie.value, '1')
+        self.assertEqual(cookie['max-age'], 5)
+        self.assertTrue(cookie['httponly'])
+
+    def test_get_com_cookie_le_do_primario(self):
+        requisicao = self.fabrica.get('/api/alunos/')
+        requisicao.COOKIES[COOKIE_FIXACAO] = '1'
+        _, vistos = self.requisicao(requisicao)
+        self.assertEqual(vistos, ['default', 'default'])
+
+    def test_estado_nao_vaza_entre_requisicoes(self):
+        def escrita_e_leitura():
+            self.atender(self.fabrica.post('/api/alunos/'), escrever=True)
+            return self.atender(self.fabrica.get('/api/alunos/'))
+        # o mesmo contexto, como numa thread de worker
+        _, vistos = self.em_contexto(escrita_e_leitura)
+        self.assertIn(vistos[0], REPLICAS)
+
+    @override_settings(REPLICAS=[])
+    def test_sem_replicas_tudo_no_primario(self):
+        resposta, vistos = self.requisicao(self.fabrica.post('/api/alunos/'), escrever=True)
+        self.assertEqual(vistos, ['default', 'default'])
+        self.assertNotIn(COOKIE_FIXACAO, resposta.cookies)
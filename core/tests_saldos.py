@@ -0,0 +1,48 @@
+"""
+Livro de saldos por aluno (core/saldos.py).
+"""
+from decimal import Decimal
+from unittest import mock
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from .models import Aluno, Curso, Matricula, SaldoAluno
+from .tests import CoreTestCase
+
+
+class LivroSaldosTests(CoreTestCase):
+
+    def test_escritas_mantem_o_livro(self):
+        aluno, curso = self.par_livre()
+        matricula = Matricula.objects.create(aluno=aluno, curso=curso, status='PENDENTE')
+        matricula.marcar_como_pago()
+        Matricula.objects.filter(aluno=aluno).update(status='PENDENTE')
+        curso.valor_inscricao += Decimal('10.00')
+        curso.save()
+        self.matricula_pendente().delete()
+        self.assertDerivadosConsistentes()
+
+    def test_update_em_varios_lotes(self):
+        with mock.patch('core.models.TAMANHO_LOTE_UPDATE', 7):
+            alteradas = Matricula.objects.filter(status='PENDENTE').update(status='PAGO')
+        self.assertGreater(alteradas, 7)
+        self.assertFalse(Matricula.objects.filter(status='PENDENTE').exists())
+        self.assertDerivadosConsistentes()
+
+    def test_exclusao_em_cascata_recalcula_uma_vez(self):
+        curso = Curso.objects.order_by('pk').first()
+        total = curso.matriculas.count()
+        self.assertGreater(total, 5)
+        with CaptureQueriesContext(connection) as consultas:
+            curso.delete()
+        no_livro = [q for q in consultas if 'core_saldoaluno' in q['sql']]
+        self.assertLess(len(no_livro), 5)
+        self.assertDerivadosConsistentes()
+
+    def test_exclusao_de_aluno(self):
+        aluno = Aluno.objects.filter(matriculas__isnull=False).order_by('pk').first()
+        aluno.delete()
+        self.assertFalse(SaldoAluno.objects.filter(aluno_id=aluno.pk).exists())
+        Matricula.objects.filter(aluno_id__in=Aluno.objects.values('pk')[:5]).delete()
+        self.assertDerivadosConsistentes()
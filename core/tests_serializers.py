@@ -0,0 +1,43 @@
+"""
+Leitura rápida dos serializers (LeituraRapida em core/serializers.py):
+a saída precisa ser idêntica à do serializer.
+"""
+from django.test import override_settings
+
+from .models import Aluno, Curso
+from .pendencias import matriculas_pendentes
+from .serializers import (
+    AlunoSerializer, CursoSerializer, MatriculaPendenteSerializer, MatriculaSerializer,
+)
+from .tests import CoreTestCase
+from .views import matriculas_com_relacionados
+
+
+class LeituraRapidaTests(CoreTestCase):
+
+    def assertMesmaSaida(self, serializer_class, queryset):
+        queryset = queryset.order_by('pk')
+        leitura = serializer_class.leitura_rapida
+        self.assertEqual(
+            leitura.converter(leitura.preparar(queryset)),
+            serializer_class(queryset, many=True).data,
+        )
+
+    def test_alunos(self):
+        self.assertMesmaSaida(AlunoSerializer, Aluno.objects.com_totais())
+
+    def test_cursos(self):
+        # sem as anotações o serializer calcula os totais por curso
+        self.assertMesmaSaida(CursoSerializer, Curso.objects.all())
+
+    def test_matriculas(self):
+        self.assertMesmaSaida(MatriculaSerializer, matriculas_com_relacionados())
+        self.assertMesmaSaida(MatriculaPendenteSerializer, matriculas_pendentes())
+
+    def test_listas_da_api(self):
+        for url in ['/api/alunos/', '/api/cursos/', '/api/matriculas/', '/api/matriculas/pendentes/']:
+            with self.subTest(url=url):
+                with override_settings(LEITURA_RAPIDA=False):
+                    esperado = self.client.get(url).json()
+                with override_settings(LEITURA_RAPIDA=True):
+                    self.assertEqual(self.client.get(url).json(), esperado)
@@ -4,18 +4,25 @@ from .views import (
     AlunoViewSet, 
     CursoViewSet, 
     MatriculaViewSet,
+    JobRelatorioViewSet,
     dashboard_view,
     aluno_lista_view,
     aluno_historico_view,
     relatorio_sql_raw,
-    cursos_populares_sql_raw
+    cursos_populares_sql_raw,
+    relatorio_receita,
+    relatorio_pendencias,
+    cache_estatisticas,
+    metricas_view
 )
+from . import views_async
 
 # Router do DRF - cria URLs 
 router = DefaultRouter()
 router.register(r'alunos', AlunoViewSet, basename='aluno')
 router.register(r'cursos', CursoViewSet, basename='curso')
 router.register(r'matriculas', MatriculaViewSet, basename='matricula')
+router.register(r'relatorios/jobs', JobRelatorioViewSet, basename='job-relatorio')
 
 urlpatterns = [
     # rota api
@@ -24,6 +31,23 @@ urlpatterns = [
     # api sql
     path('api/relatorio-sql/', relatorio_sql_raw, name='relatorio_sql_raw'),
     path('api/cursos-populares-sql/', cursos_populares_sql_raw, name='cursos_populares_sql'),
+    path('api/relatorios/receita/', relatorio_receita, name='relatorio_receita'),
+    path('api/relatorios/pendencias/', relatorio_pendencias, name='relatorio_pendencias'),
+    path('api/cache/estatisticas/', cache_estatisticas, name='cache_estatisticas'),
+    path('api/_metrics', metricas_view, name='metricas'),
+    
+    # leitura assíncrona (ASGI), mesmas respostas das rotas acima
+    path('api/async/alunos/', views_async.alunos_lista_async, name='alunos_lista_async'),
+    path('api/async/alunos/<int:pk>/', views_async.aluno_detalhe_async, name='aluno_detalhe_async'),
+    path('api/async/alunos/<int:pk>/financeiro/', views_async.aluno_financeiro_async, name='aluno_financeiro_async'),
+    path('api/async/matriculas/', views_async.matriculas_lista_async, name='matriculas_lista_async'),
+    path('api/async/matriculas/<int:pk>/', views_async.matricula_detalhe_async, name='matricula_detalhe_async'),
+    path('api/async/cursos/', views_async.cursos_lista_async, name='cursos_lista_async'),
+    path('api/async/cursos/<int:pk>/', views_async.curso_detalhe_async, name='curso_detalhe_async'),
+    path('api/async/cursos/<int:pk>/estatisticas/', views_async.curso_estatisticas_async, name='curso_estatisticas_async'),
+    path('api/async/relatorio-sql/', views_async.relatorio_sql_async, name='relatorio_sql_async'),
+    path('api/async/cursos-populares-sql/', views_async.cursos_populares_sql_async, name='cursos_populares_sql_async'),
+    path('async/', views_async.dashboard_async, name='dashboard_async'),
     
     # Templates HTML
     path('', dashboard_view, name='dashboard'),
@@ -0,0 +1,30 @@
+"""
+Validações de dados de cadastro compartilhadas.
+"""
+import operator
+
+
+PESOS_CPF = (10, 9, 8, 7, 6, 5, 4, 3, 2)
+
+
+def digitos_verificadores_cpf(base):
+    """calcula os dois dígitos verificadores para os 9 primeiros dígitos do CPF"""
+    digitos = list(map(int, base))
+    soma = sum(map(operator.mul, digitos, PESOS_CPF))
+    primeiro = soma * 10 % 11 % 10
+    # o segundo dígito usa pesos 11..2: os mesmos somados aos dígitos, mais o primeiro
+    soma = soma + sum(digitos) + primeiro * 2
+    segundo = soma * 10 % 11 % 10
+    return f'{primeiro}{segundo}'
+
+
+def normalizar_cpf(valor):
+    """apenas os dígitos ('123.456.789-09' -> '12345678909')"""
+    return ''.join(filter(str.isdigit, valor or ''))
+
+
+def cpf_valido(cpf):
+    """CPF normalizado com 11 dígitos, não repetidos e dígitos verificadores corretos"""
+    if len(cpf) != 11 or cpf == cpf[0] * 11:
+        return False
+    return cpf[9:] == digitos_verificadores_cpf(cpf[:9])
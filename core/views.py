@@ -1,17 +1,117 @@
-from rest_framework import viewsets, status
+from urllib.parse import urlencode
+
+from rest_framework import mixins, viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
-from django.db.models import Sum, Count, Q
-from .models import Aluno, Curso, Matricula
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.http import FileResponse, Http404
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.dateparse import parse_date
+from django.utils.decorators import method_decorator
+from .busca import buscar_por_relevancia, filtrar_por_nome
+from .cache import estatisticas as estatisticas_cache, obter_ou_calcular, obter_ou_calcular_aluno
+from .condicional import get_condicional
+from .estatisticas import estatisticas_aluno, estatisticas_curso, estatisticas_gerais, historico_aluno
+from .jobs import caminho_arquivo, enfileirar
+from .models import Aluno, Curso, JobRelatorio, Matricula
+from .pendencias import NOMES_FAIXAS, filtro_faixa, matriculas_pendentes, resumo_pendencias
+from .lotes import criar_matriculas_em_lote
 from .serializers import (
     AlunoSerializer,
     CursoSerializer,
+    JobRelatorioCreateSerializer,
+    JobRelatorioSerializer,
     MatriculaSerializer,
-    MatriculaCreateSerializer
+    MatriculaCreateSerializer,
+    MatriculaLoteSerializer,
+    MatriculaPendenteSerializer,
+    MatriculaTransicaoSerializer
 )
 
 
-class AlunoViewSet(viewsets.ModelViewSet):
+class ListaRapidaMixin:
+    """
+    list() pela leitura rápida do serializer (LeituraRapida em
+    serializers.py): values_list + conversão por coluna, mesma saída.
+    Ligado com LEITURA_RAPIDA=1 no ambiente.
+    """
+    def list(self, request, *args, **kwargs):
+        return self.listar(self.filter_queryset(self.get_queryset()), self.get_serializer_class())
+
+    def listar(self, queryset, serializer_class):
+        """resposta paginada de `queryset` (também usada nas ações aninhadas)"""
+        leitura = getattr(serializer_class, 'leitura_rapida', None)
+        if leitura is not None and settings.LEITURA_RAPIDA:
+            queryset = leitura.preparar(queryset)
+            serializar = leitura.converter
+        else:
+            if leitura is not None:
+                queryset = leitura.anotar(queryset)
+
+            def serializar(objetos):
+                return serializer_class(
+                    objetos, many=True, context=self.get_serializer_context()
+                ).data
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(serializar(page))
+        return Response(serializar(queryset))
+
+
+def filtrar_matriculas(queryset, params):
+    """
+    Filtros comuns das listas de matrículas:
+    ?status=PAGO&data_inicio=2024-01-01&data_fim=2024-12-31
+    """
+    status_param = params.get('status', None)
+    if status_param:
+        queryset = queryset.filter(status=status_param.upper())
+
+    for param, lookup in (('data_inicio', 'gte'), ('data_fim', 'lte')):
+        data = data_do_parametro(params, param)
+        if data is not None:
+            queryset = queryset.filter(**{f'data_matricula__{lookup}': data})
+
+    return queryset
+
+
+def data_do_parametro(params, param):
+    """data AAAA-MM-DD de um parâmetro da query string, ou None se ausente"""
+    valor = params.get(param, None)
+    if not valor:
+        return None
+    try:
+        data = parse_date(valor)
+    except ValueError:
+        data = None
+    if data is None:
+        raise ValidationError({param: 'Data inválida; use o formato AAAA-MM-DD.'})
+    return data
+
+
+def id_do_parametro(params, param):
+    """id inteiro de um parâmetro da query string, ou None se ausente"""
+    valor = params.get(param, None)
+    if not valor:
+        return None
+    if not valor.isdigit():
+        raise ValidationError({param: 'Id inválido.'})
+    return int(valor)
+
+
+def matriculas_com_relacionados():
+    # o MatriculaSerializer lê aluno.nome, curso.nome e curso.valor_inscricao
+    return Matricula.objects.select_related('aluno', 'curso')
+
+
+# GET condicional (ETag/Last-Modified) nas leituras: core/condicional.py
+@method_decorator(get_condicional(), name='list')
+@method_decorator(get_condicional(), name='retrieve')
+class AlunoViewSet(ListaRapidaMixin, viewsets.ModelViewSet):
     """
     ViewSet para gerenciar Alunos.
     
@@ -24,19 +124,25 @@ class AlunoViewSet(viewsets.ModelViewSet):
     - DELETE /api/alunos/{id}/ (deletar)
     """
     queryset = Aluno.objects.all()
+    lookup_value_regex = r'\d+'
     serializer_class = AlunoSerializer
 
     def get_queryset(self):
         """
         Permite filtrar alunos pela URL.
-        Ex: /api/alunos/?nome=João
+        Ex: /api/alunos/?nome=João ou /api/alunos/?q=joao silva
         """
-        queryset = Aluno.objects.all()
+        queryset = Aluno.objects.com_totais()
         
-        # Filtro por nome (case-insensitive)
+        # Filtro por nome (sem diferenciar maiúsculas nem acentos)
         nome = self.request.query_params.get('nome', None)
         if nome:
-            queryset = queryset.filter(nome__icontains=nome)
+            queryset = filtrar_por_nome(queryset, 'nome', nome)
+        
+        # Busca ranqueada por similaridade: /api/alunos/?q=joao silva
+        termo = self.request.query_params.get('q', None)
+        if termo:
+            queryset = buscar_por_relevancia(queryset, 'nome', termo)
         
         # Filtro por CPF
         cpf = self.request.query_params.get('cpf', None)
@@ -46,87 +152,48 @@ class AlunoViewSet(viewsets.ModelViewSet):
         return queryset
 
     @action(detail=True, methods=['get'])
+    @method_decorator(get_condicional())
     def matriculas(self, request, pk=None):
         """
         Endpoint customizado: GET /api/alunos/{id}/matriculas/
-        Retorna todas as matrículas de um aluno específico.
+        Retorna as matrículas de um aluno específico, paginadas.
+        Aceita ?status=, ?data_inicio=, ?data_fim= e ?paginacao=keyset.
         """
-        aluno = self.get_object()
-        matriculas = aluno.matriculas.all()
-        serializer = MatriculaSerializer(matriculas, many=True)
-        return Response(serializer.data)
+        # sem self.get_object(): ?status= aqui filtra as matrículas, não o aluno
+        aluno = get_object_or_404(Aluno.objects.only('pk'), pk=pk)
+        matriculas = filtrar_matriculas(
+            matriculas_com_relacionados().filter(aluno=aluno), request.query_params
+        )
+        return self.listar(matriculas, MatriculaSerializer)
 
     @action(detail=True, methods=['get'])
+    @method_decorator(get_condicional())
     def financeiro(self, request, pk=None):
         """
         Endpoint customizado: GET /api/alunos/{id}/financeiro/
         Retorna resumo financeiro do aluno.
         """
-        aluno = self.get_object()
-        data = {
-            'aluno_id': aluno.id,
-            'aluno_nome': aluno.nome,
-            'total_devido': float(aluno.total_devido()),
-            'total_pago': float(aluno.total_pago()),
-            'total_geral': float(aluno.total_devido() + aluno.total_pago()),
-            'total_matriculas': aluno.matriculas.count(),
-            'matriculas_pagas': aluno.matriculas.filter(status='PAGO').count(),
-            'matriculas_pendentes': aluno.matriculas.filter(status='PENDENTE').count(),
-        }
+        data = estatisticas_aluno(pk)
+        if data is None:
+            raise Http404
+        for campo in ('total_devido', 'total_pago', 'total_geral'):
+            data[campo] = float(data[campo])
         return Response(data)
 
 
 # Views para Templates HTML
-from django.shortcuts import render, get_object_or_404
-from django.db.models import Sum, Count
+from django.shortcuts import render
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
 
 
 def dashboard_view(request):
     """
     View para o dashboard principal.
     Renderiza o template com estatísticas gerais.
+    Os números vêm do cache versionado (core/cache.py).
     """
-    # Contadores básicos
-    total_alunos = Aluno.objects.count()
-    cursos_ativos = Curso.objects.filter(status='ATIVO').count()
-    total_matriculas = Matricula.objects.count()
-    matriculas_pagas = Matricula.objects.filter(status='PAGO').count()
-    matriculas_pendentes = Matricula.objects.filter(status='PENDENTE').count()
-    
-    # Cálculos financeiros
-    total_pago = Matricula.objects.filter(
-        status='PAGO'
-    ).aggregate(total=Sum('curso__valor_inscricao'))['total'] or 0
-    
-    total_pendente = Matricula.objects.filter(
-        status='PENDENTE'
-    ).aggregate(total=Sum('curso__valor_inscricao'))['total'] or 0
-    
-    total_geral = total_pago + total_pendente
-    
-    # Percentuais
-    percentual_pagas = (matriculas_pagas / total_matriculas * 100) if total_matriculas > 0 else 0
-    percentual_pendentes = (matriculas_pendentes / total_matriculas * 100) if total_matriculas > 0 else 0
-    
-    # Cursos mais populares (com count de matrículas)
-    cursos_populares = Curso.objects.annotate(
-        total_matriculas=Count('matriculas')
-    ).order_by('-total_matriculas')[:5]
-    
-    context = {
-        'total_alunos': total_alunos,
-        'cursos_ativos': cursos_ativos,
-        'total_matriculas': total_matriculas,
-        'matriculas_pagas': matriculas_pagas,
-        'matriculas_pendentes': matriculas_pendentes,
-        'total_pago': total_pago,
-        'total_pendente': total_pendente,
-        'total_geral': total_geral,
-        'percentual_pagas': percentual_pagas,
-        'percentual_pendentes': percentual_pendentes,
-        'cursos_populares': cursos_populares,
-    }
-    
+    context = obter_ou_calcular('estatisticas_gerais', estatisticas_gerais)
     return render(request, 'core/dashboard.html', context)
 
 
@@ -134,74 +201,91 @@ def aluno_lista_view(request):
     """
     View para listar todos os alunos.
     """
-    alunos = Aluno.objects.all()
+    alunos = Aluno.objects.com_totais()
     context = {'alunos': alunos}
     return render(request, 'core/aluno_lista.html', context)
 
 
+def _renderizar_historico(pk):
+    historico = historico_aluno(pk)
+    if historico is None:
+        return None
+    return {
+        'aluno_nome': historico['aluno']['nome'],
+        'fragmento': render_to_string('core/aluno_historico_fragmento.html', historico),
+    }
+
+
 def aluno_historico_view(request, pk):
     """
     View para exibir histórico de um aluno específico.
+    Matrículas e totais saem de uma consulta (historico_aluno), e o
+    fragmento renderizado fica em cache até as matrículas ou os dados do
+    aluno mudarem.
     """
-    aluno = get_object_or_404(Aluno, pk=pk)
-    matriculas = aluno.matriculas.all()
-    
-    total_pago = aluno.total_pago()
-    total_devido = aluno.total_devido()
-    total_geral = total_pago + total_devido
-    
-    context = {
-        'aluno': aluno,
-        'matriculas': matriculas,
-        'total_pago': total_pago,
-        'total_devido': total_devido,
-        'total_geral': total_geral,
-    }
+    context = obter_ou_calcular_aluno('historico', pk, lambda: _renderizar_historico(pk))
+    if context is None:
+        raise Http404
     
-    return render(request, 'core/aluno_historico.html', context)
+    return render(request, 'core/aluno_historico.html', {
+        'aluno_nome': context['aluno_nome'],
+        'fragmento': mark_safe(context['fragmento']),
+    })
 
 
 # ============================================
 # ENDPOINT COM SQL RAW (OBRIGATÓRIO DESAFIO)
 # ============================================
-from django.db import connection
-from rest_framework.decorators import api_view
+from django.db import connections
+from rest_framework.decorators import api_view, renderer_classes
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from .condicional import aplicar_validadores, nao_modificado, validadores_relatorio
+from .exportacao import FORMATOS_STREAMING, resposta_streaming
+from .receita import GRANULARIDADES, receita_por_periodo
+from .relatorios import consulta_relatorio
+from .roteamento import alias_leitura
+from .renderers import CSVRenderer, NDJSONRenderer
+
+# JSON/navegável como antes, mais NDJSON e CSV em streaming
+RENDERERS_RELATORIO = api_settings.DEFAULT_RENDERER_CLASSES + [NDJSONRenderer, CSVRenderer]
 
 
 @api_view(['GET'])
+@renderer_classes(RENDERERS_RELATORIO)
 def relatorio_sql_raw(request):
     """
-    Endpoint que usa SQL RAW com JOIN e agregações.
+    Endpoint que usa SQL RAW com JOIN.
     GET /api/relatorio-sql/
     
     Retorna relatório financeiro completo de todos os alunos
-    usando consulta SQL pura com JOINS e agregações (SUM, COUNT, etc).
-    """
+    usando consulta SQL pura com JOIN no livro de saldos (core_saldoaluno),
+    que já guarda os totais agregados de cada aluno.
+    
+    Com ?format=ndjson ou ?format=csv (ou Accept equivalente) a resposta
+    é enviada em streaming, lida do banco em lotes.
     
-    # SQL puro com JOIN e agregações
-    sql_query = """
-        SELECT 
-            a.id as aluno_id,
-            a.nome as aluno_nome,
-            a.email as aluno_email,
-            a.cpf as aluno_cpf,
-            a.data_ingresso,
-            COUNT(m.id) as total_matriculas,
-            COUNT(CASE WHEN m.status = 'PAGO' THEN 1 END) as matriculas_pagas,
-            COUNT(CASE WHEN m.status = 'PENDENTE' THEN 1 END) as matriculas_pendentes,
-            COALESCE(SUM(CASE WHEN m.status = 'PAGO' THEN c.valor_inscricao ELSE 0 END), 0) as total_pago,
-            COALESCE(SUM(CASE WHEN m.status = 'PENDENTE' THEN c.valor_inscricao ELSE 0 END), 0) as total_devido,
-            COALESCE(SUM(c.valor_inscricao), 0) as total_geral
-        FROM core_aluno a
-        LEFT JOIN core_matricula m ON a.id = m.aluno_id
-        LEFT JOIN core_curso c ON m.curso_id = c.id
-        GROUP BY a.id, a.nome, a.email, a.cpf, a.data_ingresso
-        ORDER BY total_geral DESC
+    Servido da view materializada (ver core/relatorios.py); ?fresh=1
+    roda a consulta ao vivo. Responde 304 a If-None-Match/If-Modified-Since
+    enquanto o relatório não mudar (core/condicional.py).
     """
     
+    fresco = request.query_params.get('fresh') == '1'
+    sql_query, metadados = consulta_relatorio('alunos', fresco=fresco)
+    etag, alterado_em = validadores_relatorio(request, metadados)
+    resposta = nao_modificado(request, etag, alterado_em)
+    if resposta is not None:
+        return resposta
+    
+    formato = request.accepted_renderer.format
+    if formato in FORMATOS_STREAMING:
+        # exportação em streaming: ?format=ndjson|csv ou header Accept
+        resposta = resposta_streaming(sql_query, formato, 'relatorio_alunos')
+        return aplicar_validadores(resposta, etag, alterado_em)
+    
     # Executar SQL raw usando cursor
-    with connection.cursor() as cursor:
+    # réplica de leitura, se houver (core/roteamento.py)
+    with connections[alias_leitura()].cursor() as cursor:
         cursor.execute(sql_query)
         columns = [col[0] for col in cursor.description]
         results = [
@@ -209,47 +293,42 @@ def relatorio_sql_raw(request):
             for row in cursor.fetchall()
         ]
     
-    # Converter Decimal para float para JSON
-    for result in results:
-        result['total_pago'] = float(result['total_pago'])
-        result['total_devido'] = float(result['total_devido'])
-        result['total_geral'] = float(result['total_geral'])
-        result['data_ingresso'] = result['data_ingresso'].strftime('%Y-%m-%d') if result['data_ingresso'] else None
+    # Decimal vira float e datas viram ISO no próprio renderer JSON
+    # (JSONRapidoRenderer), sem passar linha a linha aqui
     
-    return Response({
-        'mensagem': 'Relatório gerado usando SQL RAW com JOIN e agregações',
+    return aplicar_validadores(Response({
+        'mensagem': 'Relatório gerado usando SQL RAW com JOIN no livro de saldos',
+        **metadados,
         'total_alunos': len(results),
         'alunos': results
-    })
+    }), etag, alterado_em)
 
 
 @api_view(['GET'])
+@renderer_classes(RENDERERS_RELATORIO)
 def cursos_populares_sql_raw(request):
     """
     Endpoint alternativo com SQL RAW.
     GET /api/cursos-populares-sql/
     
     Lista cursos mais populares usando SQL puro.
+    Também aceita ?format=ndjson|csv em streaming, ?fresh=1 e GET
+    condicional.
     """
     
-    sql_query = """
-        SELECT 
-            c.id as curso_id,
-            c.nome as curso_nome,
-            c.carga_horaria,
-            c.valor_inscricao,
-            c.status,
-            COUNT(m.id) as total_matriculas,
-            COUNT(CASE WHEN m.status = 'PAGO' THEN 1 END) as matriculas_pagas,
-            COUNT(CASE WHEN m.status = 'PENDENTE' THEN 1 END) as matriculas_pendentes,
-            COALESCE(SUM(CASE WHEN m.status = 'PAGO' THEN c.valor_inscricao ELSE 0 END), 0) as total_arrecadado
-        FROM core_curso c
-        LEFT JOIN core_matricula m ON c.id = m.curso_id
-        GROUP BY c.id, c.nome, c.carga_horaria, c.valor_inscricao, c.status
-        ORDER BY total_matriculas DESC
-    """
+    fresco = request.query_params.get('fresh') == '1'
+    sql_query, metadados = consulta_relatorio('cursos_populares', fresco=fresco)
+    etag, alterado_em = validadores_relatorio(request, metadados)
+    resposta = nao_modificado(request, etag, alterado_em)
+    if resposta is not None:
+        return resposta
+    
+    formato = request.accepted_renderer.format
+    if formato in FORMATOS_STREAMING:
+        resposta = resposta_streaming(sql_query, formato, 'cursos_populares')
+        return aplicar_validadores(resposta, etag, alterado_em)
     
-    with connection.cursor() as cursor:
+    with connections[alias_leitura()].cursor() as cursor:
         cursor.execute(sql_query)
         columns = [col[0] for col in cursor.description]
         results = [
@@ -257,23 +336,22 @@ def cursos_populares_sql_raw(request):
             for row in cursor.fetchall()
         ]
     
-    # Converter Decimal para float
-    for result in results:
-        result['valor_inscricao'] = float(result['valor_inscricao'])
-        result['total_arrecadado'] = float(result['total_arrecadado'])
-    
-    return Response({
+    return aplicar_validadores(Response({
         'mensagem': 'Cursos populares usando SQL RAW',
+        **metadados,
         'total_cursos': len(results),
         'cursos': results
-    })
+    }), etag, alterado_em)
 
 
-class CursoViewSet(viewsets.ModelViewSet):
+@method_decorator(get_condicional(), name='list')
+@method_decorator(get_condicional(), name='retrieve')
+class CursoViewSet(ListaRapidaMixin, viewsets.ModelViewSet):
     """
     ViewSet para gerenciar Cursos.
     """
     queryset = Curso.objects.all()
+    lookup_value_regex = r'\d+'
     serializer_class = CursoSerializer
 
     def get_queryset(self):
@@ -288,74 +366,87 @@ class CursoViewSet(viewsets.ModelViewSet):
         if status_param:
             queryset = queryset.filter(status=status_param.upper())
         
-        # Filtro por nome
+        # Filtro por nome (sem diferenciar maiúsculas nem acentos)
         nome = self.request.query_params.get('nome', None)
         if nome:
-            queryset = queryset.filter(nome__icontains=nome)
+            queryset = filtrar_por_nome(queryset, 'nome', nome)
+        
+        # Busca ranqueada por similaridade: /api/cursos/?q=pyton
+        termo = self.request.query_params.get('q', None)
+        if termo:
+            queryset = buscar_por_relevancia(queryset, 'nome', termo)
         
         return queryset
 
     @action(detail=True, methods=['get'])
+    @method_decorator(get_condicional())
     def matriculas(self, request, pk=None):
         """
         Endpoint customizado: GET /api/cursos/{id}/matriculas/
-        Retorna todas as matrículas de um curso.
+        Retorna as matrículas de um curso, paginadas (mesmos filtros de
+        /api/alunos/{id}/matriculas/).
         """
-        curso = self.get_object()
-        matriculas = curso.matriculas.all()
-        serializer = MatriculaSerializer(matriculas, many=True)
-        return Response(serializer.data)
+        # ?status= filtra as matrículas, não o curso (ver get_queryset)
+        curso = get_object_or_404(Curso.objects.only('pk'), pk=pk)
+        matriculas = filtrar_matriculas(
+            matriculas_com_relacionados().filter(curso=curso), request.query_params
+        )
+        return self.listar(matriculas, MatriculaSerializer)
 
     @action(detail=True, methods=['get'])
+    @method_decorator(get_condicional())
     def estatisticas(self, request, pk=None):
         """
         Endpoint customizado: GET /api/cursos/{id}/estatisticas/
         Retorna estatísticas do curso.
         """
-        curso = self.get_object()
-        data = {
-            'curso_id': curso.id,
-            'curso_nome': curso.nome,
-            'carga_horaria': curso.carga_horaria,
-            'valor_inscricao': float(curso.valor_inscricao),
-            'status': curso.status,
-            'total_matriculas': curso.matriculas.count(),
-            'matriculas_pagas': curso.matriculas.filter(status='PAGO').count(),
-            'matriculas_pendentes': curso.matriculas.filter(status='PENDENTE').count(),
-            'total_arrecadado': float(curso.total_arrecadado()),
-            'potencial_arrecadacao': float(
-                curso.valor_inscricao * curso.matriculas.filter(status='PENDENTE').count()
-            ),
-        }
+        data = estatisticas_curso(pk)
+        if data is None:
+            raise Http404
+        for campo in ('valor_inscricao', 'total_arrecadado', 'potencial_arrecadacao'):
+            data[campo] = float(data[campo])
         return Response(data)
 
 
-class MatriculaViewSet(viewsets.ModelViewSet):
+@method_decorator(get_condicional(), name='list')
+@method_decorator(get_condicional(), name='retrieve')
+class MatriculaViewSet(ListaRapidaMixin, viewsets.ModelViewSet):
     """
     ViewSet para gerenciar Matrículas.
     """
     queryset = Matricula.objects.all()
+    lookup_value_regex = r'\d+'
     serializer_class = MatriculaSerializer
 
+    # ações que gravam a matrícula carregada: a linha é lida com
+    # SELECT ... FOR UPDATE dentro da transação, então o status guardado
+    # no post_init (base dos deltas do livro de saldos e dos rollups) é o
+    # atual mesmo com duas requisições simultâneas
+    ACOES_COM_TRAVA = {'marcar_pago', 'marcar_pendente', 'update', 'partial_update', 'destroy'}
+    # ids devolvidos por transicao-status
+    LIMITE_IDS_TRANSICAO = 1000
+
     def get_serializer_class(self):
         """
         Usa serializers diferentes para criar vs. listar.
         """
         if self.action == 'create':
             return MatriculaCreateSerializer
+        if self.action == 'bulk':
+            return MatriculaLoteSerializer
+        if self.action == 'transicao_status':
+            return MatriculaTransicaoSerializer
         return MatriculaSerializer
 
     def get_queryset(self):
         """
         Permite filtrar matrículas.
-        Ex: /api/matriculas/?status=PAGO&aluno=1
+        Ex: /api/matriculas/?status=PAGO&aluno=1&data_inicio=2024-01-01
         """
-        queryset = Matricula.objects.all()
+        queryset = matriculas_com_relacionados()
         
-        # Filtro por status
-        status_param = self.request.query_params.get('status', None)
-        if status_param:
-            queryset = queryset.filter(status=status_param.upper())
+        # Filtros por status e período
+        queryset = filtrar_matriculas(queryset, self.request.query_params)
         
         # Filtro por aluno
         aluno_id = self.request.query_params.get('aluno', None)
@@ -366,10 +457,22 @@ class MatriculaViewSet(viewsets.ModelViewSet):
         curso_id = self.request.query_params.get('curso', None)
         if curso_id:
             queryset = queryset.filter(curso_id=curso_id)
+
+        if self.action in self.ACOES_COM_TRAVA:
+            queryset = queryset.select_for_update(of=('self',))
         
         return queryset
 
+    @transaction.atomic
+    def update(self, request, *args, **kwargs):
+        return super().update(request, *args, **kwargs)
+
+    @transaction.atomic
+    def destroy(self, request, *args, **kwargs):
+        return super().destroy(request, *args, **kwargs)
+
     @action(detail=True, methods=['post'])
+    @transaction.atomic
     def marcar_pago(self, request, pk=None):
         """
         Endpoint customizado: POST /api/matriculas/{id}/marcar_pago/
@@ -381,6 +484,7 @@ class MatriculaViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
     @action(detail=True, methods=['post'])
+    @transaction.atomic
     def marcar_pendente(self, request, pk=None):
         """
         Endpoint customizado: POST /api/matriculas/{id}/marcar_pendente/
@@ -388,45 +492,257 @@ class MatriculaViewSet(viewsets.ModelViewSet):
         """
         matricula = self.get_object()
         matricula.status = 'PENDENTE'
-        matricula.save()
+        matricula.save(update_fields=['status', 'updated_at'])
         serializer = self.get_serializer(matricula)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Endpoint customizado: POST /api/matriculas/bulk/
+        Cria matrículas em lote.
+        
+        Corpo: {"modo": "parcial" | "tudo_ou_nada",
+                "itens": [{"aluno": 1, "curso": 2, "status": "PENDENTE"}, ...]}
+        
+        Duplicidade e curso inativo são verificados para o lote inteiro
+        com poucas consultas, e a gravação usa bulk_create. A resposta lista
+        os itens aceitos e os rejeitados com os motivos.
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        modo = serializer.validated_data['modo']
+        resultado = criar_matriculas_em_lote(
+            serializer.validated_data['itens'],
+            tudo_ou_nada=(modo == 'tudo_ou_nada'),
+        )
+        data = {
+            'modo': modo,
+            'total_itens': len(serializer.validated_data['itens']),
+            'total_aceitos': len(resultado['aceitos']),
+            'total_rejeitados': len(resultado['rejeitados']),
+            'aceitos': resultado['aceitos'],
+            'rejeitados': resultado['rejeitados'],
+        }
+        if resultado['gravado']:
+            return Response(data, status=status.HTTP_201_CREATED)
+        return Response(data, status=status.HTTP_400_BAD_REQUEST)
+
+    @action(detail=False, methods=['post'], url_path='transicao-status')
+    def transicao_status(self, request):
+        """
+        Endpoint customizado: POST /api/matriculas/transicao-status/
+        Muda o status de pagamento de várias matrículas de uma vez.
+        
+        Corpo: {"status": "PAGO" | "PENDENTE", "ids": [1, 2, ...]}
+        ou filtros: {"status": "PAGO", "aluno": 1, "curso": 2,
+                     "data_inicio": "2024-01-01", "data_fim": "2024-12-31"}
+        
+        Um único UPDATE condicional (apenas linhas com outro status) com
+        RETURNING; o livro de saldos e o cache são atualizados na mesma
+        transação. A resposta traz o total e no máximo
+        LIMITE_IDS_TRANSICAO ids (ids_truncados indica se há mais).
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        dados = serializer.validated_data
+
+        queryset = Matricula.objects.all()
+        if 'ids' in dados:
+            queryset = queryset.filter(pk__in=dados['ids'])
+        if 'aluno' in dados:
+            queryset = queryset.filter(aluno_id=dados['aluno'])
+        if 'curso' in dados:
+            queryset = queryset.filter(curso_id=dados['curso'])
+        if 'data_inicio' in dados:
+            queryset = queryset.filter(data_matricula__gte=dados['data_inicio'])
+        if 'data_fim' in dados:
+            queryset = queryset.filter(data_matricula__lte=dados['data_fim'])
+
+        alteradas = queryset.transicionar_status(dados['status'])
+        return Response({
+            'status': dados['status'],
+            'total_alteradas': len(alteradas),
+            # só os primeiros ids: a transição pode alterar centenas de milhares
+            'ids': [pk for pk, *_ in alteradas[:self.LIMITE_IDS_TRANSICAO]],
+            'ids_truncados': len(alteradas) > self.LIMITE_IDS_TRANSICAO,
+        })
+
+    @action(detail=False, methods=['get'])
+    def pendentes(self, request):
+        """
+        Endpoint customizado: GET /api/matriculas/pendentes/?faixa=31-60&curso=1
+        Matrículas pendentes da mais antiga para a mais nova, para a
+        cobrança (detalhe de /api/relatorios/pendencias/). Aceita
+        ?paginacao=keyset, que percorre o índice parcial das pendentes.
+        Sem GET condicional: os dias pendentes mudam a cada dia.
+        """
+        params = request.query_params
+        queryset = matriculas_pendentes(id_do_parametro(params, 'curso'))
+        faixa = params.get('faixa', None)
+        if faixa:
+            if faixa not in NOMES_FAIXAS:
+                raise ValidationError({'faixa': f"Use uma de: {', '.join(NOMES_FAIXAS)}."})
+            queryset = queryset.filter(filtro_faixa(faixa))
+        queryset = queryset.select_related('aluno', 'curso').order_by('data_matricula', 'id')
+        return self.listar(queryset, MatriculaPendenteSerializer)
+
     @action(detail=False, methods=['get'])
+    @method_decorator(get_condicional())
     def resumo_financeiro(self, request):
         """
         Endpoint customizado: GET /api/matriculas/resumo_financeiro/
         Retorna resumo financeiro geral de todas as matrículas.
         """
-        # Agregações usando ORM do Django
-        total_matriculas = Matricula.objects.count()
-        matriculas_pagas = Matricula.objects.filter(status='PAGO').count()
-        matriculas_pendentes = Matricula.objects.filter(status='PENDENTE').count()
-        
-        # Soma total pago
-        total_pago = Matricula.objects.filter(
-            status='PAGO'
-        ).aggregate(
-            total=Sum('curso__valor_inscricao')
-        )['total'] or 0
-        
-        # Soma total pendente
-        total_pendente = Matricula.objects.filter(
-            status='PENDENTE'
-        ).aggregate(
-            total=Sum('curso__valor_inscricao')
-        )['total'] or 0
-        
+        # mesma entrada de cache usada pelo dashboard
+        gerais = obter_ou_calcular('estatisticas_gerais', estatisticas_gerais)
         data = {
-            'total_matriculas': total_matriculas,
-            'matriculas_pagas': matriculas_pagas,
-            'matriculas_pendentes': matriculas_pendentes,
-            'percentual_pagas': round(
-                (matriculas_pagas / total_matriculas * 100) if total_matriculas > 0 else 0, 
-                2
-            ),
-            'total_pago': float(total_pago),
-            'total_pendente': float(total_pendente),
-            'total_geral': float(total_pago + total_pendente),
+            'total_matriculas': gerais['total_matriculas'],
+            'matriculas_pagas': gerais['matriculas_pagas'],
+            'matriculas_pendentes': gerais['matriculas_pendentes'],
+            'percentual_pagas': round(gerais['percentual_pagas'], 2),
+            'total_pago': float(gerais['total_pago']),
+            'total_pendente': float(gerais['total_pendente']),
+            'total_geral': float(gerais['total_geral']),
         }
-        return Response(data)
\ No newline at end of file
+        return Response(data)
+
+
+@api_view(['GET'])
+@get_condicional(depende_de=(Curso, Matricula))
+def relatorio_receita(request):
+    """
+    GET /api/relatorios/receita/?granularidade=dia|mes&inicio=&fim=&curso=
+    
+    Matrículas e valores pagos/pendentes por dia ou por mês, lidos dos
+    rollups de receita (core/receita.py) em vez de core_matricula.
+    """
+    params = request.query_params
+    granularidade = params.get('granularidade', 'dia')
+    if granularidade not in GRANULARIDADES:
+        raise ValidationError({'granularidade': 'Use dia ou mes.'})
+    inicio = data_do_parametro(params, 'inicio')
+    fim = data_do_parametro(params, 'fim')
+    if inicio and fim and inicio > fim:
+        raise ValidationError({'inicio': 'Deve ser anterior a fim.'})
+    curso_id = id_do_parametro(params, 'curso')
+
+    periodos = receita_por_periodo(granularidade, inicio, fim, curso_id)
+    return Response({
+        'granularidade': granularidade,
+        'inicio': inicio,
+        'fim': fim,
+        'curso': curso_id,
+        'total_periodos': len(periodos),
+        'periodos': periodos,
+    })
+
+
+@api_view(['GET'])
+def relatorio_pendencias(request):
+    """
+    GET /api/relatorios/pendencias/?curso=
+    
+    Matrículas pendentes por tempo desde a matrícula (0-30, 31-60, 61-90
+    e 90+ dias), com quantidade e valor de cada faixa e o link para as
+    matrículas da faixa (/api/matriculas/pendentes/?faixa=...).
+    """
+    curso_id = id_do_parametro(request.query_params, 'curso')
+    resumo = resumo_pendencias(curso_id)
+    url = request.build_absolute_uri(reverse('matricula-pendentes'))
+    for faixa in resumo['faixas']:
+        filtros = {'faixa': faixa['faixa']}
+        if curso_id is not None:
+            filtros['curso'] = curso_id
+        faixa['matriculas_url'] = f'{url}?{urlencode(filtros)}'
+    return Response({'curso': curso_id, **resumo})
+
+
+class JobRelatorioViewSet(
+    mixins.CreateModelMixin,
+    mixins.RetrieveModelMixin,
+    mixins.ListModelMixin,
+    viewsets.GenericViewSet,
+):
+    """
+    Relatórios gerados fora da requisição (ver core/jobs.py).
+
+    POST /api/relatorios/jobs/ enfileira e responde 202; um job idêntico
+    pendente ou em andamento é devolvido com 200 em vez de criar outro.
+    GET /api/relatorios/jobs/{id}/ consulta o status e
+    GET /api/relatorios/jobs/{id}/download/ baixa o arquivo .gz.
+    """
+    serializer_class = JobRelatorioSerializer
+
+    def get_queryset(self):
+        # o worker grava no primário; a réplica pode ainda não ter o status
+        return JobRelatorio.objects.using(DEFAULT_DB_ALIAS).order_by('-id')
+
+    def get_serializer_class(self):
+        if self.action == 'create':
+            return JobRelatorioCreateSerializer
+        return JobRelatorioSerializer
+
+    def create(self, request, *args, **kwargs):
+        entrada = self.get_serializer(data=request.data)
+        entrada.is_valid(raise_exception=True)
+        job, criado = enfileirar(**entrada.validated_data)
+        serializer = JobRelatorioSerializer(job, context=self.get_serializer_context())
+        return Response(
+            serializer.data,
+            status=status.HTTP_202_ACCEPTED if criado else status.HTTP_200_OK,
+            headers={'Location': reverse('job-relatorio-detail', args=[job.pk])},
+        )
+
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        """
+        Endpoint customizado: GET /api/relatorios/jobs/{id}/download/
+        Arquivo compactado (gzip) do job CONCLUIDO; 409 enquanto não
+        terminar e 410 se o arquivo já foi apagado pela retenção.
+        """
+        job = self.get_object()
+        if job.status != 'CONCLUIDO':
+            return Response(
+                {'detail': f'O job está {job.get_status_display().lower()}.', 'status': job.status},
+                status=status.HTTP_409_CONFLICT,
+            )
+        caminho = caminho_arquivo(job)
+        if not caminho.is_file():
+            return Response({'detail': 'O arquivo expirou.'}, status=status.HTTP_410_GONE)
+        return FileResponse(
+            caminho.open('rb'),
+            as_attachment=True,
+            filename=f'{job.tipo}-{job.pk}.{job.formato}.gz',
+            content_type='application/gzip',
+        )
+
+
+@api_view(['GET'])
+def cache_estatisticas(request):
+    """
+    GET /api/cache/estatisticas/
+    
+    Contadores de acertos/falhas do cache de resumos e geração atual
+    de cada model.
+    """
+    return Response(estatisticas_cache())
+
+# ============================================
+# MÉTRICAS (Prometheus)
+# ============================================
+from django.http import HttpResponse
+from .metricas import registro as registro_metricas
+
+
+def metricas_view(request):
+    """
+    GET /api/_metrics
+    
+    Consultas SQL, tempo no banco e latência agregados por rota (ver
+    core/metricas.py), no formato texto do Prometheus.
+    """
+    return HttpResponse(
+        registro_metricas.exportar(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
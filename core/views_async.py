@@ -0,0 +1,222 @@
+"""
+Versões assíncronas dos endpoints de leitura mais acessados.
+
+Rodando sob ASGI (uvicorn academia_dev.asgi:application), estas views
+não prendem uma thread do worker enquanto esperam o banco:
+- os relatórios SQL usam o driver assíncrono do psycopg 3
+  (core/banco_async.py), então um único worker atende muitos relatórios
+  lentos ao mesmo tempo;
+- as demais usam o ORM assíncrono do Django (aiterator, acount, afirst).
+
+As respostas têm o mesmo formato das versões síncronas, sob o prefixo
+/api/async/. O DRF não tem views assíncronas, então a paginação e a
+serialização são feitas aqui, reaproveitando os serializers (sem consultas
+extras, graças às anotações e ao select_related).
+
+As leituras também respondem 304 a requisições condicionais
+(core/condicional.py).
+
+O comando `benchmark_async` compara as duas versões com requisições
+concorrentes.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.shortcuts import render
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .banco_async import executar
+from .cache import obter_ou_calcular
+from .condicional import aplicar_validadores, get_condicional, nao_modificado, validadores_relatorio
+from .estatisticas import aestatisticas_aluno, aestatisticas_curso, estatisticas_gerais
+from .models import Aluno, Curso, Matricula
+from .relatorios import aconsulta_relatorio
+from .renderers import JSONRapidoRenderer
+from .serializers import AlunoSerializer, CursoSerializer, MatriculaSerializer
+
+
+_renderer_json = JSONRapidoRenderer()
+
+
+def resposta_json(dados, status=200):
+    return HttpResponse(
+        _renderer_json.render(dados),
+        content_type='application/json',
+        status=status,
+    )
+
+
+async def paginar(request, queryset, serializer_class):
+    """
+    Mesmo formato do PageNumberPagination (?page=N):
+    count, next, previous e results.
+    """
+    tamanho = api_settings.PAGE_SIZE
+    try:
+        pagina = int(request.GET.get('page', 1))
+    except ValueError:
+        raise Http404('Página inválida.')
+
+    total = await queryset.acount()
+    paginas = max(1, -(-total // tamanho))
+    if pagina < 1 or pagina > paginas:
+        raise Http404('Página inválida.')
+
+    inicio = (pagina - 1) * tamanho
+    leitura = getattr(serializer_class, 'leitura_rapida', None)
+    if leitura is not None and settings.LEITURA_RAPIDA:
+        linhas = [linha async for linha in leitura.preparar(queryset)[inicio:inicio + tamanho]]
+        resultados = leitura.converter(linhas)
+    else:
+        if leitura is not None:
+            queryset = leitura.anotar(queryset)
+        objetos = [obj async for obj in queryset[inicio:inicio + tamanho]]
+        resultados = serializer_class(objetos, many=True).data
+
+    url = request.build_absolute_uri()
+    proxima = replace_query_param(url, 'page', pagina + 1) if pagina < paginas else None
+    anterior = None
+    if pagina == 2:
+        anterior = remove_query_param(url, 'page')
+    elif pagina > 2:
+        anterior = replace_query_param(url, 'page', pagina - 1)
+
+    return {
+        'count': total,
+        'next': proxima,
+        'previous': anterior,
+        'results': resultados,
+    }
+
+
+# ============================================
+# ALUNOS E MATRICULAS
+# ============================================
+
+@get_condicional()
+async def alunos_lista_async(request):
+    """GET /api/async/alunos/"""
+    return resposta_json(await paginar(request, Aluno.objects.com_totais(), AlunoSerializer))
+
+
+@get_condicional()
+async def aluno_detalhe_async(request, pk):
+    """GET /api/async/alunos/{id}/"""
+    aluno = await Aluno.objects.com_totais().filter(pk=pk).afirst()
+    if aluno is None:
+        raise Http404
+    return resposta_json(AlunoSerializer(aluno).data)
+
+
+@get_condicional()
+async def aluno_financeiro_async(request, pk):
+    """GET /api/async/alunos/{id}/financeiro/"""
+    data = await aestatisticas_aluno(pk)
+    if data is None:
+        raise Http404
+    return resposta_json(data)
+
+
+def _matriculas():
+    # o serializer lê aluno.nome, curso.nome e curso.valor_inscricao
+    return Matricula.objects.select_related('aluno', 'curso')
+
+
+@get_condicional()
+async def matriculas_lista_async(request):
+    """GET /api/async/matriculas/"""
+    return resposta_json(await paginar(request, _matriculas(), MatriculaSerializer))
+
+
+@get_condicional()
+async def matricula_detalhe_async(request, pk):
+    """GET /api/async/matriculas/{id}/"""
+    matricula = await _matriculas().filter(pk=pk).afirst()
+    if matricula is None:
+        raise Http404
+    return resposta_json(MatriculaSerializer(matricula).data)
+
+
+# ============================================
+# CURSOS
+# ============================================
+
+def _cursos():
+    # total_matriculas e total_arrecadado vêm das anotações da leitura
+    # rápida: o serializer não pode consultar o banco numa view assíncrona
+    return CursoSerializer.leitura_rapida.anotar(Curso.objects.all())
+
+
+@get_condicional()
+async def cursos_lista_async(request):
+    """GET /api/async/cursos/"""
+    return resposta_json(await paginar(request, Curso.objects.all(), CursoSerializer))
+
+
+@get_condicional()
+async def curso_detalhe_async(request, pk):
+    """GET /api/async/cursos/{id}/"""
+    curso = await _cursos().filter(pk=pk).afirst()
+    if curso is None:
+        raise Http404
+    return resposta_json(CursoSerializer(curso).data)
+
+
+@get_condicional()
+async def curso_estatisticas_async(request, pk):
+    """GET /api/async/cursos/{id}/estatisticas/"""
+    data = await aestatisticas_curso(pk)
+    if data is None:
+        raise Http404
+    return resposta_json(data)
+
+
+# ============================================
+# RELATORIOS SQL
+# ============================================
+
+async def _relatorio(request, nome, montar):
+    """executa o relatório e monta a resposta com montar(metadados, linhas)"""
+    fresco = request.GET.get('fresh') == '1'
+    sql_query, metadados = await aconsulta_relatorio(nome, fresco=fresco)
+    etag, alterado_em = validadores_relatorio(request, metadados)
+    resposta = nao_modificado(request, etag, alterado_em)
+    if resposta is not None:
+        return resposta
+    colunas, linhas = await executar(sql_query)
+    dados = montar(metadados, [dict(zip(colunas, linha)) for linha in linhas])
+    return aplicar_validadores(resposta_json(dados), etag, alterado_em)
+
+
+async def relatorio_sql_async(request):
+    """GET /api/async/relatorio-sql/ (mesmo conteúdo de /api/relatorio-sql/)"""
+    return await _relatorio(request, 'alunos', lambda metadados, alunos: {
+        'mensagem': 'Relatório gerado usando SQL RAW com JOIN no livro de saldos',
+        **metadados,
+        'total_alunos': len(alunos),
+        'alunos': alunos,
+    })
+
+
+async def cursos_populares_sql_async(request):
+    """GET /api/async/cursos-populares-sql/"""
+    return await _relatorio(request, 'cursos_populares', lambda metadados, cursos: {
+        'mensagem': 'Cursos populares usando SQL RAW',
+        **metadados,
+        'total_cursos': len(cursos),
+        'cursos': cursos,
+    })
+
+
+# ============================================
+# DASHBOARD
+# ============================================
+
+async def dashboard_async(request):
+    """
+    Dashboard (mesmo template de dashboard_view). Normalmente é um acerto
+    no cache versionado; no erro, o cálculo roda numa thread.
+    """
+    context = await sync_to_async(obter_ou_calcular)('estatisticas_gerais', estatisticas_gerais)
+    return render(request, 'core/dashboard.html', context)
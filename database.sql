@@ -16,6 +16,15 @@ CREATE INDEX idx_aluno_nome ON core_aluno(nome);
 CREATE INDEX idx_aluno_cpf ON core_aluno(cpf);
 CREATE INDEX idx_aluno_email ON core_aluno(email);
 
+-- Busca por nome sem acento (ILIKE '%x%' e similaridade) com pg_trgm.
+-- O btree idx_aluno_nome não atende ILIKE com curinga no início.
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE EXTENSION IF NOT EXISTS unaccent;
+CREATE OR REPLACE FUNCTION core_unaccent(text) RETURNS text AS $$
+    SELECT public.unaccent('public.unaccent'::regdictionary, $1)
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT;
+CREATE INDEX idx_aluno_nome_trgm ON core_aluno USING gin (core_unaccent(nome) gin_trgm_ops);
+
 -- Comentários explicativos
 COMMENT ON TABLE core_aluno IS 'Tabela de cadastro de alunos da academia';
 COMMENT ON COLUMN core_aluno.cpf IS 'CPF do aluno (apenas números, 11 dígitos)';
@@ -37,6 +46,7 @@ CREATE TABLE core_curso (
 -- Índices
 CREATE INDEX idx_curso_nome ON core_curso(nome);
 CREATE INDEX idx_curso_status ON core_curso(status);
+CREATE INDEX idx_curso_nome_trgm ON core_curso USING gin (core_unaccent(nome) gin_trgm_ops);
 
 -- Comentários
 COMMENT ON TABLE core_curso IS 'Tabela de cursos oferecidos pela academia';